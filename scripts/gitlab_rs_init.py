@@ -1,9 +1,11 @@
 import os
 import re
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
 from pymongo import MongoClient
-from pymongo.errors import OperationFailure
+from pymongo.errors import OperationFailure, PyMongoError
 
 
 def set_replicaset(client: MongoClient, host_seeds_ip: dict, rs="rs0") -> None:
@@ -57,24 +59,121 @@ def host_seeds_ip_dict(host_seeds_dict: dict, host_entries: dict) -> None:
     return hosts
 
 
-def create_napps_user(client: MongoClient, user: str, pwd=None):
+def create_napps_user(client: MongoClient, user: str, pwd=None, db="napps"):
     """Create user"""
-    return client.napps.command(
-        "createUser", user, pwd=pwd, roles=[{"role": "dbAdmin", "db": "napps"}]
+    return client[db].command(
+        "createUser", user, pwd=pwd, roles=[{"role": "dbAdmin", "db": db}]
     )
 
 
-def wait_until_first_node_is_primary(client: MongoClient) -> None:
-    """Wait until first node is primary."""
-    status = None
-    while status != "PRIMARY":
-        print(f"Waiting for the first node to be PRIMARY, current: {status}")
-        response = client.admin.command("replSetGetStatus")
-        status = response["members"][0]["stateStr"]
-        time.sleep(3)
+def shard_db_names(shards: int, db="napps") -> list:
+    """Database names of the isolated test instances 1..shards."""
+    suffixes = "0123456789abcdefghijklmnopqrstuvwxyz"
+    return [f"{db}_w{suffixes[i]}" for i in range(1, shards + 1)]
+
+
+def hello(client: MongoClient, topology_version=None, max_await_ms=10000) -> dict:
+    """Run 'hello'; awaitable when ``topology_version`` is given.
+
+    An awaitable hello only returns once the server's topologyVersion
+    differs from ``topology_version`` (e.g. after an election) or
+    ``max_await_ms`` elapses.
+    """
+    if topology_version is None:
+        return client.admin.command("hello")
+    return client.admin.command(
+        {
+            "hello": 1,
+            "topologyVersion": topology_version,
+            "maxAwaitTimeMS": max_await_ms,
+        }
+    )
+
+
+def probe_member(host_port: str, timeout_ms=2000) -> dict:
+    """Run 'hello' directly on one member and time it."""
+    result = {"host": host_port, "ok": False}
+    client = MongoClient(
+        host_port,
+        directConnection=True,
+        serverSelectionTimeoutMS=timeout_ms,
+        connectTimeoutMS=timeout_ms,
+    )
+    start = time.monotonic()
+    try:
+        result["hello"] = hello(client)
+        result["ok"] = True
+    except PyMongoError as exc:
+        result["error"] = str(exc).split(", Timeout:")[0]
+    finally:
+        result["latency_ms"] = (time.monotonic() - start) * 1000
+        client.close()
+    return result
+
+
+def wait_for_members(hosts: dict, timeout=120, timeout_ms=2000) -> list:
+    """Probe every member concurrently until all of them answer 'hello'."""
+    host_ports = [value["host_port"] for value in hosts.values()]
+    deadline = time.monotonic() + timeout
+    with ThreadPoolExecutor(max_workers=len(host_ports)) as executor:
+        while True:
+            members = list(
+                executor.map(lambda h: probe_member(h, timeout_ms), host_ports)
+            )
+            for member in members:
+                status = "ok" if member["ok"] else member["error"]
+                print(f"  {member['host']}: {member['latency_ms']:.1f}ms {status}")
+            if all(member["ok"] for member in members):
+                return members
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"MongoDB members not reachable after {timeout}s")
+            time.sleep(0.5)
+
+
+def wait_until_first_node_is_primary(
+    client: MongoClient, timeout=120, max_await_ms=10000
+) -> None:
+    """Wait until first node is primary.
+
+    Uses awaitable hello, so it returns as soon as the election is over
+    instead of on the next polling tick.
+    """
+    deadline = time.monotonic() + timeout
+    topology_version = None
+    while True:
+        response = hello(client, topology_version, max_await_ms)
+        if response.get("isWritablePrimary"):
+            break
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"First node not PRIMARY after {timeout}s")
+        print(
+            "Waiting for the first node to be PRIMARY, current: "
+            f"{'SECONDARY' if response.get('secondary') else 'OTHER'}"
+        )
+        topology_version = response.get("topologyVersion")
+        if topology_version is None:
+            # servers without streaming hello support
+            time.sleep(0.5)
     print("First node stateStr is PRIMARY")
 
 
+@contextmanager
+def phase(timings: dict, name: str):
+    """Record how long the ``name`` phase of main() took."""
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        timings[name] = time.monotonic() - start
+
+
+def print_timings(timings: dict) -> None:
+    print("Replica set init timings:")
+    for name, duration in timings.items():
+        print(f"  {name:<20} {duration:8.3f}s")
+    print(f"  {'total':<20} {sum(timings.values()):8.3f}s")
+
+
 def write_host_seeds_file(
     hosts: dict, output_host_seeds_file="/tmp/host_seeds.txt"
 ) -> str:
@@ -91,33 +190,50 @@ def main() -> None:
     host_entries = host_to_ip_address_dict()
     seeds = host_seeds_dict(host_seeds)
     output_host_seeds_file = "/tmp/host_seeds.txt"
+    timings = {}
 
     hosts = host_seeds_ip_dict(seeds, host_entries)
     print(f"Mapped hosts dict: {hosts}")
 
+    print(f"Running hello cmd on {len(hosts)} members")
+    with phase(timings, "members reachable"):
+        wait_for_members(hosts)
+
     first_node = next(iter(hosts.keys()))
-    print(f"Running hello cmd on {first_node}")
     client = MongoClient(hosts[first_node]["host_port"], directConnection=True)
-    print(client.db.command("hello"))
 
     print("Configuring replica set")
-    response = set_replicaset(client, hosts)
+    with phase(timings, "replSetInitiate"):
+        response = set_replicaset(client, hosts)
     assert "ok" in response, response
 
     content = write_host_seeds_file(hosts, output_host_seeds_file)
     print(f"Wrote {content} to {output_host_seeds_file}")
 
     print(f"Waiting for node {first_node} to become primary")
-    wait_until_first_node_is_primary(client)
-
-    try:
-        user, pwd = os.environ["MONGO_USERNAME"], os.environ["MONGO_PASSWORD"]
-        print(f"Creating 'napps' user {user}")
-        response = create_napps_user(client, user, pwd)
-        assert "ok" in response, response
-    except OperationFailure as exc:
-        if "already exists" not in str(exc):
-            raise
+    with phase(timings, "primary election"):
+        wait_until_first_node_is_primary(client)
+
+    with phase(timings, "user creation"):
+        try:
+            user, pwd = os.environ["MONGO_USERNAME"], os.environ["MONGO_PASSWORD"]
+            print(f"Creating 'napps' user {user}")
+            response = create_napps_user(client, user, pwd)
+            assert "ok" in response, response
+        except OperationFailure as exc:
+            if "already exists" not in str(exc):
+                raise
+
+        for db in shard_db_names(int(os.environ.get("MONGO_SHARDS", 0))):
+            print(f"Creating '{db}' user {user}")
+            try:
+                response = create_napps_user(client, user, pwd, db)
+                assert "ok" in response, response
+            except OperationFailure as exc:
+                if "already exists" not in str(exc):
+                    raise
+
+    print_timings(timings)
 
 
 if __name__ == "__main__":
@@ -67,5 +67,19 @@ napps.createUser(
     roles: [ { role: "dbAdmin", db: "napps" } ]
   }
 );
+// one database per isolated test instance (pytest-xdist worker), see
+// tests/helpers.py Instance
+var suffixes = "0123456789abcdefghijklmnopqrstuvwxyz";
+var shards = parseInt(process.env["MONGO_SHARDS"] || "0");
+for (var i = 1; i <= shards; i++) {
+  var shardName = "napps_w" + suffixes[i];
+  db.getSiblingDB(shardName).createUser(
+    {
+      user: process.env["MONGO_USERNAME"],
+      pwd: process.env["MONGO_PASSWORD"],
+      roles: [ { role: "dbAdmin", db: shardName } ]
+    }
+  );
+}
 print("done all users have been created.");
 EOF
@@ -1,8 +1,10 @@
 import os
+import random
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pymongo import MongoClient
-from pymongo.errors import OperationFailure, AutoReconnect
+from pymongo.errors import PyMongoError
 
 
 def mongo_client(
@@ -31,29 +33,139 @@ def mongo_client(
         readpreference=readpreference,
         maxpoolsize=maxpoolsize,
         minpoolsize=minpoolsize,
+        serverselectiontimeoutms=serverselectiontimeoutms,
         **kwargs,
     )
 
 
-def mongo_hello_wait(mongo_client=mongo_client, retries=10, timeout_ms=10000):
-    """Wait for MongoDB."""
+def probe_member(seed: str, mongo_client=mongo_client, timeout_ms=2000) -> dict:
+    """Run 'hello' directly on one member and time it."""
+    result = {"host": seed, "ok": False, "latency_ms": None}
+    client = mongo_client(
+        host_seeds=seed,
+        directconnection=True,
+        minpoolsize=0,
+        maxpoolsize=1,
+        serverselectiontimeoutms=timeout_ms,
+        connecttimeoutms=timeout_ms,
+    )
+    start = time.monotonic()
     try:
-        client = mongo_client(serverselectiontimeoutms=timeout_ms)
-        print("Trying to run 'hello' command on MongoDB...")
-        client.db.command("hello")
-        print("Ran 'hello' command on MongoDB successfully. It's ready!")
-    except (OperationFailure, AutoReconnect) as exc:
-        retries -= 1
-        if retries > 0:
-            time.sleep(max(timeout_ms / 1000, 1))
-            return mongo_hello_wait(mongo_client, retries, timeout_ms)
-        print(f"Maximum retries reached when waiting for MongoDB. {str(exc)}")
-        sys.exit(1)
+        hello = client.admin.command("hello")
+    except PyMongoError as exc:
+        # drop the topology description pymongo appends to the message
+        result["error"] = str(exc).split(", Timeout:")[0]
+        return result
+    finally:
+        result["latency_ms"] = (time.monotonic() - start) * 1000
+        client.close()
+    last_write = hello.get("lastWrite", {})
+    result.update(
+        ok=True,
+        primary=bool(hello.get("isWritablePrimary")),
+        secondary=bool(hello.get("secondary")),
+        set_name=hello.get("setName"),
+        last_write_date=last_write.get("lastWriteDate"),
+    )
+    return result
+
+
+def replica_set_ready(members: list, max_lag_s: float, require: str = "majority") -> tuple:
+    """Tell whether a writable primary is up and enough members caught up.
+
+    A member counts as ready when it is the primary or a secondary within
+    ``max_lag_s`` of it; unreachable members and members in any other
+    state (STARTUP2, RECOVERING, ROLLBACK...) do not. ``require`` is
+    ``"majority"`` (enough for w:majority writes) or ``"all"``.
+    Returns ``(ready, reason)``; each secondary dict gets its ``lag_s``.
+    """
+    if require not in ("majority", "all"):
+        raise ValueError(f"require must be 'majority' or 'all', not {require!r}")
+    primaries = [m for m in members if m["ok"] and m["primary"]]
+    if not primaries:
+        return False, "no writable primary"
+    primary_date = primaries[0]["last_write_date"]
+    ready = []
+    not_ready = []
+    for member in members:
+        if not member["ok"]:
+            not_ready.append(f"{member['host']} unreachable")
+        elif member["primary"]:
+            ready.append(member)
+        elif not member["secondary"]:
+            not_ready.append(f"{member['host']} neither primary nor secondary")
+        elif primary_date is None or member["last_write_date"] is None:
+            not_ready.append(f"{member['host']} has no lastWrite yet")
+        else:
+            member["lag_s"] = (primary_date - member["last_write_date"]).total_seconds()
+            if member["lag_s"] > max_lag_s:
+                not_ready.append(f"{member['host']} lagging {member['lag_s']:.1f}s")
+            else:
+                ready.append(member)
+    needed = len(members) if require == "all" else len(members) // 2 + 1
+    if len(ready) < needed:
+        return False, (f"{len(ready)}/{len(members)} members ready, {require} "
+                       f"({needed}) needed: {', '.join(not_ready)}")
+    return True, "ready"
+
+
+def print_members(members: list) -> None:
+    for member in members:
+        if member["ok"]:
+            role = "PRIMARY" if member["primary"] else (
+                "SECONDARY" if member["secondary"] else "OTHER")
+            lag = member.get("lag_s")
+            lag = f" lag={lag:.1f}s" if lag is not None else ""
+            print(f"  {member['host']}: {role} hello={member['latency_ms']:.1f}ms{lag}")
+        else:
+            print(f"  {member['host']}: unreachable after "
+                  f"{member['latency_ms']:.1f}ms ({member['error']})")
+
+
+def mongo_hello_wait(
+    mongo_client=mongo_client,
+    retries=10,
+    timeout_ms=2000,
+    deadline_s=float(os.environ.get("MONGO_WAIT_DEADLINE", 120)),
+    max_lag_s=float(os.environ.get("MONGO_MAX_LAG", 5)),
+    require=os.environ.get("MONGO_WAIT_MEMBERS", "majority"),
+    host_seeds=os.environ.get("MONGO_HOST_SEEDS"),
+):
+    """Wait for MongoDB.
+
+    Probes every seed concurrently until a writable primary is reachable
+    and a majority of the members (or all of them, with ``require="all"``)
+    are the primary or secondaries within ``max_lag_s`` of it, with a jittered
+    exponential backoff between rounds, at most ``retries`` rounds and a
+    total deadline of ``deadline_s`` seconds.
+    """
+    seeds = host_seeds.split(",")
+    deadline = time.monotonic() + deadline_s
+    delay = 0.25
+    reason = "not probed"
+    with ThreadPoolExecutor(max_workers=len(seeds)) as executor:
+        for attempt in range(1, retries + 1):
+            print(f"Trying to run 'hello' command on {len(seeds)} MongoDB members (attempt {attempt})...")
+            members = list(executor.map(
+                lambda seed: probe_member(seed, mongo_client, timeout_ms), seeds))
+            ready, reason = replica_set_ready(members, max_lag_s, require)
+            print_members(members)
+            if ready:
+                print("Ran 'hello' command on MongoDB successfully. It's ready!")
+                return members
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            print(f"MongoDB not ready: {reason}")
+            time.sleep(min(remaining, delay * random.uniform(0.5, 1.5)))
+            delay = min(delay * 2, 5)
+    print(f"Maximum retries or deadline reached when waiting for MongoDB. {reason}")
+    sys.exit(1)
 
 
 if __name__ == "__main__":
     print("Trying to run hello command on MongoDB...")
-    retries = 5
+    retries = 30
     if len(sys.argv) > 1:
         retries = int(sys.argv[1])
 
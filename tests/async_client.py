@@ -0,0 +1,143 @@
+"""Asyncio Kytos API client for high fan-out operations.
+
+A single event loop drives all requests, bounded by a semaphore, so
+thousands of concurrent calls do not need one OS thread each. Every
+response is returned as an ``AsyncResult`` with its latency.
+"""
+import asyncio
+import time
+
+import aiohttp
+
+from tests.helpers import KYTOS_API, latency_summary
+
+
+class AsyncResult:
+    """Outcome of one request: status, decoded body and latency."""
+
+    __slots__ = ('method', 'path', 'status', 'data', 'latency', 'error')
+
+    def __init__(self, method, path, status=None, data=None, latency=None,
+                 error=None):
+        self.method = method
+        self.path = path
+        self.status = status
+        self.data = data
+        self.latency = latency
+        self.error = error
+
+    def __repr__(self):
+        return 'AsyncResult(%s %s -> %s in %.4fs)' % (
+            self.method, self.path, self.status or self.error,
+            self.latency or 0)
+
+
+class AsyncKytosClient:
+    """Kytos REST API client for asyncio code.
+
+    Use it as an async context manager::
+
+        async with AsyncKytosClient(concurrency=200) as client:
+            results = await client.gather(
+                client.post('/topology/v3/interfaces/switch/%s/enable' % dpid)
+                for dpid in dpids)
+    """
+
+    def __init__(self, api=KYTOS_API, concurrency=100, timeout=30):
+        self.api = api
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.results = []
+        self._semaphore = None
+        self._session = None
+
+    async def __aenter__(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.concurrency),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+
+    async def request(self, method, path, json=None):
+        """Send one request; connection errors are kept on the result."""
+        result = AsyncResult(method, path)
+        async with self._semaphore:
+            start = time.monotonic()
+            try:
+                async with self._session.request(method, self.api + path,
+                                                 json=json) as response:
+                    result.status = response.status
+                    text = await response.text()
+                    try:
+                        result.data = await response.json(content_type=None)
+                    except ValueError:
+                        result.data = text
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                result.error = exc
+            result.latency = time.monotonic() - start
+        self.results.append(result)
+        return result
+
+    def get(self, path):
+        return self.request('GET', path)
+
+    def post(self, path, json=None):
+        return self.request('POST', path, json)
+
+    def patch(self, path, json=None):
+        return self.request('PATCH', path, json)
+
+    def delete(self, path, json=None):
+        return self.request('DELETE', path, json)
+
+    @staticmethod
+    async def gather(coros):
+        """Run ``coros`` concurrently and return results in order."""
+        return await asyncio.gather(*coros)
+
+    async def enable_all_interfaces(self):
+        """Enable the interfaces of every switch, one POST per switch."""
+        response = await self.get('/topology/v3/switches')
+        return await self.gather(
+            self.post('/topology/v3/interfaces/switch/%s/enable' % dpid)
+            for dpid in response.data.get('switches', {})
+        )
+
+    async def install_flows(self, flows_by_dpid):
+        """POST each flow list to /flow_manager/v2/flows/<dpid>.
+
+        ``flows_by_dpid`` is an iterable of ``(dpid, flows)`` pairs, so the
+        same switch may appear many times.
+        """
+        return await self.gather(
+            self.post('/flow_manager/v2/flows/' + dpid, {"flows": flows})
+            for dpid, flows in flows_by_dpid
+        )
+
+    async def create_evcs(self, payloads):
+        return await self.gather(
+            self.post('/mef_eline/v2/evc/', payload) for payload in payloads
+        )
+
+    async def delete_evcs(self, circuit_ids):
+        return await self.gather(
+            self.delete('/mef_eline/v2/evc/' + circuit_id)
+            for circuit_id in circuit_ids
+        )
+
+    def latency_stats(self):
+        """Latency summary of the successful requests made so far."""
+        return latency_summary(
+            [r.latency for r in self.results if r.error is None])
+
+
+def run(coro_func, api=KYTOS_API, concurrency=100, timeout=30):
+    """Run ``coro_func(client)`` on a fresh event loop from sync code."""
+    async def main():
+        async with AsyncKytosClient(api, concurrency, timeout) as client:
+            return await coro_func(client)
+    return asyncio.run(main())
@@ -0,0 +1,215 @@
+"""Shared pieces of the benchmark modules (tests/test_bench_*.py).
+
+Benchmarks are marked ``bench`` and only run with ``pytest --bench``.
+Each one writes its results as JSON under ``BENCH_OUTPUT_DIR`` (default
+``bench_results/``) with ``write_result`` so runs can be compared.
+``OpLog`` records timed operations from several worker threads and
+summarizes them around a fault (stall window, errors, recovery).
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from tests.helpers import latency_summary
+
+BENCH_OUTPUT_DIR = os.environ.get('BENCH_OUTPUT_DIR', 'bench_results')
+
+bench = pytest.mark.bench
+
+
+def write_result(name, result):
+    """Dump ``result`` to BENCH_OUTPUT_DIR/<name>-<timestamp>.json."""
+    os.makedirs(BENCH_OUTPUT_DIR, exist_ok=True)
+    path = os.path.join(BENCH_OUTPUT_DIR, '%s-%s.json' % (
+        name, datetime.now().strftime('%Y%m%dT%H%M%S')))
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=2, sort_keys=True, default=str)
+    print('Benchmark %s results written to %s' % (name, path))
+    return path
+
+
+def format_table(headers, rows):
+    """Rows as an aligned plain-text table."""
+    cells = [[str(value) for value in row] for row in [headers, *rows]]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    lines = ['  '.join(value.rjust(width) for value, width in zip(row, widths))
+             for row in cells]
+    lines.insert(1, '  '.join('-' * width for width in widths))
+    return '\n'.join(lines)
+
+
+def write_table(name, headers, rows):
+    """Print the table and save it as BENCH_OUTPUT_DIR/<name>-<ts>.txt."""
+    table = format_table(headers, rows)
+    print(table)
+    os.makedirs(BENCH_OUTPUT_DIR, exist_ok=True)
+    path = os.path.join(BENCH_OUTPUT_DIR, '%s-%s.txt' % (
+        name, datetime.now().strftime('%Y%m%dT%H%M%S')))
+    with open(path, 'w') as f:
+        f.write(table + '\n')
+    return path
+
+
+def rss_kb(pid):
+    """Resident set size of process ``pid`` in kB, or None."""
+    try:
+        with open('/proc/%d/status' % pid) as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except (OSError, TypeError):
+        pass
+    return None
+
+
+class RssSampler:
+    """Sample the RSS of ``pid`` every ``interval`` seconds in a thread.
+
+    Use as a context manager; ``samples`` holds ``(monotonic, kB)``.
+    """
+
+    def __init__(self, pid, interval=0.5):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            value = rss_kb(self.pid)
+            if value is not None:
+                self.samples.append((time.monotonic(), value))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def peak(self):
+        return max((value for _, value in self.samples), default=None)
+
+
+class Op:
+    """One timed operation (monotonic seconds)."""
+
+    __slots__ = ('label', 'start', 'end', 'ok', 'status')
+
+    def __init__(self, label, start, end, ok, status):
+        self.label = label
+        self.start = start
+        self.end = end
+        self.ok = ok
+        self.status = status
+
+
+class OpLog:
+    """Thread-safe log of operations, summarized per label."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ops = []
+
+    def record(self, label, start, end, ok, status=None):
+        with self.lock:
+            self.ops.append(Op(label, start, end, ok, status))
+
+    def run(self, label, func):
+        """Time ``func()``; a response with status < 400 counts as ok.
+
+        Exceptions are recorded as errors with their class name.
+        """
+        start = time.monotonic()
+        try:
+            response = func()
+        except Exception as exc:
+            self.record(label, start, time.monotonic(), False,
+                        type(exc).__name__)
+            return None
+        status = getattr(response, 'status_code', None)
+        self.record(label, start, time.monotonic(),
+                    status is None or status < 400, status)
+        return response
+
+    def labels(self):
+        return sorted({op.label for op in self.ops})
+
+    def summary(self, label, fault_at=None):
+        """Counts and latencies of ``label``, plus fault impact.
+
+        With ``fault_at`` (a monotonic time) it also reports:
+
+        * ``stall_window``: seconds from the last successful completion
+          before ``fault_at`` (or ``fault_at`` itself if there was none)
+          to the first one after it, None if nothing succeeded after it;
+        * ``recovery``: seconds from ``fault_at`` until the first
+          successful operation started after it completed;
+        * ``errors_after_fault``: failed operations that ended after it.
+        """
+        ops = sorted((op for op in self.ops if op.label == label),
+                     key=lambda op: op.end)
+        ok = [op for op in ops if op.ok]
+        errors = {}
+        for op in ops:
+            if not op.ok:
+                errors[str(op.status)] = errors.get(str(op.status), 0) + 1
+        result = {
+            'ops': len(ops),
+            'errors': errors,
+            'latency': latency_summary([op.end - op.start for op in ok]),
+        }
+        if fault_at is None:
+            return result
+        before = [op.end for op in ok if op.end <= fault_at]
+        after = [op.end for op in ok if op.end > fault_at]
+        stall = (min(after) - max(before, default=fault_at)) if after else None
+        recovered = [op.end for op in ok if op.start >= fault_at]
+        result.update(
+            stall_window=stall,
+            recovery=(min(recovered) - fault_at) if recovered else None,
+            errors_after_fault=sum(1 for op in ops
+                                   if not op.ok and op.end >= fault_at),
+        )
+        return result
+
+
+def run_workers(duration, workers, schedule=()):
+    """Call every ``workers`` callable in a loop on its own thread.
+
+    Each callable gets its loop index; all stop after ``duration``
+    seconds. ``schedule`` is a list of ``(offset, func)`` called from
+    this thread ``offset`` seconds after the start, e.g. to inject a
+    fault mid-run. Returns the monotonic start time.
+    """
+    stop = threading.Event()
+
+    def loop(func):
+        index = 0
+        while not stop.is_set():
+            func(index)
+            index += 1
+
+    threads = [threading.Thread(target=loop, args=(func,), daemon=True)
+               for func in workers]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    try:
+        for offset, func in sorted(schedule, key=lambda item: item[0]):
+            stop.wait(max(0, start + offset - time.monotonic()))
+            func()
+        stop.wait(max(0, start + duration - time.monotonic()))
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    return start
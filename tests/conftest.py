@@ -1,5 +1,121 @@
+import os
+
 import pytest
-from datetime import datetime
+from collections import defaultdict
+from datetime import datetime, timezone
+
+
+def pytest_addoption(parser):
+    parser.addoption('--bench', action='store_true',
+                     help='run the benchmarks (tests marked bench)')
+    group = parser.getgroup('mongo profile')
+    group.addoption('--mongo-profile', action='store_true',
+                    help='profile the napps database during each test and '
+                         'report slow operations and collection scans')
+    group.addoption('--mongo-profile-slowms', type=int, default=100,
+                    help='operations at least this slow are listed (ms)')
+    group.addoption('--mongo-profile-top', type=int, default=5,
+                    help='slowest operations listed per collection')
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        'markers', 'bench: benchmark, only collected with --bench')
+    config.addinivalue_line(
+        'markers', 'serial: uses host-wide kytosd state (napps directory, '
+                   'storehouse, syslog); skipped on pytest-xdist workers')
+    config.mongo_profiles = []
+    config.mongo_pool_stats = None
+
+
+def pytest_collection_modifyitems(config, items):
+    skip_bench = pytest.mark.skip(reason='benchmark, run with --bench')
+    skip_serial = pytest.mark.skip(reason='not parallel-safe, run without -n')
+    on_worker = 'PYTEST_XDIST_WORKER' in os.environ
+    for item in items:
+        if 'bench' in item.keywords and not config.getoption('bench'):
+            item.add_marker(skip_bench)
+        if 'serial' in item.keywords and on_worker:
+            item.add_marker(skip_serial)
+
+
+@pytest.fixture(autouse=True)
+def controller_alive(request):
+    """Fail the test if its kytosd died meanwhile.
+
+    wait_until() already raises as soon as it notices; this catches the
+    tests that don't wait on anything after the crash.
+    """
+    yield
+    controller = getattr(getattr(request.cls, 'net', None), 'controller', None)
+    if controller is not None:
+        controller.check()
+
+
+@pytest.fixture(autouse=True)
+def mongo_profile(request):
+    """Record system.profile entries of the test's napps database."""
+    db = getattr(getattr(request.cls, 'net', None), 'db', None)
+    if not request.config.getoption('mongo_profile') or db is None:
+        yield
+        return
+    # system.profile can only be dropped while profiling is off
+    db.command('profile', 0)
+    db.drop_collection('system.profile')
+    start = datetime.now(timezone.utc)
+    db.command('profile', 2)
+    yield
+    db.command('profile', 0)
+    entries = list(db['system.profile'].find(
+        {'ts': {'$gte': start}, 'ns': {'$not': {'$regex': r'\.system\.'}}},
+        {'op': 1, 'ns': 1, 'millis': 1, 'planSummary': 1, 'docsExamined': 1,
+         'keysExamined': 1, 'nreturned': 1, 'command': 1}))
+    request.config.mongo_profiles.append((request.node.nodeid, entries))
+
+
+def summarize_profile(profiles):
+    """Aggregate profiler entries per collection across all tests."""
+    collections = defaultdict(lambda: {
+        'ops': 0, 'millis': 0, 'examined': 0, 'returned': 0,
+        'collscans': 0, 'entries': [],
+    })
+    for nodeid, entries in profiles:
+        for entry in entries:
+            stats = collections[entry.get('ns', '?')]
+            stats['ops'] += 1
+            stats['millis'] += entry.get('millis', 0)
+            stats['examined'] += entry.get('docsExamined', 0)
+            stats['returned'] += entry.get('nreturned', 0)
+            if entry.get('planSummary', '').startswith('COLLSCAN'):
+                stats['collscans'] += 1
+            stats['entries'].append((nodeid, entry))
+    return collections
+
+
+def describe_op(entry):
+    command = dict(entry.get('command', {}))
+    for key in ('lsid', '$db', '$clusterTime', '$readPreference', 'documents',
+                'updates', 'deletes'):
+        command.pop(key, None)
+    return '{} {} {}'.format(entry.get('op'), entry.get('planSummary', '-'),
+                             command)[:160]
+
+
+@pytest.fixture(scope='session', autouse=True)
+def shared_networks():
+    """Stop the networks reused across modules at the end of the session."""
+    yield
+    from tests.helpers import stop_shared_networks
+    stop_shared_networks()
+
+
+@pytest.fixture(scope='session', autouse=True)
+def shared_mongo_clients(request):
+    """Close the process-wide MongoClients once every test is done."""
+    yield
+    from tests.helpers import POOL_METRICS, close_mongo_clients
+    close_mongo_clients()
+    request.config.mongo_pool_stats = POOL_METRICS.stats()
 
 
 @pytest.hookimpl(hookwrapper=True)
@@ -8,6 +124,12 @@ def pytest_runtest_makereport(item, call):
     report = outcome.get_result()
     report.start = call.start
     report.stop = call.stop
+    controller = getattr(getattr(item.cls, 'net', None), 'controller', None)
+    if controller is not None and controller.crashed and call.when == 'call':
+        exited_at = datetime.fromtimestamp(controller.exited_at)
+        report.sections.append(
+            ('kytosd', 'kytosd (pid {}) exited unexpectedly at {:%Y-%m-%d,%H:%M:%S.%f}'.format(controller.pid, exited_at))
+        )
 
 def pytest_terminal_summary(terminalreporter):
     terminalreporter.ensure_newline()
@@ -18,3 +140,55 @@ def pytest_terminal_summary(terminalreporter):
                 start = datetime.fromtimestamp(report.start)
                 stop = datetime.fromtimestamp(report.stop)
                 terminalreporter.write_line('{id:20}: {start:%Y-%m-%d,%H:%M:%S.%f} - {stop:%Y-%m-%d,%H:%M:%S.%f}'.format(id=report.nodeid, start=start, stop=stop))
+
+    pool_stats = terminalreporter.config.mongo_pool_stats
+    if pool_stats and pool_stats.get('checkouts'):
+        terminalreporter.section('mongo connection pools', sep='-', bold=True)
+        wait = pool_stats.pop('checkout_wait')
+        for name, value in sorted(pool_stats.items()):
+            terminalreporter.write_line('{:20}: {}'.format(name, value))
+        terminalreporter.write_line(
+            'checkout wait       : mean {mean:.6f}s p99 {p99:.6f}s '
+            'max {max:.6f}s'.format(**wait))
+
+    profiles = terminalreporter.config.mongo_profiles
+    if not profiles:
+        return
+    config = terminalreporter.config
+    slowms = config.getoption('mongo_profile_slowms')
+    top = config.getoption('mongo_profile_top')
+    terminalreporter.section('mongo profile', sep='-', bold=True)
+    terminalreporter.write_line('DB time per test:')
+    for nodeid, entries in sorted(
+            profiles, key=lambda p: -sum(e.get('millis', 0) for e in p[1])):
+        terminalreporter.write_line('  {:>8}ms {:>6} ops  {}'.format(
+            sum(e.get('millis', 0) for e in entries), len(entries), nodeid))
+    collections = summarize_profile(profiles)
+    terminalreporter.write_line(
+        '{:40} {:>7} {:>9} {:>10} {:>9} {:>9}'.format(
+            'collection', 'ops', 'total ms', 'examined', 'returned',
+            'COLLSCAN'))
+    for ns, stats in sorted(collections.items(),
+                            key=lambda item: -item[1]['millis']):
+        terminalreporter.write_line(
+            '{:40} {ops:>7} {millis:>9} {examined:>10} {returned:>9} '
+            '{collscans:>9}'.format(ns, **stats))
+        slowest = sorted(stats['entries'],
+                         key=lambda item: -item[1].get('millis', 0))
+        for nodeid, entry in slowest[:top]:
+            if entry.get('millis', 0) < slowms:
+                break
+            terminalreporter.write_line('    {:>6}ms {} ({})'.format(
+                entry['millis'], describe_op(entry), nodeid))
+        collscans = defaultdict(lambda: [0, 0, 0])
+        for _, entry in stats['entries']:
+            if entry.get('planSummary', '').startswith('COLLSCAN'):
+                scan = collscans[describe_op(entry)]
+                scan[0] += 1
+                scan[1] += entry.get('docsExamined', 0)
+                scan[2] += entry.get('nreturned', 0)
+        for op, (count, examined, returned) in sorted(
+                collscans.items(), key=lambda item: -item[1][1])[:top]:
+            terminalreporter.write_line(
+                '    COLLSCAN x{} examined {} returned {}: {}'.format(
+                    count, examined, returned, op))
@@ -0,0 +1,252 @@
+"""Measure data-plane loss with sequence-numbered UDP packets.
+
+A sender in one Mininet host emits packets at a fixed rate; each one
+carries its sequence number and send time. A receiver in another host
+records what arrives. From that, ``analyze`` gives the exact loss
+windows (the send times of the last packet before and the first packet
+after each gap), reordering and duplicates::
+
+    with LossProbe(h1, h3, '101.0.0.3', rate=10000) as probe:
+        time.sleep(5)
+        net.configLinkStatus('s1', 's2', 'down')
+    report = probe.report()
+    outage = report['outage']
+
+The hosts share the test's clock, so send times can be compared with
+the moment a fault was injected. Run as a module it is the program
+started inside the hosts::
+
+    python -m tests.dataplane_probe send 101.0.0.3 --rate 10000 --duration 20
+    python -m tests.dataplane_probe receive /tmp/probe.bin --duration 22
+"""
+import argparse
+import os
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+PORT = 50505
+# sequence number and send time, padded to a minimum Ethernet payload
+PACKET = struct.Struct('!Qd')
+PAYLOAD_SIZE = 64
+# sequence number, send time, receive time
+RECORD = struct.Struct('Qdd')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def send(address, rate, duration, port=PORT):
+    """Send ``rate`` packets per second for ``duration`` seconds.
+
+    Packets are paced against an absolute schedule, so a late packet is
+    followed by a short burst rather than drifting the rate. Returns the
+    number of packets sent.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    padding = bytes(PAYLOAD_SIZE - PACKET.size)
+    interval = 1.0 / rate
+    total = int(rate * duration)
+    start = time.perf_counter()
+    for seq in range(total):
+        due = start + seq * interval
+        delay = due - time.perf_counter()
+        if delay > 0.001:
+            time.sleep(delay - 0.001)
+        while time.perf_counter() < due:
+            pass
+        try:
+            sock.sendto(PACKET.pack(seq, time.time()) + padding,
+                        (address, port))
+        except OSError:
+            # e.g. ENOBUFS or no route: the packet counts as lost
+            pass
+    sock.close()
+    return total
+
+
+def receive(output, duration, port=PORT):
+    """Record every packet received within ``duration`` seconds."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 * 1024 * 1024)
+    sock.bind(('0.0.0.0', port))
+    deadline = time.monotonic() + duration
+    records = []
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        sock.settimeout(remaining)
+        try:
+            data = sock.recv(2048)
+        except socket.timeout:
+            break
+        received_at = time.time()
+        if len(data) >= PACKET.size:
+            records.append(PACKET.unpack_from(data) + (received_at,))
+    sock.close()
+    with open(output, 'wb') as f:
+        for record in records:
+            f.write(RECORD.pack(*record))
+    return len(records)
+
+
+def read_records(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    return [RECORD.unpack_from(data, offset)
+            for offset in range(0, len(data), RECORD.size)]
+
+
+def analyze(records, sent, rate):
+    """Loss, duplicates, reordering and outage windows of a probe run.
+
+    ``records`` are ``(seq, sent_at, received_at)`` in arrival order and
+    ``sent`` the number of packets the sender emitted. Each entry of
+    ``gaps`` covers a run of missing sequence numbers; its ``duration``
+    runs from the send time of the last packet delivered before the run
+    to that of the first one delivered after it, minus one interval, so
+    it is the time during which traffic sent into the network was lost.
+    Runs at the start or the end of the test count one interval per
+    missing packet.
+    """
+    interval = 1.0 / rate
+    first = {}
+    duplicates = reordered = 0
+    highest = -1
+    for seq, sent_at, received_at in records:
+        if seq in first:
+            duplicates += 1
+            continue
+        first[seq] = (sent_at, received_at)
+        if seq < highest:
+            reordered += 1
+        highest = max(highest, seq)
+
+    gaps = []
+    previous = None
+    for seq in sorted(first) + [sent]:
+        expected = 0 if previous is None else previous + 1
+        if seq > expected:
+            lost = seq - expected
+            if previous is not None and seq < sent:
+                duration = first[seq][0] - first[previous][0] - interval
+            else:
+                duration = lost * interval
+            gaps.append({
+                'first_seq': expected,
+                'lost': lost,
+                'begin': (first[previous][0] + interval
+                          if previous is not None else None),
+                'duration': duration,
+            })
+        previous = seq
+
+    latencies = sorted(received_at - sent_at
+                       for sent_at, received_at in first.values())
+    return {
+        'rate': rate,
+        'sent': sent,
+        'received': len(first),
+        'lost': sent - len(first),
+        'duplicates': duplicates,
+        'reordered': reordered,
+        'gaps': gaps,
+        'outage': max((gap['duration'] for gap in gaps), default=0.0),
+        'total_outage': sum(gap['duration'] for gap in gaps),
+        'latency_p50': latencies[len(latencies) // 2] if latencies else None,
+        'latency_max': latencies[-1] if latencies else None,
+    }
+
+
+def probe_command(*args):
+    return [sys.executable, '-m', 'tests.dataplane_probe', *map(str, args)]
+
+
+class LossProbe:
+    """Run a sender in ``src`` and a receiver in ``dst`` (Mininet hosts).
+
+    The receiver listens for ``duration + grace`` seconds; the sender
+    starts right after it and runs for ``duration`` seconds. ``started_at``
+    is the wall clock time the sender was launched.
+    """
+
+    def __init__(self, src, dst, address, rate=10000, duration=20,
+                 grace=2, port=PORT):
+        self.src = src
+        self.dst = dst
+        self.address = address
+        self.rate = rate
+        self.duration = duration
+        self.grace = grace
+        self.port = port
+        self.started_at = None
+        self._output = None
+        self._sender = None
+        self._receiver = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.wait()
+
+    def start(self):
+        fd, self._output = tempfile.mkstemp(prefix='probe-', suffix='.bin')
+        os.close(fd)
+        self._receiver = self.dst.popen(
+            probe_command('receive', self._output, '--port', self.port,
+                          '--duration', self.duration + self.grace),
+            cwd=ROOT)
+        # let the receiver bind before the first packet leaves
+        time.sleep(0.5)
+        self.started_at = time.time()
+        self._sender = self.src.popen(
+            probe_command('send', self.address, '--port', self.port,
+                          '--rate', self.rate, '--duration', self.duration),
+            cwd=ROOT)
+
+    def wait(self):
+        timeout = self.duration + self.grace + 30
+        for proc in (self._sender, self._receiver):
+            try:
+                proc.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+
+    def report(self):
+        """Analysis of the run (see ``analyze``); removes the record file."""
+        try:
+            records = read_records(self._output)
+        finally:
+            os.remove(self._output)
+        result = analyze(records, int(self.rate * self.duration), self.rate)
+        result['started_at'] = self.started_at
+        return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    sender = commands.add_parser('send')
+    sender.add_argument('address')
+    sender.add_argument('--rate', type=float, default=10000)
+    sender.add_argument('--duration', type=float, default=20)
+    sender.add_argument('--port', type=int, default=PORT)
+    receiver = commands.add_parser('receive')
+    receiver.add_argument('output')
+    receiver.add_argument('--duration', type=float, default=22)
+    receiver.add_argument('--port', type=int, default=PORT)
+    args = parser.parse_args(argv)
+    if args.command == 'send':
+        send(args.address, args.rate, args.duration, args.port)
+    else:
+        receive(args.output, args.duration, args.port)
+
+
+if __name__ == '__main__':
+    main()
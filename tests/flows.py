@@ -0,0 +1,627 @@
+"""Parser for ``ovs-ofctl dump-flows`` output.
+
+``parse_flows(sw.dpctl('dump-flows'))`` turns the text into a FlowTable
+of compact Flow records, so tests can assert on exact flow sets instead
+of splitting strings::
+
+    table = parse_flows(s1.dpctl('dump-flows'))
+    assert table.find({'in_port': 1, 'dl_vlan': 100})
+
+Parsing is line by line; ``stream_dump_flows`` reads ovs-ofctl output
+straight from a pipe so very large tables never exist as one string.
+``snapshot_flows`` dumps many switches at once and ``FlowMonitor``
+follows flow table changes as they happen; ``OpenFlowSnoop`` counts the
+OpenFlow messages (e.g. FlowMods) the controller sends.
+"""
+import re
+import subprocess
+import sys
+import threading
+import time
+
+# fields printed before the match that describe the entry, not the match
+FLOW_FIELDS = {
+    'cookie', 'duration', 'table', 'n_packets', 'n_bytes', 'idle_age',
+    'hard_age', 'idle_timeout', 'hard_timeout', 'importance', 'priority',
+    'reset_counts', 'send_flow_rem', 'check_overlap', 'no_packet_counts',
+    'no_byte_counts', 'out_port',
+}
+
+# ovs-ofctl shorthands and the match fields they stand for
+PROTOCOLS = {
+    'ip': (('dl_type', 0x0800),),
+    'ipv6': (('dl_type', 0x86dd),),
+    'arp': (('dl_type', 0x0806),),
+    'rarp': (('dl_type', 0x8035),),
+    'mpls': (('dl_type', 0x8847),),
+    'icmp': (('dl_type', 0x0800), ('nw_proto', 1)),
+    'icmp6': (('dl_type', 0x86dd), ('nw_proto', 58)),
+    'tcp': (('dl_type', 0x0800), ('nw_proto', 6)),
+    'udp': (('dl_type', 0x0800), ('nw_proto', 17)),
+    'sctp': (('dl_type', 0x0800), ('nw_proto', 132)),
+    'tcp6': (('dl_type', 0x86dd), ('nw_proto', 6)),
+    'udp6': (('dl_type', 0x86dd), ('nw_proto', 17)),
+}
+
+PORT_NAME = re.compile(r'^[^-\s]+-eth(\d+)$')
+ACTION_SPLIT = re.compile(r',(?![^()\[\]]*[)\]])')
+PORT_IN_ACTION = re.compile(r'"?[^-\s:"]+-eth(\d+)"?')
+
+
+def normalize_value(value):
+    """Strip quotes and turn port names and numbers into ints.
+
+    ``"s1-eth2"`` becomes ``2`` (Mininet numbers ports after the
+    interface), ``100`` and ``0x88cc`` become ints, masks stay strings.
+    """
+    value = value.strip('"')
+    port = PORT_NAME.match(value)
+    if port:
+        return int(port.group(1))
+    try:
+        return int(value, 0)
+    except ValueError:
+        return value
+
+
+def normalize_action(action):
+    """``output:"s1-eth2"`` -> ``output:2``; other actions unchanged."""
+    return sys.intern(PORT_IN_ACTION.sub(lambda m: m.group(1), action))
+
+
+class Flow:
+    """One flow entry of a dump-flows reply."""
+
+    __slots__ = ('cookie', 'table', 'priority', 'match', 'actions',
+                 'n_packets', 'n_bytes', 'duration')
+
+    def __init__(self, cookie=0, table=0, priority=32768, match=(),
+                 actions=(), n_packets=0, n_bytes=0, duration=0.0):
+        self.cookie = cookie
+        self.table = table
+        self.priority = priority
+        self.match = match
+        self.actions = actions
+        self.n_packets = n_packets
+        self.n_bytes = n_bytes
+        self.duration = duration
+
+    @property
+    def key(self):
+        """Identity of the entry on the switch: table, priority, match."""
+        return (self.table, self.priority, self.match)
+
+    def match_dict(self):
+        return dict(self.match)
+
+    def __eq__(self, other):
+        if not isinstance(other, Flow):
+            return NotImplemented
+        return (self.cookie, self.key, self.actions) == \
+            (other.cookie, other.key, other.actions)
+
+    def __hash__(self):
+        return hash((self.cookie, self.key, self.actions))
+
+    def __repr__(self):
+        match = ','.join('%s=%s' % item for item in self.match)
+        return 'Flow(cookie=%#x, table=%s, priority=%s, %s actions=%s)' % (
+            self.cookie, self.table, self.priority, match,
+            ','.join(self.actions))
+
+
+def match_key(match):
+    """Normalized, hashable form of a match dict or ovs match string."""
+    if isinstance(match, str):
+        return parse_match(match)
+    return tuple(sorted(
+        (sys.intern(k), normalize_value(v) if isinstance(v, str) else v)
+        for k, v in match.items()
+    ))
+
+
+def parse_match(text):
+    """Parse a ``k=v,proto,...`` match string into a sorted tuple."""
+    items = {}
+    for token in text.split(','):
+        token = token.strip()
+        if not token:
+            continue
+        name, sep, value = token.partition('=')
+        if not sep:
+            items.update(PROTOCOLS.get(name, ((name, True),)))
+        else:
+            items[name] = normalize_value(value)
+    return tuple(sorted((sys.intern(k), v) for k, v in items.items()))
+
+
+def parse_flow(line):
+    """Parse one dump-flows line, or return None for non-flow lines."""
+    head, sep, actions = line.strip().partition(' actions=')
+    if not sep:
+        return None
+    flow = Flow(actions=tuple(normalize_action(a) for a in
+                              ACTION_SPLIT.split(actions.strip()) if a))
+    match = []
+    for token in head.split(','):
+        token = token.strip()
+        name, _, value = token.partition('=')
+        if name not in FLOW_FIELDS:
+            match.append(token)
+        elif name == 'cookie':
+            flow.cookie = int(value, 16)
+        elif name == 'table':
+            flow.table = int(value)
+        elif name == 'priority':
+            flow.priority = int(value)
+        elif name == 'n_packets':
+            flow.n_packets = int(value)
+        elif name == 'n_bytes':
+            flow.n_bytes = int(value)
+        elif name == 'duration':
+            flow.duration = float(value.rstrip('s'))
+    flow.match = parse_match(','.join(match))
+    return flow
+
+
+def iter_flows(lines):
+    """Yield Flow records from dump-flows text or an iterable of lines."""
+    if isinstance(lines, str):
+        lines = (m.group(0) for m in re.finditer(r'[^\r\n]+', lines))
+    for line in lines:
+        flow = parse_flow(line)
+        if flow is not None:
+            yield flow
+
+
+class FlowTable:
+    """Flows of one switch indexed by cookie and by match."""
+
+    def __init__(self, flows=()):
+        self.flows = []
+        self.by_cookie = {}
+        self.by_match = {}
+        for flow in flows:
+            self.add(flow)
+
+    def add(self, flow):
+        self.flows.append(flow)
+        self.by_cookie.setdefault(flow.cookie, []).append(flow)
+        self.by_match.setdefault(flow.match, []).append(flow)
+
+    def __len__(self):
+        return len(self.flows)
+
+    def __iter__(self):
+        return iter(self.flows)
+
+    def __contains__(self, flow):
+        return flow in self.by_match.get(flow.match, ())
+
+    def cookies(self, cookie):
+        """Flows installed with ``cookie``."""
+        return self.by_cookie.get(cookie, [])
+
+    def find(self, match=None, table=None, priority=None, cookie=None,
+             actions=None):
+        """Flows matching every criterion given.
+
+        ``match`` is compared exactly against the normalized match (dict
+        or ovs match string); ``actions`` is a list of action strings.
+        """
+        if match is not None:
+            candidates = self.by_match.get(match_key(match), [])
+        elif cookie is not None:
+            candidates = self.cookies(cookie)
+        else:
+            candidates = self.flows
+        if actions is not None:
+            actions = tuple(normalize_action(a) for a in actions)
+        return [
+            flow for flow in candidates
+            if (table is None or flow.table == table)
+            and (priority is None or flow.priority == priority)
+            and (cookie is None or flow.cookie == cookie)
+            and (actions is None or flow.actions == actions)
+        ]
+
+    def match_set(self):
+        """Set of (table, priority, match) keys, for exact comparisons."""
+        return {flow.key for flow in self.flows}
+
+
+def parse_flows(lines):
+    """Build a FlowTable from dump-flows text or lines."""
+    return FlowTable(iter_flows(lines))
+
+
+def stream_dump_flows(bridge, *args):
+    """Run ``ovs-ofctl dump-flows`` and parse its output as it streams."""
+    proc = subprocess.Popen(['ovs-ofctl', 'dump-flows', bridge, *args],
+                            stdout=subprocess.PIPE, text=True)
+    try:
+        return parse_flows(proc.stdout)
+    finally:
+        proc.stdout.close()
+        proc.wait()
+
+
+AGGREGATE = re.compile(r'(packet_count|byte_count|flow_count)=(\d+)')
+
+
+class OfctlError(Exception):
+    """Raised when an ovs-ofctl command exits with an error."""
+
+
+class FlowSnapshot:
+    """Flow tables (or aggregate counters) of many switches at one instant.
+
+    ``tables`` maps switch name to FlowTable; in aggregate mode
+    ``aggregates`` maps switch name to its packet/byte/flow counts.
+    ``timestamp`` is when the dumps were started and ``duration`` how
+    long the whole round trip took.
+    """
+
+    def __init__(self, timestamp, duration=0.0, tables=None, aggregates=None):
+        self.timestamp = timestamp
+        self.duration = duration
+        self.tables = tables or {}
+        self.aggregates = aggregates or {}
+
+    def __getitem__(self, name):
+        return self.tables[name]
+
+    def count(self, name):
+        """Number of flows on switch ``name``."""
+        if name in self.aggregates:
+            return self.aggregates[name]['flow_count']
+        return len(self.tables[name])
+
+    def counts(self):
+        names = self.aggregates or self.tables
+        return {name: self.count(name) for name in names}
+
+    def total(self):
+        return sum(self.counts().values())
+
+
+def switch_name(switch):
+    """Name tests use for ``switch`` (unprefixed on isolated instances)."""
+    return getattr(switch, 'alias', switch.name)
+
+
+def ofctl_command(switch, command, *args):
+    """ovs-ofctl argv for ``switch``, as Mininet's dpctl would run it."""
+    argv = ['ovs-ofctl']
+    protocols = getattr(switch, 'protocols', None)
+    if protocols:
+        argv += ['-O', protocols]
+    return argv + [command, switch.name, *args]
+
+
+def snapshot_flows(switches, flow_filter=None, aggregate=False, timeout=30):
+    """Dump the flows of all ``switches`` concurrently.
+
+    One ovs-ofctl process per switch is started at once and the outputs
+    are parsed as they are read, so the snapshot costs about one round
+    trip regardless of the number of switches. ``flow_filter`` is an
+    ovs-ofctl flow spec (e.g. ``'dl_vlan=101'`` or ``'cookie=0x1/-1'``);
+    ``aggregate=True`` uses dump-aggregate for count-only assertions.
+    Raises OfctlError with ovs-ofctl's stderr if a dump fails.
+    """
+    command = 'dump-aggregate' if aggregate else 'dump-flows'
+    args = [flow_filter] if flow_filter else []
+    timestamp = time.time()
+    start = time.monotonic()
+    procs = {
+        switch_name(sw): subprocess.Popen(ofctl_command(sw, command, *args),
+                                  stdout=subprocess.PIPE,
+                                  stderr=subprocess.PIPE, text=True)
+        for sw in switches
+    }
+    snapshot = FlowSnapshot(timestamp)
+    try:
+        for name, proc in procs.items():
+            if aggregate:
+                output, errors = proc.communicate(timeout=timeout)
+                snapshot.aggregates[name] = {
+                    key: int(value) for key, value in AGGREGATE.findall(output)
+                }
+            else:
+                snapshot.tables[name] = parse_flows(proc.stdout)
+                # stderr is a few lines at most, it can't block the dump
+                _, errors = proc.communicate(timeout=timeout)
+            if proc.returncode != 0:
+                raise OfctlError('ovs-ofctl %s on %s exited with %s: %s' % (
+                    command, name, proc.returncode, errors.strip()))
+    finally:
+        for proc in procs.values():
+            if proc.poll() is None:
+                proc.kill()
+            proc.stdout.close()
+            proc.stderr.close()
+    snapshot.duration = time.monotonic() - start
+    return snapshot
+
+
+def clear_flows(switches, flow_filter=None, timeout=30):
+    """Run ``ovs-ofctl del-flows`` on all ``switches`` concurrently."""
+    args = [flow_filter] if flow_filter else []
+    procs = [subprocess.Popen(ofctl_command(sw, 'del-flows', *args))
+             for sw in switches]
+    for proc in procs:
+        proc.wait(timeout=timeout)
+
+
+class FlowEvent:
+    """One flow table change reported by ``ovs-ofctl monitor``."""
+
+    __slots__ = ('switch', 'event', 'flow', 'timestamp')
+
+    def __init__(self, switch, event, flow, timestamp):
+        self.switch = switch
+        self.event = event
+        self.flow = flow
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return 'FlowEvent(%s %s %r at %.6f)' % (
+            self.switch, self.event, self.flow, self.timestamp)
+
+
+def parse_monitor_event(line):
+    """Parse an ``event=ADDED table=0 cookie=0 priority=..`` line.
+
+    Returns ``(event, Flow)`` or None for headers and other lines.
+    """
+    line = line.strip()
+    if not line.startswith('event='):
+        return None
+    head, _, actions = line.partition(' actions=')
+    tokens = head.split()
+    event = tokens[0].partition('=')[2]
+    fields = ', '.join(t for t in tokens[1:] if not t.startswith('reason='))
+    flow = parse_flow('%s actions=%s' % (fields, actions))
+    return event, flow
+
+
+class FlowMonitor:
+    """Follow flow table changes of switches as they happen.
+
+    One ``ovs-ofctl monitor <bridge> watch:`` process per switch streams
+    ADDED/DELETED/MODIFIED events; each one is stamped on arrival, which
+    gives the time a flow actually reached the switch::
+
+        with FlowMonitor([s1]) as monitor:
+            start = time.time()
+            requests.post(...)
+            added = monitor.wait_added('s1', [{"in_port": 1, "dl_vlan": 100}])
+        install_time = added[0].timestamp - start
+
+    Flows present when the monitor starts are reported as INITIAL.
+    """
+
+    def __init__(self, switches):
+        self.switches = list(switches)
+        self.events = []
+        self._procs = {}
+        self._ready = set()
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self, timeout=10):
+        """Start the monitors and wait until all of them are subscribed."""
+        for sw in self.switches:
+            proc = subprocess.Popen(ofctl_command(sw, 'monitor', 'watch:'),
+                                    stdout=subprocess.PIPE, text=True)
+            self._procs[switch_name(sw)] = proc
+            threading.Thread(target=self._read, args=(switch_name(sw), proc),
+                             daemon=True).start()
+        with self._cond:
+            if not self._cond.wait_for(
+                    lambda: len(self._ready) == len(self._procs), timeout):
+                self.stop()
+                raise TimeoutError('ovs-ofctl monitor did not start on %s'
+                                   % sorted(set(self._procs) - self._ready))
+
+    def stop(self):
+        for proc in self._procs.values():
+            if proc.poll() is None:
+                proc.terminate()
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+        self._procs = {}
+
+    def _read(self, name, proc):
+        for line in proc.stdout:
+            timestamp = time.time()
+            parsed = parse_monitor_event(line)
+            with self._cond:
+                # the first reply is the initial table: we are subscribed
+                self._ready.add(name)
+                if parsed is not None:
+                    event, flow = parsed
+                    self.events.append(FlowEvent(name, event, flow, timestamp))
+                self._cond.notify_all()
+        proc.stdout.close()
+
+    def select(self, switch=None, event=None, since=None, match=None):
+        """Events filtered by switch, event type, time and exact match."""
+        key = match_key(match) if match is not None else None
+        with self._cond:
+            return [
+                e for e in self.events
+                if (switch is None or e.switch == switch)
+                and (event is None or e.event == event)
+                and (since is None or e.timestamp >= since)
+                and (key is None or e.flow.match == key)
+            ]
+
+    def wait(self, predicate, timeout=30):
+        """Wait until ``predicate(events)`` is truthy and return its value."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                result = predicate(self.events)
+                if result:
+                    return result
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError('Timeout after %ss waiting for flow '
+                                       'events' % timeout)
+                self._cond.wait(remaining)
+
+    def _wait_matches(self, switch, matches, event, since, timeout):
+        keys = [match_key(m) for m in matches]
+
+        def found(events):
+            first = {}
+            for e in events:
+                if e.switch == switch and e.event == event \
+                        and (since is None or e.timestamp >= since) \
+                        and e.flow.match in keys and e.flow.match not in first:
+                    first[e.flow.match] = e
+            if len(first) == len(keys):
+                return [first[k] for k in keys]
+            return None
+        return self.wait(found, timeout)
+
+    def wait_added(self, switch, matches, since=None, timeout=30):
+        """Wait until every match in ``matches`` was ADDED on ``switch``.
+
+        Returns the first matching event per match, in order.
+        """
+        return self._wait_matches(switch, matches, 'ADDED', since, timeout)
+
+    def wait_removed(self, switch, matches, since=None, timeout=30):
+        """Wait until every match in ``matches`` was DELETED on ``switch``."""
+        return self._wait_matches(switch, matches, 'DELETED', since, timeout)
+
+    def wait_count(self, switch, count, event='ADDED', since=None,
+                   timeout=30):
+        """Wait until ``count`` events of type ``event`` hit ``switch``."""
+        def enough(events):
+            selected = [e for e in events
+                        if e.switch == switch and e.event == event
+                        and (since is None or e.timestamp >= since)]
+            return selected if len(selected) >= count else None
+        return self.wait(enough, timeout)
+
+
+OPENFLOW_MESSAGE = re.compile(
+    r'^(OFPT_\w+) \(OF[\d.]+\) \(xid=0x[0-9a-f]+\):\s*(\S*)')
+
+
+class OpenFlowMessage:
+    """One controller-to-switch or switch-to-controller message."""
+
+    __slots__ = ('switch', 'type', 'command', 'timestamp')
+
+    def __init__(self, switch, type_, command, timestamp):
+        self.switch = switch
+        self.type = type_
+        self.command = command
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return 'OpenFlowMessage(%s %s %s at %.6f)' % (
+            self.switch, self.type, self.command, self.timestamp)
+
+
+def parse_snoop_line(line):
+    """Parse the first line of an ``ovs-ofctl snoop`` message.
+
+    Returns ``(type, command)``, e.g. ``('OFPT_FLOW_MOD', 'ADD')``, or
+    None for continuation lines. ``command`` is only meaningful for
+    FlowMods.
+    """
+    found = OPENFLOW_MESSAGE.match(line)
+    if found is None:
+        return None
+    type_, command = found.groups()
+    if type_ != 'OFPT_FLOW_MOD':
+        command = ''
+    return type_, command
+
+
+class OpenFlowSnoop:
+    """Record the OpenFlow messages of the switches' controller connections.
+
+    One ``ovs-ofctl snoop <bridge>`` process per switch mirrors both
+    directions of the connection, and it keeps following the bridge
+    across controller reconnects, so FlowMods sent while kytosd restarts
+    can be counted::
+
+        with OpenFlowSnoop(net.switches) as snoop:
+            start = time.time()
+            ...
+        flow_mods = snoop.select(type_='OFPT_FLOW_MOD', since=start)
+
+    Only the message type and the FlowMod command are kept.
+    """
+
+    def __init__(self, switches):
+        self.switches = list(switches)
+        self.messages = []
+        self._procs = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        for sw in self.switches:
+            proc = subprocess.Popen(ofctl_command(sw, 'snoop'),
+                                    stdout=subprocess.PIPE,
+                                    stderr=subprocess.STDOUT, text=True)
+            self._procs[switch_name(sw)] = proc
+            threading.Thread(target=self._read, args=(switch_name(sw), proc),
+                             daemon=True).start()
+
+    def stop(self):
+        for proc in self._procs.values():
+            if proc.poll() is None:
+                proc.terminate()
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+        self._procs = {}
+
+    def _read(self, name, proc):
+        for line in proc.stdout:
+            timestamp = time.time()
+            parsed = parse_snoop_line(line)
+            if parsed is not None:
+                with self._lock:
+                    self.messages.append(
+                        OpenFlowMessage(name, *parsed, timestamp))
+        proc.stdout.close()
+
+    def select(self, switch=None, type_=None, since=None, until=None):
+        """Messages filtered by switch, type and time window."""
+        with self._lock:
+            return [
+                m for m in self.messages
+                if (switch is None or m.switch == switch)
+                and (type_ is None or m.type == type_)
+                and (since is None or m.timestamp >= since)
+                and (until is None or m.timestamp <= until)
+            ]
+
+    def flow_mods(self, since=None, until=None):
+        return self.select(type_='OFPT_FLOW_MOD', since=since, until=until)
@@ -5,13 +5,153 @@ import mininet.clean
 from mock import patch
 import time
 import os
+import re
+import select
+import signal
+import socket
+import subprocess
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import requests
+from requests.adapters import HTTPAdapter
 
 from pymongo import MongoClient
 from pymongo.errors import ServerSelectionTimeoutError
+from pymongo.monitoring import ConnectionPoolListener
 
+from tests.flows import clear_flows, parse_flows, snapshot_flows
 
-class AmlightTopo(Topo):
+INSTANCE_SUFFIXES = '0123456789abcdefghijklmnopqrstuvwxyz'
+# set in NAPPS_DIR/kytos/storehouse/settings.py, so every kytosd on the
+# host shares it; only modules marked serial use the storehouse backend
+STOREHOUSE = '/var/tmp/kytos/storehouse'
+# the napps option of /etc/kytos/kytos.conf: enabled napps are linked as
+# NAPPS_DIR/<username>/<name>
+NAPPS_DIR = '/var/lib/kytos/napps'
+
+
+class Instance:
+    """Ports, names and paths of one isolated controller/network pair.
+
+    Instance 0 is the historical single setup (API 8181, OpenFlow 6653,
+    MONGO_DBNAME, unprefixed node names). Instance N > 0 uses API port
+    8181 + N, OpenFlow port 6653 + 1000 * N (switch listen ports move by
+    the same offset), database MONGO_DBNAME_wN and prefixes every Mininet
+    node with ``wN`` so bridges and veth names don't clash on the host.
+    Dpids stay the same unless ``dpid_offset`` is set: every instance has
+    its own controller and the e2e tests assert on fixed dpids.
+    """
+
+    def __init__(self, index=0, dpid_offset=0):
+        if not 0 <= index < len(INSTANCE_SUFFIXES):
+            raise ValueError('instance index must be in [0, %d)'
+                             % len(INSTANCE_SUFFIXES))
+        self.index = index
+        self.dpid_offset = dpid_offset
+        self.prefix = 'w' + INSTANCE_SUFFIXES[index] if index else ''
+        self.api_port = 8181 + index
+        self.of_port = 6653 + 1000 * index
+        self.port_offset = 1000 * index
+        self.api = 'http://127.0.0.1:%d/api/kytos' % self.api_port
+        db_name = os.environ.get("MONGO_DBNAME")
+        suffix = '-' + self.prefix if index else ''
+        self.db_name = db_name + '_' + self.prefix if index and db_name else db_name
+        self.pid_file = '/var/run/kytos/kytosd%s.pid' % suffix
+        self.conf_file = '/etc/kytos/kytos%s.conf' % suffix if index else None
+
+    @property
+    def isolated(self):
+        return self.index > 0
+
+    def write_conf(self, template='/etc/kytos/kytos.conf'):
+        """Write this instance's kytos.conf (API port, OpenFlow port, pid)."""
+        with open(template) as f:
+            conf = f.read()
+        for key, value in (('api_port', self.api_port), ('port', self.of_port),
+                           ('pidfile', self.pid_file)):
+            line = '%s = %s' % (key, value)
+            conf, found = re.subn(r'^%s\s*=.*$' % key, line, conf, flags=re.M)
+            if not found:
+                conf += '\n' + line + '\n'
+        with open(self.conf_file, 'w') as f:
+            f.write(conf)
+        return self.conf_file
+
+    def cleanup(self):
+        """Remove leftover bridges and links of this instance only.
+
+        mininet.clean.cleanup() would tear down every other instance.
+        """
+        bridges = subprocess.run(['ovs-vsctl', 'list-br'], capture_output=True,
+                                 text=True).stdout.split()
+        for bridge in bridges:
+            if bridge.startswith(self.prefix):
+                subprocess.call(['ovs-vsctl', '--if-exists', 'del-br', bridge])
+        links = subprocess.run(['ip', '-o', 'link', 'show'], capture_output=True,
+                               text=True).stdout.splitlines()
+        for link in links:
+            name = link.split(':')[1].strip().split('@')[0]
+            if name.startswith(self.prefix):
+                subprocess.call(['ip', 'link', 'del', name],
+                                stderr=subprocess.DEVNULL)
+
+
+def current_instance():
+    """Instance of this process: one per pytest-xdist worker.
+
+    Worker ``gwN`` gets instance N + 1; without xdist KYTOS_E2E_INSTANCE
+    picks one (default 0, the unsharded setup).
+    """
+    worker = os.environ.get('PYTEST_XDIST_WORKER')
+    if worker:
+        return Instance(int(worker[2:]) + 1)
+    return Instance(int(os.environ.get('KYTOS_E2E_INSTANCE', 0)))
+
+
+INSTANCE = current_instance()
+KYTOS_API = INSTANCE.api
+
+
+class InstanceTopo(Topo):
+    """Topo whose node names, listen ports and dpids follow an Instance."""
+
+    def __init__(self, instance=None, *args, **params):
+        self.instance = instance or Instance()
+        super().__init__(*args, **params)
+
+    def addSwitch(self, name, **opts):
+        instance = self.instance
+        if not instance.isolated and not instance.dpid_offset:
+            return super().addSwitch(name, **opts)
+        # Mininet derives the dpid from the first number in the name
+        dpid = opts.get('dpid') or '%x' % int(re.findall(r'\d+', name)[0])
+        opts['dpid'] = '%016x' % (int(dpid, 16) + instance.dpid_offset)
+        if 'listenPort' in opts:
+            opts['listenPort'] += instance.port_offset
+        opts['alias'] = name
+        return super().addSwitch(instance.prefix + name, **opts)
+
+    def addHost(self, name, **opts):
+        return super().addHost(self.instance.prefix + name, **opts)
+
+
+class InstanceOVSSwitch(OVSSwitch):
+    """OVSSwitch that reports its unprefixed name in dpctl output."""
+
+    def __init__(self, name, alias=None, **params):
+        self.alias = alias or name
+        super().__init__(name, **params)
+
+    def dpctl(self, *args):
+        output = super().dpctl(*args)
+        if self.alias != self.name:
+            output = output.replace(self.name + '-eth', self.alias + '-eth')
+        return output
+
+
+class AmlightTopo(InstanceTopo):
     """Amlight Topology."""
     def build(self):
         # Add switches
@@ -68,7 +208,7 @@ class AmlightTopo(Topo):
         self.addLink(h10, Ampath7, port1=1, port2=59)
         self.addLink(h11, JAX1, port1=1, port2=60)
 
-class RingTopo(Topo):
+class RingTopo(InstanceTopo):
     """Ring topology with three switches
     and one host connected to each switch"""
 
@@ -96,7 +236,7 @@ class RingTopo(Topo):
         self.addLink(s3, s1)
 
 
-class Ring4Topo(Topo):
+class Ring4Topo(InstanceTopo):
     """Create a network from semi-scratch with multiple controllers."""
 
     def build(self):
@@ -129,7 +269,7 @@ class Ring4Topo(Topo):
         self.addLink(s3, s4)
         self.addLink(s4, s1)
 
-class Looped(Topo):
+class Looped(InstanceTopo):
     """ Network with two switches
     and a loop in one switch."""
 
@@ -146,10 +286,10 @@ class Looped(Topo):
 # You can run any of the topologies above by doing:
 # mn --custom tests/helpers.py --topo ring --controller=remote,ip=127.0.0.1
 topos = {
-    'ring': (lambda: RingTopo()),
-    'ring4': (lambda: Ring4Topo()),
-    'amlight': (lambda: AmlightTopo()),
-    'looped': (lambda: Looped()),
+    'ring': (lambda **kwargs: RingTopo(**kwargs)),
+    'ring4': (lambda **kwargs: Ring4Topo(**kwargs)),
+    'amlight': (lambda **kwargs: AmlightTopo(**kwargs)),
+    'looped': (lambda **kwargs: Looped(**kwargs)),
 }
 
 
@@ -182,110 +322,1065 @@ def mongo_client(
     )
 
 
+class PoolMetrics(ConnectionPoolListener):
+    """Connection pool counters of the shared MongoClients."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.counters = defaultdict(int)
+        self.checkout_waits = []
+
+    def _count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def pool_created(self, event):
+        self._count('pools created')
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._count('pools cleared')
+
+    def pool_closed(self, event):
+        self._count('pools closed')
+
+    def connection_created(self, event):
+        self._count('connections created')
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._count('connections closed')
+
+    def connection_check_out_started(self, event):
+        # check-outs happen in the calling thread
+        self.local.started = time.monotonic()
+
+    def connection_check_out_failed(self, event):
+        self._count('checkouts failed')
+
+    def connection_checked_out(self, event):
+        wait = time.monotonic() - getattr(self.local, 'started', time.monotonic())
+        with self.lock:
+            self.counters['checkouts'] += 1
+            self.checkout_waits.append(wait)
+
+    def connection_checked_in(self, event):
+        pass
+
+    def stats(self):
+        """Counters plus a latency summary of check-out waits."""
+        with self.lock:
+            return dict(self.counters,
+                        checkout_wait=latency_summary(self.checkout_waits))
+
+
+POOL_METRICS = PoolMetrics()
+_mongo_clients = {}
+_mongo_clients_lock = threading.Lock()
+
+
+def shared_mongo_client(**options) -> MongoClient:
+    """One mongo_client() per distinct set of options for the whole process.
+
+    Every NetworkTest and tool asking for the same options gets the same
+    client, and so the same connection pool; close_mongo_clients() closes
+    them at the end of the session.
+    """
+    key = tuple(sorted((name, repr(value)) for name, value in options.items()))
+    with _mongo_clients_lock:
+        client = _mongo_clients.get(key)
+        if client is None:
+            client = mongo_client(**options, event_listeners=[POOL_METRICS])
+            _mongo_clients[key] = client
+        return client
+
+
+def close_mongo_clients():
+    with _mongo_clients_lock:
+        for client in _mongo_clients.values():
+            client.close()
+        _mongo_clients.clear()
+
+
+def latency_summary(samples):
+    """Count, mean, p50, p99 and max (seconds) of a latency list."""
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+    return {
+        'count': len(ordered),
+        'mean': sum(ordered) / len(ordered),
+        'p50': pct(0.50),
+        'p99': pct(0.99),
+        'max': ordered[-1],
+    }
+
+
+class KytosClient:
+    """Kytos REST API client on a pooled keep-alive requests.Session.
+
+    Napp methods return the ``requests.Response`` so tests keep asserting
+    on status codes. Every call records its latency under a label such as
+    ``'POST /mef_eline/v2/evc/'`` (ids replaced by placeholders).
+    """
+
+    def __init__(self, api=KYTOS_API, pool_size=100, timeout=30):
+        self.api = api
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.latencies = defaultdict(list)
+
+    def request(self, method, path, label=None, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        start = time.monotonic()
+        try:
+            return self.session.request(method, self.api + path, **kwargs)
+        finally:
+            label = '%s %s' % (method, label or path)
+            self.latencies[label].append(time.monotonic() - start)
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def patch(self, path, **kwargs):
+        return self.request('PATCH', path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request('DELETE', path, **kwargs)
+
+    def latency_stats(self):
+        """Latency summary for every label seen so far."""
+        return {label: latency_summary(samples)
+                for label, samples in self.latencies.items()}
+
+    def reset_latencies(self):
+        self.latencies.clear()
+
+    def close(self):
+        self.session.close()
+
+    # core
+    def status(self):
+        return self.get('/core/status/')
+
+    def napps_enabled(self):
+        return self.get('/core/napps_enabled/')
+
+    # topology v3
+    def switches(self):
+        return self.get('/topology/v3/switches')
+
+    def interfaces(self):
+        return self.get('/topology/v3/interfaces')
+
+    def links(self):
+        return self.get('/topology/v3/links')
+
+    def enable_switch(self, dpid):
+        return self.post('/topology/v3/switches/%s/enable' % dpid,
+                         label='/topology/v3/switches/<dpid>/enable')
+
+    def disable_switch(self, dpid):
+        return self.post('/topology/v3/switches/%s/disable' % dpid,
+                         label='/topology/v3/switches/<dpid>/disable')
+
+    def enable_switch_interfaces(self, dpid):
+        return self.post('/topology/v3/interfaces/switch/%s/enable' % dpid,
+                         label='/topology/v3/interfaces/switch/<dpid>/enable')
+
+    def enable_all_interfaces(self):
+        """Enable every interface of every switch known to topology."""
+        for dpid in self.switches().json().get('switches', {}):
+            self.enable_switch_interfaces(dpid)
+
+    def enable_link(self, link_id):
+        return self.post('/topology/v3/links/%s/enable' % link_id,
+                         label='/topology/v3/links/<id>/enable')
+
+    def disable_link(self, link_id):
+        return self.post('/topology/v3/links/%s/disable' % link_id,
+                         label='/topology/v3/links/<id>/disable')
+
+    def add_switch_metadata(self, dpid, metadata):
+        return self.post('/topology/v3/switches/%s/metadata' % dpid,
+                         json=metadata,
+                         label='/topology/v3/switches/<dpid>/metadata')
+
+    def add_interface_metadata(self, interface_id, metadata):
+        return self.post('/topology/v3/interfaces/%s/metadata' % interface_id,
+                         json=metadata,
+                         label='/topology/v3/interfaces/<id>/metadata')
+
+    # mef_eline v2
+    @staticmethod
+    def evc_payload(uni_a, uni_z, vlan_id, name=None, **extra):
+        payload = {
+            "name": name or "Vlan_%s" % vlan_id,
+            "enabled": True,
+            "dynamic_backup_path": True,
+            "uni_a": {
+                "interface_id": uni_a,
+                "tag": {"tag_type": 1, "value": vlan_id}
+            },
+            "uni_z": {
+                "interface_id": uni_z,
+                "tag": {"tag_type": 1, "value": vlan_id}
+            }
+        }
+        payload.update(extra)
+        return payload
+
+    def list_evcs(self):
+        return self.get('/mef_eline/v2/evc/')
+
+    def get_evc(self, circuit_id):
+        return self.get('/mef_eline/v2/evc/' + circuit_id,
+                        label='/mef_eline/v2/evc/<id>')
+
+    def create_evc(self, payload):
+        return self.post('/mef_eline/v2/evc/', json=payload)
+
+    def update_evc(self, circuit_id, payload):
+        return self.patch('/mef_eline/v2/evc/' + circuit_id, json=payload,
+                          label='/mef_eline/v2/evc/<id>')
+
+    def delete_evc(self, circuit_id):
+        return self.delete('/mef_eline/v2/evc/' + circuit_id,
+                           label='/mef_eline/v2/evc/<id>')
+
+    # flow_manager v2
+    def list_flows(self, dpid=None):
+        if dpid:
+            return self.get('/flow_manager/v2/flows/' + dpid,
+                            label='/flow_manager/v2/flows/<dpid>')
+        return self.get('/flow_manager/v2/flows')
+
+    def install_flows(self, flows, dpid=None):
+        if dpid:
+            return self.post('/flow_manager/v2/flows/' + dpid,
+                             json={"flows": flows},
+                             label='/flow_manager/v2/flows/<dpid>')
+        return self.post('/flow_manager/v2/flows', json={"flows": flows})
+
+    def delete_flows(self, flows, dpid=None):
+        if dpid:
+            return self.delete('/flow_manager/v2/flows/' + dpid,
+                               json={"flows": flows},
+                               label='/flow_manager/v2/flows/<dpid>')
+        return self.delete('/flow_manager/v2/flows', json={"flows": flows})
+
+    # maintenance
+    def list_maintenances(self):
+        return self.get('/maintenance')
+
+    def get_maintenance(self, mw_id):
+        return self.get('/maintenance/' + mw_id, label='/maintenance/<id>')
+
+    def create_maintenance(self, payload):
+        return self.post('/maintenance', json=payload)
+
+    def delete_maintenance(self, mw_id):
+        return self.delete('/maintenance/' + mw_id, label='/maintenance/<id>')
+
+    def end_maintenance(self, mw_id):
+        return self.patch('/maintenance/' + mw_id + '/end',
+                          label='/maintenance/<id>/end')
+
+    # of_lldp
+    def lldp_interfaces(self):
+        return self.get('/of_lldp/v1/interfaces/')
+
+    def lldp_polling_time(self):
+        return self.get('/of_lldp/v1/polling_time')
+
+    def enable_lldp(self, interfaces):
+        return self.post('/of_lldp/v1/interfaces/enable/',
+                         json={"interfaces": interfaces})
+
+    def disable_lldp(self, interfaces):
+        return self.post('/of_lldp/v1/interfaces/disable/',
+                         json={"interfaces": interfaces})
+
+    # pathfinder
+    def best_paths(self, source, destination, **params):
+        return self.post('/pathfinder/v2/',
+                         json=dict(source=source, destination=destination,
+                                   **params))
+
+
+@lru_cache(maxsize=None)
+def kytos_client(api=KYTOS_API):
+    """KytosClient shared by every test module talking to ``api``."""
+    return KytosClient(api)
+
+
+class WaitTimeout(Exception):
+    """Raised when a condition is not met before its deadline."""
+
+
+class Condition:
+    """Named readiness predicate.
+
+    Wraps a callable returning a truthy value when the condition holds.
+    Conditions can be combined with ``&`` and ``|``; the name is used on
+    timeout messages so a failed wait tells which part was not ready.
+    """
+
+    def __init__(self, func, name=None):
+        self.func = func
+        self.name = name or getattr(func, '__name__', repr(func))
+
+    def __call__(self):
+        return self.func()
+
+    def __and__(self, other):
+        return all_of(self, other)
+
+    def __or__(self, other):
+        return any_of(self, other)
+
+    def __repr__(self):
+        return 'Condition(%s)' % self.name
+
+
+def all_of(*conditions):
+    """Condition that holds when every one of ``conditions`` holds."""
+    conditions = [c if isinstance(c, Condition) else Condition(c)
+                  for c in conditions]
+    return Condition(lambda: all(c() for c in conditions),
+                     ' and '.join(c.name for c in conditions))
+
+
+def any_of(*conditions):
+    """Condition that holds when at least one of ``conditions`` holds."""
+    conditions = [c if isinstance(c, Condition) else Condition(c)
+                  for c in conditions]
+    return Condition(lambda: any(c() for c in conditions),
+                     ' or '.join(c.name for c in conditions))
+
+
+# pid file -> KytosProcess supervising the kytosd started with it
+_live_controllers = {}
+
+
+def wait_until(condition, timeout=30, interval=0.1, max_interval=2,
+               backoff=1.5, ignored=(Exception,)):
+    """Poll ``condition`` until it returns a truthy value and return it.
+
+    The polling interval starts at ``interval`` and grows by ``backoff``
+    up to ``max_interval``, but never sleeps past the deadline. Exceptions
+    listed in ``ignored`` (e.g. the controller API not being up yet) count
+    as "not ready". Raises WaitTimeout after ``timeout`` seconds, and
+    ControllerCrashed as soon as a supervised kytosd has died.
+    """
+    if not isinstance(condition, Condition):
+        condition = Condition(condition)
+    deadline = time.monotonic() + timeout
+    last_exc = None
+    while True:
+        for controller in list(_live_controllers.values()):
+            controller.check()
+        try:
+            result = condition()
+            if result:
+                return result
+        except ignored as exc:
+            last_exc = exc
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            msg = 'Timeout after %ss waiting for %s' % (timeout, condition.name)
+            if last_exc is not None:
+                msg += ' (last error: %r)' % last_exc
+            raise WaitTimeout(msg)
+        time.sleep(min(interval, remaining))
+        interval = min(interval * backoff, max_interval)
+
+
+def controller_running(api=KYTOS_API):
+    """Condition: kytosd core/status API reports running."""
+    def check():
+        response = requests.get(api + '/core/status/', timeout=1)
+        return response.json()['response'] == 'running'
+    return Condition(check, 'controller running')
+
+
+def switches_connected(net):
+    """Condition: every Mininet switch is connected to the controller."""
+    return Condition(lambda: all(sw.connected() for sw in net.switches),
+                     'switches connected')
+
+
+def links_discovered(count, api=KYTOS_API):
+    """Condition: at least ``count`` active links in topology/v3/links."""
+    def check():
+        response = requests.get(api + '/topology/v3/links', timeout=2)
+        links = response.json()['links'].values()
+        return sum(1 for link in links if link.get('active')) >= count
+    return Condition(check, '%s links discovered' % count)
+
+
+def evc_exists(circuit_id, api=KYTOS_API):
+    """Condition: mef_eline returns the EVC ``circuit_id``."""
+    def check():
+        response = requests.get(api + '/mef_eline/v2/evc/' + circuit_id,
+                                timeout=2)
+        return response.status_code == 200
+    return Condition(check, 'evc %s exists' % circuit_id)
+
+
+def evc_active(circuit_id, api=KYTOS_API):
+    """Condition: mef_eline reports the EVC ``circuit_id`` as active."""
+    def check():
+        response = requests.get(api + '/mef_eline/v2/evc/' + circuit_id,
+                                timeout=2)
+        return response.status_code == 200 and response.json()['active']
+    return Condition(check, 'evc %s active' % circuit_id)
+
+
+def evc_matches(circuit_id, api=KYTOS_API, **fields):
+    """Condition: EVC ``circuit_id`` has every field equal to ``fields``."""
+    def check():
+        response = requests.get(api + '/mef_eline/v2/evc/' + circuit_id,
+                                timeout=2)
+        evc = response.json()
+        return response.status_code == 200 and all(
+            evc.get(key) == value for key, value in fields.items())
+    return Condition(check, 'evc %s with %s' % (circuit_id, fields))
+
+
+def path_endpoints(path):
+    """[(endpoint_a id, endpoint_b id), ...] of a path payload or dict."""
+    return [(link['endpoint_a']['id'], link['endpoint_b']['id'])
+            for link in path]
+
+
+def evc_current_path(circuit_id, path, api=KYTOS_API):
+    """Condition: EVC ``circuit_id`` currently uses ``path`` (payload form)."""
+    def check():
+        response = requests.get(api + '/mef_eline/v2/evc/' + circuit_id,
+                                timeout=2)
+        evc = response.json()
+        return response.status_code == 200 and \
+            path_endpoints(evc['current_path']) == path_endpoints(path)
+    return Condition(check, 'evc %s on path %s' % (circuit_id,
+                                                   path_endpoints(path)))
+
+
+def evc_cookie(circuit_id):
+    """Cookie mef_eline uses for the flows of ``circuit_id``."""
+    return int('aa' + circuit_id, 16)
+
+
+def evc_switches(evc):
+    """dpids an EVC dict (as listed by mef_eline) has flows on."""
+    interfaces = [evc['uni_a']['interface_id'], evc['uni_z']['interface_id']]
+    for link in evc.get('current_path', []):
+        interfaces += [link['endpoint_a']['id'], link['endpoint_b']['id']]
+    return {iface.rsplit(':', 1)[0] for iface in interfaces}
+
+
+def format_dpid(dpid):
+    """'0000000000000011' -> '00:00:00:00:00:00:00:11'."""
+    dpid = '%016x' % int(dpid, 16)
+    return ':'.join(dpid[i:i + 2] for i in range(0, 16, 2))
+
+
+def evc_installed(circuit_id, net, api=KYTOS_API):
+    """Condition: EVC ``circuit_id`` is active and its flows are on the
+    UNI and path switches of Mininet ``net``."""
+    def check():
+        response = requests.get(api + '/mef_eline/v2/evc/' + circuit_id,
+                                timeout=2)
+        evc = response.json()
+        if response.status_code != 200 or not evc['active']:
+            return False
+        dpids = evc_switches(evc)
+        cookie = evc_cookie(circuit_id)
+        return all(parse_flows(sw.dpctl('dump-flows')).cookies(cookie)
+                   for sw in net.switches if format_dpid(sw.dpid) in dpids)
+    return Condition(check, 'evc %s installed' % circuit_id)
+
+
+def maintenance_status(mw_id, status, api=KYTOS_API):
+    """Condition: maintenance window ``mw_id`` is ``status`` (pending,
+    running or finished)."""
+    def check():
+        response = requests.get(api + '/maintenance/' + mw_id, timeout=2)
+        return response.status_code == 200 and \
+            response.json().get('status') == status
+    return Condition(check, 'maintenance %s %s' % (mw_id, status))
+
+
+def lldp_flows_installed(net):
+    """Condition: every switch has the of_lldp flow (cookie 0xab...)."""
+    def check():
+        return all(
+            any(flow.cookie >> 56 == NetworkTest.OF_LLDP_COOKIE_PREFIX
+                for flow in parse_flows(sw.dpctl('dump-flows')))
+            for sw in net.switches)
+    return Condition(check, 'lldp flows installed')
+
+
+def flows_present(switch, count=None, contains=(), matches=()):
+    """Condition: ``switch`` flow table matches the expectation.
+
+    ``count`` is the exact number of flows, ``contains`` a list of
+    substrings that must all appear in dump-flows output and ``matches``
+    a list of match dicts that must all be installed (see tests.flows).
+    """
+    def check():
+        flows = switch.dpctl('dump-flows')
+        table = parse_flows(flows)
+        if count is not None and len(table) != count:
+            return False
+        if not all(table.find(match) for match in matches):
+            return False
+        return all(item in flows for item in contains)
+    return Condition(check, 'flows present on %s' % switch.name)
+
+
+class ControllerCrashed(Exception):
+    """Raised when kytosd exits while it was expected to be running."""
+
+
+class KytosProcess:
+    """Supervise the kytosd daemon.
+
+    kytosd daemonizes itself, so the process is tracked through its pid
+    file and a pidfd (``os.pidfd_open``): stopping waits on the actual
+    process exit instead of sleeping, and a watcher thread notices an
+    unexpected exit as soon as it happens.
+    """
+
+    def __init__(self, api=KYTOS_API, api_host='127.0.0.1',
+                 api_port=INSTANCE.api_port, pid_file=INSTANCE.pid_file,
+                 env=None, kill_by_name=True, napps_dir=NAPPS_DIR):
+        self.api = api
+        self.api_host = api_host
+        self.api_port = api_port
+        self.pid_file = pid_file
+        self.env = env
+        self.kill_by_name = kill_by_name
+        self.napps_dir = napps_dir
+        self.pid = None
+        self.exited_at = None
+        self.crashed = False
+        # durations of the last stop/start, and the monotonic time at
+        # which each of their steps ended
+        self.timings = {}
+        self.timestamps = {}
+        self._exited = None
+        self._stopping = False
+
+    def _read_pid(self):
+        try:
+            with open(self.pid_file) as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _is_kytosd(pid):
+        """Whether ``pid`` runs kytosd, per /proc/<pid>/cmdline."""
+        try:
+            with open('/proc/%d/cmdline' % pid, 'rb') as f:
+                argv = f.read().split(b'\0')
+        except OSError:
+            return False
+        return any(os.path.basename(arg) == b'kytosd' for arg in argv)
+
+    def _attach(self, pid):
+        self.pid = pid
+        self.exited_at = None
+        self.crashed = False
+        self._exited = threading.Event()
+        threading.Thread(target=self._watch, args=(pid, self._exited),
+                         daemon=True).start()
+
+    @staticmethod
+    def _poll_exit(pid, timeout=None):
+        """Poll until ``pid`` is gone or ``timeout`` expires."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while deadline is None or time.monotonic() < deadline:
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                return True
+            time.sleep(0.05)
+        return False
+
+    def _wait_exit(self, pid, timeout=None):
+        """Block until ``pid`` exits or ``timeout`` expires."""
+        if self.pid == pid and self._exited is not None:
+            return self._exited.wait(timeout)
+        return self._poll_exit(pid, timeout)
+
+    def _watch(self, pid, exited):
+        """Wait for ``pid`` to exit, then set ``exited``.
+
+        The pidfd is opened, waited on and closed by this thread only, so
+        its number can't be reused while select() still waits on it.
+        """
+        try:
+            pidfd = os.pidfd_open(pid)
+        except (AttributeError, OSError):
+            pidfd = None
+        if pidfd is None:
+            self._poll_exit(pid)
+        else:
+            try:
+                select.select([pidfd], [], [])
+            except OSError:
+                self._poll_exit(pid)
+            finally:
+                os.close(pidfd)
+        if self.pid == pid:
+            self.exited_at = time.time()
+            if not self._stopping:
+                self.crashed = True
+                print("kytosd (pid %s) exited unexpectedly" % pid)
+        exited.set()
+
+    def is_running(self):
+        return self.pid is not None and self.exited_at is None
+
+    def check(self):
+        """Raise ControllerCrashed if kytosd died after being started."""
+        if self.crashed:
+            raise ControllerCrashed('kytosd (pid %s) exited at %s'
+                                    % (self.pid, self.exited_at))
+
+    def stop(self, timeout=10):
+        """Send SIGTERM and wait for exit, forcing a SIGKILL on timeout."""
+        start = time.monotonic()
+        self._stopping = True
+        # whoever supervised this pid file, its kytosd is going away
+        _live_controllers.pop(self.pid_file, None)
+        pid = self.pid if self.is_running() else self._read_pid()
+        if pid is not None and not self._is_kytosd(pid):
+            # stale pid file, the pid may belong to another process now
+            print("pid %s from %s is not kytosd, not signaling it"
+                  % (pid, self.pid_file))
+            pid = None
+        if pid is None:
+            if self.kill_by_name:
+                # not started by us and no pid file: fall back to process name
+                subprocess.call(['pkill', 'kytosd'])
+                try:
+                    wait_until(lambda: subprocess.call(
+                        ['pgrep', 'kytosd'], stdout=subprocess.DEVNULL) != 0,
+                        timeout=timeout)
+                except WaitTimeout:
+                    subprocess.call(['pkill', '-9', 'kytosd'])
+        else:
+            if pid != self.pid:
+                self._attach(pid)
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+            if not self._wait_exit(pid, timeout):
+                print("FAIL to stop kytos after %s seconds. Force stop!" % timeout)
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                self._wait_exit(pid, 5)
+        try:
+            os.remove(self.pid_file)
+        except FileNotFoundError:
+            pass
+        self.pid = None
+        self.timestamps['stopped'] = time.monotonic()
+        self.timings['stop'] = self.timestamps['stopped'] - start
+
+    def start(self, args=(), timeout=60):
+        """Start kytosd with ``args`` and wait until it is ready."""
+        start = time.monotonic()
+        self._stopping = False
+        subprocess.check_call(['kytosd', *args], env=self.env)
+        pid = wait_until(self._read_pid, timeout=timeout)
+        self._attach(pid)
+        _live_controllers[self.pid_file] = self
+        self.timestamps['spawned'] = time.monotonic()
+        self.timings['spawn'] = self.timestamps['spawned'] - start
+        self.wait_ready(timeout=timeout)
+        self.timestamps['ready'] = time.monotonic()
+        self.timings['ready'] = self.timestamps['ready'] - start
+
+    def api_listening(self):
+        """Condition: the API port accepts TCP connections."""
+        def check():
+            with socket.create_connection((self.api_host, self.api_port),
+                                          timeout=0.5):
+                return True
+        return Condition(check, 'api socket listening')
+
+    def enabled_napps(self):
+        """(username, name) of every napp enabled in ``napps_dir``."""
+        enabled = set()
+        if not os.path.isdir(self.napps_dir):
+            return enabled
+        for username in os.listdir(self.napps_dir):
+            user_dir = os.path.join(self.napps_dir, username)
+            if username.startswith(('.', '__')) or not os.path.isdir(user_dir):
+                continue
+            for name in os.listdir(user_dir):
+                if not name.startswith(('.', '__')) \
+                        and os.path.isdir(os.path.join(user_dir, name)):
+                    enabled.add((username, name))
+        return enabled
+
+    def napps_loaded(self):
+        """Condition: core/napps_enabled lists every enabled napp."""
+        def check():
+            response = requests.get(self.api + '/core/napps_enabled/',
+                                    timeout=1)
+            loaded = {tuple(napp) for napp in response.json()['napps']}
+            # napps may still be loading when the API answers
+            return bool(loaded) and self.enabled_napps() <= loaded
+        return Condition(check, 'napps enabled')
+
+    def wait_ready(self, timeout=60):
+        """Wait for socket, core/status and napps_enabled readiness.
+
+        Raises ControllerCrashed right away if kytosd exits meanwhile.
+        """
+        alive = Condition(lambda: self.check() or True, 'kytosd alive')
+        wait_until(
+            alive & self.api_listening() & controller_running(self.api)
+            & self.napps_loaded(),
+            timeout=timeout, interval=0.05, max_interval=0.5,
+            ignored=(OSError, requests.RequestException, KeyError, ValueError),
+        )
+
+
 class NetworkTest:
+    # collections mirroring in-memory state that an API reset keeps
+    # (topology) or already cleaned up through the API (flow_manager)
+    LIVE_COLLECTIONS = ('switches', 'links', 'interface_details', 'flows')
+    # of_lldp cookies are 0xab << 56 | dpid; its flows survive an API reset
+    OF_LLDP_COOKIE_PREFIX = 0xab
+    # 'truncate' empties collections but keeps them, with their indexes and
+    # validators, across clean starts; 'drop' removes the whole database
+    DB_RESET_MODE = os.environ.get('KYTOS_E2E_DB_RESET', 'truncate')
+
     def __init__(
         self,
         controller_ip,
         topo_name="ring",
-        db_client=mongo_client,
+        db_client=shared_mongo_client,
         db_client_options=None,
+        instance=INSTANCE,
     ):
-        # Create an instance of our topology
-        mininet.clean.cleanup()
+        self.instance = instance
+        # Create an instance of our topology; switch names overlap across
+        # topologies, so a cached network of this instance can't outlive
+        # a new one
+        stop_shared_networks(instance)
+        if instance.isolated:
+            instance.cleanup()
+        else:
+            mininet.clean.cleanup()
 
         # Create a network based on the topology using
         # OVS and controlled by a remote controller
         patch('mininet.util.fixLimits', side_effect=None)
         self.net = Mininet(
-            topo=topos.get(topo_name, (lambda: RingTopo()))(),
+            topo=topos.get(topo_name, topos['ring'])(instance=instance),
             controller=lambda name: RemoteController(
-                name, ip=controller_ip, port=6653),
-            switch=OVSSwitch,
+                instance.prefix + name, ip=controller_ip, port=instance.of_port),
+            switch=InstanceOVSSwitch,
             autoSetMacs=True)
-        db_client_kwargs = db_client_options or {}
+        # let tests keep using the unprefixed names (net.get('s1'), ...)
+        for node in self.net.hosts + self.net.switches:
+            alias = node.name[len(instance.prefix):]
+            node.alias = alias
+            self.net.nameToNode.setdefault(alias, node)
+        db_client_kwargs = dict(db_client_options or {})
+        if instance.isolated:
+            db_client_kwargs.setdefault("database", instance.db_name)
         db_name = db_client_kwargs.get("database") or os.environ.get("MONGO_DBNAME")
         self.db_client = db_client(**db_client_kwargs)
         self.db_name = db_name
         self.db = self.db_client[self.db_name]
+        # kytosd must use the same database and cluster as the harness
+        env = dict(os.environ, MONGO_DBNAME=db_name)
+        if "host_seeds" in db_client_kwargs:
+            env["MONGO_HOST_SEEDS"] = db_client_kwargs["host_seeds"]
+        self.controller = KytosProcess(
+            api=instance.api,
+            api_port=instance.api_port,
+            pid_file=instance.pid_file,
+            env=env,
+            kill_by_name=not instance.isolated,
+        )
+        self.clean_boot = None
+        self.last_reset = None
+        self.shared = False
+        self.started = False
 
     def start(self):
-        self.net.start()
+        if not self.started:
+            self.net.start()
+            self.started = True
         self.start_controller(clean_config=True)
 
     def drop_database(self):
-        """Drop database."""
+        """Drop the whole napps database."""
         self.db_client.drop_database(self.db_name)
 
+    def reset_database(self, mode=None):
+        """Empty the napps database as ``mode`` (default DB_RESET_MODE) says.
+
+        'truncate' empties its collections, 'drop' drops the database.
+        """
+        mode = mode or self.DB_RESET_MODE
+        if mode == 'truncate':
+            return self.truncate_database()
+        if mode == 'drop':
+            return self.drop_database()
+        raise ValueError('unknown database reset mode %r' % mode)
+
+    def truncate_database(self, keep=None, exclude=()):
+        """Empty every collection in parallel, keeping indexes and validators.
+
+        ``keep`` maps collection names to a filter of documents to leave in
+        place; collections in ``exclude`` are left untouched. Returns the
+        number of deleted documents per collection.
+        """
+        keep = keep or {}
+        names = [
+            name for name in self.db.list_collection_names()
+            if name not in exclude and not name.startswith('system.')
+        ]
+        if not names:
+            return {}
+
+        def truncate(name):
+            query = {'$nor': [keep[name]]} if name in keep else {}
+            return name, self.db[name].delete_many(query).deleted_count
+        with ThreadPoolExecutor(max_workers=len(names)) as executor:
+            return dict(executor.map(truncate, names))
+
     def start_controller(self, clean_config=False, enable_all=False,
-                         del_flows=False, port=None, database='mongodb'):
+                         del_flows=False, port=None, database='mongodb',
+                         seed=None):
+        """(Re)start kytosd.
+
+        ``seed`` is called with the napps database after the optional
+        cleanup and before kytosd starts, e.g. ``Seeder(...).seed``
+        wrapped in a lambda (see tests/mongo_seed.py).
+        """
         # Restart kytos and check if the napp is still disabled
-        try:
-            os.system('pkill kytosd')
-            # with open('/var/run/kytos/kytosd.pid', "r") as f:
-            #    pid = int(f.read())
-            #    os.kill(pid, signal.SIGTERM)
-            time.sleep(5)
-            if os.path.exists('/var/run/kytos/kytosd.pid'):
-                raise Exception("Kytos pid still exists.")
-        except Exception as e:
-            print("FAIL to stop kytos after 5 seconds -- %s. Force stop!" % e)
-            os.system('pkill -9 kytosd')
-            os.system('rm -f /var/run/kytos/kytosd.pid')
+        self.controller.stop()
 
         if clean_config:
-            # TODO: config is defined at NAPPS_DIR/kytos/storehouse/settings.py 
-            # and NAPPS_DIR is defined at /etc/kytos/kytos.conf
-            os.system('rm -rf /var/tmp/kytos/storehouse')
+            if not self.instance.isolated:
+                # the storehouse is shared by every instance on the host
+                os.system('rm -rf %s' % STOREHOUSE)
             if database:
                 try:
-                    self.drop_database()
+                    self.reset_database()
                 except ServerSelectionTimeoutError as exc:
-                    print(f"FAIL to drop database. {str(exc)}")
+                    print(f"FAIL to reset database. {str(exc)}")
 
         if clean_config or del_flows:
             # Remove any installed flow
-            for sw in self.net.switches:
-                sw.dpctl('del-flows')
+            clear_flows(self.net.switches)
 
-        daemon = 'kytosd'
+        if seed:
+            seed(self.db)
+
+        args = []
+        if self.instance.isolated:
+            args += ['-c', self.instance.write_conf(),
+                     '--pidfile', self.instance.pid_file]
+            port = port or self.instance.of_port
         if database:
-            daemon += f' --database {database}'
+            args += ['--database', database]
         if port:
-            daemon += ' --port %s' % port
+            args += ['--port', str(port)]
         if enable_all:
-            daemon += ' -E'
-        os.system(daemon)
+            args.append('-E')
+        self.controller.start(args)
+        if seed:
+            # seeded state is cheaper to drop with a restart than via the API
+            self.clean_boot = None
+        elif clean_config:
+            client = kytos_client(self.instance.api)
+            self.clean_boot = {
+                'enable_all': enable_all,
+                'napps': client.napps_enabled().json()['napps'],
+                'lldp_polling_time':
+                    client.lldp_polling_time().json()['polling_time'],
+            }
 
-        self.wait_controller_start()
+    def reset_controller(self, enable_all=False):
+        """Bring the controller back to a clean state as cheaply as possible.
 
-    def wait_controller_start(self):
-        """Wait until controller starts according to core/status API."""
-        wait_count = 0
-        while wait_count < 60:
+        When the only state left behind is API-removable (EVCs, maintenance
+        windows, flows) it is deleted through the API and the remaining napp
+        collections are truncated, keeping kytosd up. Anything else (e.g.
+        topology metadata or enabled flags, of_lldp settings, disabled
+        napps) requires a clean restart. Returns and keeps in ``last_reset`` the path taken,
+        why and how long it took.
+        """
+        start = time.monotonic()
+        reason = self._api_reset_blocker(enable_all)
+        if reason is None:
             try:
-                response = requests.get('http://127.0.0.1:8181/api/kytos/core/status/', timeout=1)
-                assert response.json()['response'] == 'running'
-                break
-            except:
-                time.sleep(0.5)
-                wait_count += 0.5
-        else:
-            msg = 'Timeout while starting Kytos controller.'
-            raise Exception(msg)
-
-    def wait_switches_connect(self):
-        max_wait = 0
-        while any(not sw.connected() for sw in self.net.switches):
-            time.sleep(1)
-            max_wait += 1
-            if max_wait > 30:
-                status = [(sw.name, sw.connected()) for sw in self.net.switches]
-                raise Exception('Timeout: timed out waiting switches reconnect. Status %s' % status)
+                self._api_reset()
+            except (requests.RequestException, WaitTimeout) as exc:
+                reason = 'API cleanup failed: %s' % exc
+        if reason is not None:
+            self.start_controller(clean_config=True, enable_all=enable_all)
+        self.last_reset = {
+            'path': 'api' if reason is None else 'restart',
+            'reason': reason,
+            'duration': time.monotonic() - start,
+        }
+        print("Controller reset via %(path)s in %(duration).2fs (%(reason)s)"
+              % self.last_reset)
+        return self.last_reset
+
+    def _api_reset_blocker(self, enable_all):
+        """Why the state can't be reset through the API, or None."""
+        if not self.controller.is_running():
+            return 'controller not running'
+        if not self.clean_boot or self.clean_boot['enable_all'] != enable_all:
+            return 'last clean start used other options'
+        client = kytos_client(self.instance.api)
+        try:
+            napps = client.napps_enabled().json()['napps']
+            topology = client.get('/topology/v3/').json()['topology']
+            lldp = set(client.lldp_interfaces().json()['interfaces'])
+            polling_time = client.lldp_polling_time().json()['polling_time']
+        except (requests.RequestException, KeyError, ValueError) as exc:
+            return 'controller API not usable: %s' % exc
+        if sorted(napps) != sorted(self.clean_boot['napps']):
+            return 'enabled napps changed'
+        if polling_time != self.clean_boot['lldp_polling_time']:
+            return 'of_lldp polling time changed'
+        for dpid, switch in topology['switches'].items():
+            if switch['enabled'] != enable_all or switch.get('metadata'):
+                return 'switch %s changed' % dpid
+            for iface_id, iface in switch.get('interfaces', {}).items():
+                if iface['enabled'] != enable_all or iface.get('metadata'):
+                    return 'interface %s changed' % iface_id
+                # of_lldp starts with LLDP on every interface
+                if iface_id not in lldp:
+                    return 'interface %s lldp disabled' % iface_id
+        for link_id, link in topology['links'].items():
+            if link['enabled'] != enable_all or link.get('metadata'):
+                return 'link %s changed' % link_id
+        return None
+
+    def _api_reset(self):
+        """Delete API-managed state and truncate the other collections."""
+        client = kytos_client(self.instance.api)
+        for mw in client.list_maintenances().json():
+            if mw.get('status') == 'running':
+                client.end_maintenance(mw['id']).raise_for_status()
+            client.delete_maintenance(mw['id']).raise_for_status()
+        for circuit_id in client.list_evcs().json():
+            client.delete_evc(circuit_id).raise_for_status()
+        for dpid, entry in client.list_flows().json().items():
+            flows = [
+                {
+                    "table_id": flow.get("table_id", 0),
+                    "priority": flow.get("priority"),
+                    "match": flow.get("match", {}),
+                    "cookie": flow.get("cookie", 0),
+                    "cookie_mask": 0xffffffffffffffff,
+                }
+                for flow in entry.get("flows", [])
+                if flow.get("cookie", 0) >> 56 != self.OF_LLDP_COOKIE_PREFIX
+            ]
+            if flows:
+                client.delete_flows(flows, dpid).raise_for_status()
+
+        def only_lldp_flows():
+            tables = self.flow_snapshot().tables.values()
+            return all(flow.cookie >> 56 == self.OF_LLDP_COOKIE_PREFIX
+                       for table in tables for flow in table)
+        wait_until(only_lldp_flows, timeout=10)
+
+        self.truncate_database(exclude=self.LIVE_COLLECTIONS)
+
+    def wait_controller_start(self, timeout=60):
+        """Wait until controller starts according to core/status API."""
+        try:
+            self.controller.wait_ready(timeout=timeout)
+        except WaitTimeout as exc:
+            raise Exception('Timeout while starting Kytos controller.') from exc
+
+    def wait_switches_connect(self, timeout=30):
+        try:
+            wait_until(switches_connected(self.net), timeout=timeout,
+                       ignored=())
+        except WaitTimeout as exc:
+            status = [(sw.name, sw.connected()) for sw in self.net.switches]
+            raise Exception('Timeout: timed out waiting switches reconnect. Status %s' % status) from exc
+
+    def expected_links(self):
+        """Number of switch-to-switch links LLDP should discover."""
+        return sum(
+            1 for link in self.net.links
+            if link.intf1.node in self.net.switches
+            and link.intf2.node in self.net.switches
+            and link.intf1.node != link.intf2.node
+        )
+
+    def wait_topology_ready(self, timeout=30):
+        """Wait until switches are connected and every link is discovered."""
+        wait_until(
+            switches_connected(self.net)
+            & links_discovered(self.expected_links(), self.instance.api),
+            timeout=timeout,
+        )
+
+    def wait_ready(self, enable_all=True, timeout=60):
+        """Wait until kytosd has brought the network up after a start.
+
+        Switches must be connected; when every element was enabled, each
+        switch must also have its of_lldp flow and every link must be
+        discovered.
+        """
+        condition = switches_connected(self.net)
+        if enable_all:
+            condition = condition & lldp_flows_installed(self.net) \
+                & links_discovered(self.expected_links(), self.instance.api)
+        wait_until(condition, timeout=timeout)
+
+    def wait_flow_counts(self, timeout=30, **counts):
+        """Wait until each switch has exactly the given number of flows,
+        e.g. ``wait_flow_counts(s1=3, s2=1)``."""
+        wait_until(all_of(*(flows_present(self.net.get(name), count=count)
+                            for name, count in counts.items())),
+                   timeout=timeout)
 
     def restart_kytos_clean(self):
         self.start_controller(clean_config=True, enable_all=True)
         self.wait_switches_connect()
 
+    def flow_snapshot(self, flow_filter=None, aggregate=False):
+        """Snapshot the flow tables of every switch concurrently."""
+        return snapshot_flows(self.net.switches, flow_filter, aggregate)
+
     def config_all_links_up(self):
         for link in self.net.links:
             self.net.configLinkStatus(
@@ -294,6 +1389,77 @@ class NetworkTest:
                 "up"
             )
 
-    def stop(self):
+    def reset_network(self):
+        """Undo what a test module may have changed on a reused network."""
+        self.config_all_links_up()
+        for host in self.net.hosts:
+            for link in host.cmd('ip -o link show type vlan').splitlines():
+                name = link.split(':')[1].strip().split('@')[0]
+                host.cmd('ip link del %s' % name)
+            # tests also add addresses to the base interface (e.g. h2-eth0)
+            intf = host.defaultIntf()
+            host.cmd('ip addr flush dev %s' % intf)
+            if intf.ip:
+                intf.setIP(intf.ip, intf.prefixLen)
+        clear_flows(self.net.switches)
+
+    def stop(self, force=False):
+        """Stop the network; shared networks only stop when forced."""
+        if self.shared and not force:
+            return
         self.net.stop()
-        mininet.clean.cleanup()
+        if self.instance.isolated:
+            self.instance.cleanup()
+        else:
+            mininet.clean.cleanup()
+        self.started = False
+
+
+# (instance index, topology name) -> NetworkTest
+_shared_networks = {}
+
+
+def shared_network(controller_ip, topo_name="ring", **kwargs):
+    """NetworkTest for ``topo_name`` reused by consecutive test modules.
+
+    The network is built once and kept running when a module calls
+    ``stop()``; the next module asking for the same topology on the same
+    instance gets it back after ``reset_network()``. The cache has a
+    single slot per instance: asking for another topology (or building a
+    plain NetworkTest) on that instance stops the cached network, since
+    switch names overlap across topologies and all of them would share
+    the instance's kytosd. So ring -> ring4 -> ring builds ring twice;
+    order modules by topology to get the most reuse. The session fixture
+    in conftest stops whatever is left at the end.
+    """
+    instance = kwargs.get('instance', INSTANCE)
+    key = (instance.index, topo_name)
+    net = _shared_networks.get(key)
+    if net is not None and net.started:
+        net.reset_network()
+        return net
+    net = NetworkTest(controller_ip, topo_name=topo_name, **kwargs)
+    net.shared = True
+    _shared_networks[key] = net
+    return net
+
+
+def stop_shared_networks(instance=None):
+    """Stop the shared networks of ``instance``, or all of them."""
+    for key in list(_shared_networks):
+        if instance is None or key[0] == instance.index:
+            _shared_networks.pop(key).stop(force=True)
+
+
+def stop_kytosd(instance=INSTANCE):
+    """Stop the kytosd of ``instance``, e.g. before writing to its database.
+
+    Shared networks keep their controller running between modules; their
+    KytosProcess stops it first so it doesn't report a crash.
+    """
+    for net in _shared_networks.values():
+        if net.instance.index == instance.index:
+            net.controller.stop()
+    KytosProcess(api=instance.api, api_port=instance.api_port,
+                 pid_file=instance.pid_file,
+                 kill_by_name=not instance.isolated).stop()
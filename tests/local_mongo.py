@@ -0,0 +1,158 @@
+"""Throwaway MongoDB replica set built from local mongod processes.
+
+The docker-compose replica set can't be stepped down or killed from a
+test, so benchmarks that inject database faults start their own::
+
+    with LocalReplicaSet(members=3) as rs:
+        net = NetworkTest(CONTROLLER, db_client_options={
+            'host_seeds': rs.host_seeds})
+        ...
+        rs.step_down()
+
+Members listen on 127.0.0.1 from ``base_port`` up, without access
+control; the napps user is still created so kytosd and the harness can
+authenticate with MONGO_USERNAME/MONGO_PASSWORD as usual.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+
+from pymongo import MongoClient
+from pymongo.errors import AutoReconnect, PyMongoError
+
+from tests.helpers import wait_until
+
+
+def mongod_available():
+    return shutil.which('mongod') is not None
+
+
+class LocalReplicaSet:
+    """``members`` mongod processes forming replica set ``name``."""
+
+    def __init__(self, members=3, base_port=27117, name='rsbench',
+                 database=os.environ.get('MONGO_DBNAME', 'napps'),
+                 username=os.environ.get('MONGO_USERNAME'),
+                 password=os.environ.get('MONGO_PASSWORD')):
+        self.name = name
+        self.ports = [base_port + i for i in range(members)]
+        self.database = database
+        self.username = username
+        self.password = password
+        self.root = None
+        self.processes = {}
+
+    @property
+    def hosts(self):
+        return ['127.0.0.1:%d' % port for port in self.ports]
+
+    @property
+    def host_seeds(self):
+        return ','.join(self.hosts)
+
+    def direct_client(self, host, timeout_ms=2000):
+        return MongoClient(host, directConnection=True,
+                           serverSelectionTimeoutMS=timeout_ms,
+                           connectTimeoutMS=timeout_ms)
+
+    def start_member(self, port):
+        dbpath = os.path.join(self.root, str(port))
+        os.makedirs(dbpath, exist_ok=True)
+        self.processes[port] = subprocess.Popen(
+            ['mongod', '--replSet', self.name, '--port', str(port),
+             '--bind_ip', '127.0.0.1', '--dbpath', dbpath,
+             '--logpath', os.path.join(self.root, '%d.log' % port)],
+            stdout=subprocess.DEVNULL)
+
+    def start(self, timeout=60):
+        """Start the members, initiate the set and create the napps user."""
+        self.root = tempfile.mkdtemp(prefix='kytos-rs-')
+        for port in self.ports:
+            self.start_member(port)
+        for host in self.hosts:
+            with self.direct_client(host) as client:
+                wait_until(lambda: client.admin.command('ping'),
+                           timeout=timeout)
+        with self.direct_client(self.hosts[0]) as client:
+            client.admin.command('replSetInitiate', {
+                '_id': self.name,
+                # equal priorities: a deposed primary must not take over
+                # again on its own in the middle of a measurement
+                'members': [{'_id': i, 'host': host}
+                            for i, host in enumerate(self.hosts)],
+            })
+        self.wait_primary(timeout=timeout)
+        if self.username:
+            with MongoClient(self.hosts, replicaSet=self.name) as client:
+                client[self.database].command(
+                    'createUser', self.username, pwd=self.password,
+                    roles=[{'role': 'dbOwner', 'db': self.database}])
+        return self
+
+    def primary(self):
+        """Host of the current writable primary, or None."""
+        for host in self.hosts:
+            port = int(host.rsplit(':', 1)[1])
+            if self.processes.get(port) is None:
+                continue
+            try:
+                with self.direct_client(host, timeout_ms=500) as client:
+                    if client.admin.command('hello').get('isWritablePrimary'):
+                        return host
+            except PyMongoError:
+                continue
+        return None
+
+    def wait_primary(self, exclude=None, timeout=60):
+        """Wait for a primary other than ``exclude``; returns its host."""
+        def elected():
+            host = self.primary()
+            return host if host and host != exclude else None
+        return wait_until(elected, timeout=timeout, interval=0.05,
+                          max_interval=0.25)
+
+    def step_down(self, seconds=30):
+        """replSetStepDown the primary; returns the old primary's host."""
+        host = self.primary()
+        with self.direct_client(host) as client:
+            try:
+                client.admin.command('replSetStepDown', seconds,
+                                     secondaryCatchUpPeriodSecs=5)
+            except AutoReconnect:
+                # the primary closes every connection when it steps down
+                pass
+        return host
+
+    def kill_primary(self):
+        """SIGKILL the primary's mongod; returns its host."""
+        host = self.primary()
+        port = int(host.rsplit(':', 1)[1])
+        process = self.processes.pop(port)
+        process.kill()
+        process.wait()
+        return host
+
+    def restart(self, host):
+        """Start a killed member again."""
+        port = int(host.rsplit(':', 1)[1])
+        if self.processes.get(port) is None:
+            self.start_member(port)
+
+    def stop(self):
+        for process in self.processes.values():
+            process.terminate()
+        for process in self.processes.values():
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.processes.clear()
+        if self.root:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,389 @@
+"""Bulk seeding of napp collections before kytosd starts.
+
+Creating thousands of EVCs or flows through the REST API takes minutes;
+writing the documents the napps would have stored takes seconds. The
+``Seeder`` derives switches, links and interfaces from a Mininet Topo
+(without starting it) so the generated EVC paths, flows and maintenance
+windows reference ids the controller will find once the network is up::
+
+    seeder = Seeder(topos['amlight'](), net.db)
+    seeder.seed(evcs=10000, flows_per_switch=100)
+
+or, from a shell, ``python -m tests.mongo_seed --topo amlight --evcs 10000``.
+Documents are written with unordered ``insert_many`` in batches.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+from bson.decimal128 import Decimal128
+from pymongo.errors import BulkWriteError
+
+from tests.helpers import (close_mongo_clients, format_dpid,
+                           shared_mongo_client, topos)
+
+# collection names used by the napps
+COLLECTIONS = {
+    'switches': 'switches',
+    'links': 'links',
+    'evcs': 'evcs',
+    'flows': 'flows',
+    'maintenances': 'maintenance.windows',
+}
+# seeded flow_manager flows carry their own cookie prefix so tests can
+# tell them apart from napp-installed ones; like flow_manager, cookies
+# are stored as Decimal128 since they don't fit a signed 64-bit int
+SEED_COOKIE_PREFIX = 0xee
+
+
+def switch_dpid(topo, name):
+    """The dpid Mininet will give switch ``name`` of ``topo``."""
+    dpid = topo.nodeInfo(name).get('dpid')
+    if not dpid:
+        # same rule as mininet.node.Switch.defaultDpid
+        dpid = '%x' % int(re.findall(r'\d+', name)[0])
+    return format_dpid(dpid)
+
+
+def link_id(interface_a, interface_b):
+    """Link id as computed by kytos.core.link.Link."""
+    (dpid_a, port_a), (dpid_b, port_b) = sorted(
+        (iface.rsplit(':', 1)[0], int(iface.rsplit(':', 1)[1]))
+        for iface in (interface_a, interface_b))
+    str_id = '%s:%s:%s:%s' % (dpid_a, port_a, dpid_b, port_b)
+    return hashlib.sha256(str_id.encode('utf-8')).hexdigest()
+
+
+def flow_id(dpid, flow):
+    """Stable id of a flow dict on switch ``dpid``."""
+    flow_str = json.dumps(dict(flow, switch=dpid), sort_keys=True)
+    return hashlib.md5(flow_str.encode('utf-8')).hexdigest()
+
+
+def now():
+    return datetime.now(timezone.utc)
+
+
+class TopoGraph:
+    """Switches, inter-switch links and host-facing ports of a Topo."""
+
+    def __init__(self, topo):
+        self.dpids = {name: switch_dpid(topo, name) for name in topo.switches()}
+        self.interfaces = {dpid: [] for dpid in self.dpids.values()}
+        self.links = {}
+        self.adjacency = {dpid: [] for dpid in self.dpids.values()}
+        self.edge_ports = []
+        for src, dst, info in topo.links(sort=True, withInfo=True):
+            ends = [(src, info['port1']), (dst, info['port2'])]
+            ifaces = []
+            for node, port in ends:
+                if node in self.dpids:
+                    iface = '%s:%d' % (self.dpids[node], port)
+                    self.interfaces[self.dpids[node]].append(port)
+                    ifaces.append(iface)
+            if len(ifaces) == 2:
+                self.links[link_id(*ifaces)] = tuple(ifaces)
+                dpid_a, dpid_b = (i.rsplit(':', 1)[0] for i in ifaces)
+                self.adjacency[dpid_a].append((dpid_b, ifaces[0], ifaces[1]))
+                self.adjacency[dpid_b].append((dpid_a, ifaces[1], ifaces[0]))
+            elif len(ifaces) == 1:
+                self.edge_ports.append(ifaces[0])
+
+    def uni_pairs(self):
+        """Pairs of host-facing ports whose switches are connected."""
+        edges = self.edge_ports
+        return [
+            (a, z) for i, a in enumerate(edges) for z in edges[i + 1:]
+            if self.path(a.rsplit(':', 1)[0], z.rsplit(':', 1)[0]) is not None
+        ]
+
+    def evc_endpoints(self, count, first_vlan=100):
+        """``count`` (uni_a, uni_z, vlan) spread over every UNI pair.
+
+        Each UNI hands out its own VLANs, so no two EVCs share a tag on
+        the same interface.
+        """
+        pairs = self.uni_pairs()
+        if not pairs:
+            raise ValueError('topology has no pair of connected host ports')
+        uni_vlans = dict.fromkeys(self.edge_ports, first_vlan)
+        endpoints = []
+        for index in range(count):
+            uni_a, uni_z = pairs[index % len(pairs)]
+            vlan = max(uni_vlans[uni_a], uni_vlans[uni_z])
+            if vlan > 4094:
+                raise ValueError('only %d EVCs fit this topology' % index)
+            uni_vlans[uni_a] = uni_vlans[uni_z] = vlan + 1
+            endpoints.append((uni_a, uni_z, vlan))
+        return endpoints
+
+    def path(self, dpid_a, dpid_z, exclude=()):
+        """Shortest path as a list of (link_id, interface, interface).
+
+        Links whose id is in ``exclude`` are not used.
+        """
+        previous = {dpid_a: None}
+        queue = deque([dpid_a])
+        while queue:
+            dpid = queue.popleft()
+            if dpid == dpid_z:
+                break
+            for neighbor, iface, peer in self.adjacency[dpid]:
+                if neighbor not in previous \
+                        and link_id(iface, peer) not in exclude:
+                    previous[neighbor] = (dpid, iface, peer)
+                    queue.append(neighbor)
+        if dpid_z not in previous:
+            return None
+        hops = []
+        dpid = dpid_z
+        while previous[dpid]:
+            prev, iface, peer = previous[dpid]
+            hops.append((link_id(iface, peer), iface, peer))
+            dpid = prev
+        return hops[::-1]
+
+
+class Seeder:
+    """Generate consistent napp documents for a Topo and bulk insert them.
+
+    ``db`` is a pymongo Database (e.g. ``NetworkTest.db``); write it
+    while kytosd is stopped, right after a clean database reset.
+    """
+
+    def __init__(self, topo, db, batch_size=1000):
+        self.graph = TopoGraph(topo)
+        self.db = db
+        self.batch_size = batch_size
+        self.timings = {}
+        self.inserted = {}
+
+    def topology_documents(self, enabled=True, metadata=None):
+        """Switch and link documents as stored by kytos/topology."""
+        timestamp = now()
+        metadata = metadata or {}
+        switches = [
+            {
+                '_id': dpid,
+                'id': dpid,
+                'enabled': enabled,
+                'metadata': dict(metadata),
+                'interfaces': [
+                    {
+                        'id': '%s:%d' % (dpid, port),
+                        'port_number': port,
+                        'enabled': enabled,
+                        'lldp': True,
+                        'metadata': dict(metadata),
+                    }
+                    for port in sorted(ports)
+                ],
+                'inserted_at': timestamp,
+                'updated_at': timestamp,
+            }
+            for dpid, ports in self.graph.interfaces.items()
+        ]
+        links = [
+            {
+                '_id': lid,
+                'id': lid,
+                'enabled': enabled,
+                'metadata': dict(metadata),
+                'endpoint_a': {'id': iface_a},
+                'endpoint_b': {'id': iface_b},
+                'inserted_at': timestamp,
+                'updated_at': timestamp,
+            }
+            for lid, (iface_a, iface_b) in self.graph.links.items()
+        ]
+        return switches, links
+
+    def evc_documents(self, count, enabled=True, active=False, first_vlan=100):
+        """``count`` EVCs between host-facing ports, paths via BFS.
+
+        Every UNI and every link hands out its own VLANs, so no two EVCs
+        collide. ``active=False`` makes mef_eline deploy every enabled EVC
+        when it loads them.
+        """
+        paths = {}
+        s_vlans = {}
+        timestamp = now()
+        docs = []
+        endpoints = self.graph.evc_endpoints(count, first_vlan)
+        for index, (uni_a, uni_z, vlan) in enumerate(endpoints):
+            key = (uni_a, uni_z)
+            if key not in paths:
+                paths[key] = self.graph.path(uni_a.rsplit(':', 1)[0],
+                                             uni_z.rsplit(':', 1)[0])
+            path = []
+            for lid, iface_a, iface_b in paths[key]:
+                s_vlans[lid] = s_vlans.get(lid, 0) + 1
+                path.append({
+                    'id': lid,
+                    'endpoint_a': {'id': iface_a},
+                    'endpoint_b': {'id': iface_b},
+                    'metadata': {'s_vlan': {'tag_type': 1,
+                                            'value': s_vlans[lid]}},
+                })
+            if max(s_vlans.values(), default=0) > 4094:
+                raise ValueError('only %d EVCs fit this topology' % index)
+            circuit_id = uuid.uuid4().hex[:14]
+            docs.append({
+                '_id': circuit_id,
+                'id': circuit_id,
+                'name': 'seed_evc_%d' % index,
+                'uni_a': {'interface_id': uni_a,
+                          'tag': {'tag_type': 1, 'value': vlan}},
+                'uni_z': {'interface_id': uni_z,
+                          'tag': {'tag_type': 1, 'value': vlan}},
+                'primary_path': path,
+                'current_path': path if active else [],
+                'backup_path': [],
+                'failover_path': [],
+                'dynamic_backup_path': True,
+                'enabled': enabled,
+                'active': active,
+                'archived': False,
+                'circuit_scheduler': [],
+                'queue_id': None,
+                'creation_time': timestamp.strftime('%Y-%m-%dT%H:%M:%S'),
+                'inserted_at': timestamp,
+                'updated_at': timestamp,
+            })
+        return docs
+
+    def flow_documents(self, per_switch, first_vlan=1):
+        """``per_switch`` flow_manager flows on every switch.
+
+        Flows match VLANs on the switch's first port and output to its
+        second (or the same) port; cookies use SEED_COOKIE_PREFIX and
+        are stored as Decimal128, as flow_manager does.
+        """
+        timestamp = now()
+        docs = []
+        for dpid, ports in self.graph.interfaces.items():
+            if not ports:
+                continue
+            in_port, out_port = ports[0], ports[min(1, len(ports) - 1)]
+            for index in range(per_switch):
+                # past 4094 flows each VLAN is reused with a new priority
+                flow = {
+                    'table_id': 0,
+                    'priority': 1000 + index // 4094,
+                    'cookie': SEED_COOKIE_PREFIX << 56 | index,
+                    'match': {'in_port': in_port,
+                              'dl_vlan': first_vlan + index % 4094},
+                    'actions': [{'action_type': 'output', 'port': out_port}],
+                }
+                fid = flow_id(dpid, flow)
+                docs.append({
+                    '_id': fid,
+                    'flow_id': fid,
+                    'id': fid,
+                    'switch': dpid,
+                    'flow': dict(flow, cookie=Decimal128(str(flow['cookie']))),
+                    'state': 'installed',
+                    'inserted_at': timestamp,
+                    'updated_at': timestamp,
+                })
+        return docs
+
+    def maintenance_documents(self, count, start_in=timedelta(days=1),
+                              duration=timedelta(hours=1)):
+        """``count`` pending windows, each covering one switch."""
+        timestamp = now()
+        dpids = list(self.graph.interfaces)
+        docs = []
+        for index in range(count):
+            mw_id = uuid.uuid4().hex
+            start = timestamp + start_in + index * duration
+            docs.append({
+                '_id': mw_id,
+                'id': mw_id,
+                'description': 'seed maintenance %d' % index,
+                'start': start,
+                'end': start + duration,
+                'status': 'pending',
+                'switches': [dpids[index % len(dpids)]],
+                'interfaces': [],
+                'links': [],
+                'inserted_at': timestamp,
+                'updated_at': timestamp,
+            })
+        return docs
+
+    def insert(self, key, docs):
+        """Unordered insert_many in batches; returns the inserted count.
+
+        Documents already present (duplicate _id) are skipped.
+        """
+        collection = self.db[COLLECTIONS[key]]
+        start = time.monotonic()
+        inserted = 0
+        for offset in range(0, len(docs), self.batch_size):
+            batch = docs[offset:offset + self.batch_size]
+            try:
+                inserted += len(
+                    collection.insert_many(batch, ordered=False).inserted_ids)
+            except BulkWriteError as exc:
+                errors = exc.details['writeErrors']
+                if any(error['code'] != 11000 for error in errors):
+                    raise
+                inserted += exc.details['nInserted']
+        self.timings[key] = time.monotonic() - start
+        self.inserted[key] = inserted
+        return inserted
+
+    def seed(self, evcs=0, flows_per_switch=0, maintenances=0,
+             topology=False, metadata=None, evcs_active=False):
+        """Generate and insert the requested documents.
+
+        Returns ``{collection key: inserted count}``; per collection
+        insert durations are kept in ``timings``.
+        """
+        if topology or metadata:
+            switches, links = self.topology_documents(metadata=metadata)
+            self.insert('switches', switches)
+            self.insert('links', links)
+        if evcs:
+            self.insert('evcs', self.evc_documents(evcs, active=evcs_active))
+        if flows_per_switch:
+            self.insert('flows', self.flow_documents(flows_per_switch))
+        if maintenances:
+            self.insert('maintenances',
+                        self.maintenance_documents(maintenances))
+        return dict(self.inserted)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--topo', default='ring', choices=sorted(topos))
+    parser.add_argument('--evcs', type=int, default=0)
+    parser.add_argument('--flows-per-switch', type=int, default=0)
+    parser.add_argument('--maintenances', type=int, default=0)
+    parser.add_argument('--topology', action='store_true',
+                        help='also seed switch and link documents')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--database', default=os.environ.get('MONGO_DBNAME'))
+    args = parser.parse_args()
+
+    client = shared_mongo_client(database=args.database)
+    seeder = Seeder(topos[args.topo](), client[args.database], args.batch_size)
+    inserted = seeder.seed(evcs=args.evcs,
+                           flows_per_switch=args.flows_per_switch,
+                           maintenances=args.maintenances,
+                           topology=args.topology)
+    for key, count in inserted.items():
+        print('%-13s %8d documents in %.2fs'
+              % (key, count, seeder.timings[key]))
+    close_mongo_clients()
+
+
+if __name__ == '__main__':
+    main()
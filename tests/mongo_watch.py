@@ -0,0 +1,219 @@
+"""Wait for napp state transitions through MongoDB change streams.
+
+Instead of polling a REST endpoint until, say, an EVC turns active, the
+waiters here watch the napp collection and return the moment a document
+matching the expected state is persisted, together with when it was
+persisted::
+
+    change = wait_evc_active(self.net.db, circuit_id)
+    print(change.persisted_at, change.latency)
+
+``persisted_at`` is only known for changes read from the stream; use
+``changes_latency`` to summarize the latency of many waits.
+
+The stream is opened before the current state is checked, so a
+transition can't slip in between. When change streams are unavailable
+(standalone mongod, missing privileges) the waiters fall back to polling
+the REST ``fallback`` condition, or the collection itself.
+"""
+import threading
+import time
+from datetime import datetime, timezone
+
+from pymongo.errors import PyMongoError
+
+from tests.helpers import (KYTOS_API, Condition, WaitTimeout, evc_active,
+                           evc_exists, latency_summary, wait_until)
+
+# operations that can leave a document in a new state
+WRITE_OPERATIONS = ['insert', 'update', 'replace']
+
+
+class DocumentChange:
+    """A document observed in the expected state.
+
+    ``persisted_at`` is the change event's wall time (cluster time on
+    servers older than 6.0) and ``received_at`` when the waiter saw it,
+    both as UTC datetimes. ``source`` tells whether the state came from
+    the 'stream', was already there ('initial') or was seen by the
+    'fallback' poll; only 'stream' changes have a ``persisted_at``, it
+    is None for the others.
+    """
+
+    __slots__ = ('document', 'persisted_at', 'received_at', 'source')
+
+    def __init__(self, document, persisted_at, received_at, source):
+        self.document = document
+        self.persisted_at = persisted_at
+        self.received_at = received_at
+        self.source = source
+
+    @property
+    def latency(self):
+        """Seconds between persistence and notification, or None."""
+        if self.persisted_at is None:
+            return None
+        return (self.received_at - self.persisted_at).total_seconds()
+
+    def __repr__(self):
+        return 'DocumentChange(%s at %s via %s)' % (
+            self.document.get('_id') if self.document else None,
+            self.persisted_at, self.source)
+
+
+def utc(value):
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def event_time(event):
+    if 'wallTime' in event:
+        return utc(event['wallTime'])
+    return utc(event['clusterTime'].as_datetime())
+
+
+def change_pipeline(doc_filter):
+    """Change stream pipeline for writes leaving a doc matching the filter."""
+    return [{'$match': {
+        'operationType': {'$in': WRITE_OPERATIONS},
+        **{'fullDocument.' + key: value for key, value in doc_filter.items()},
+    }}]
+
+
+def wait_document(collection, doc_filter, timeout=30, fallback=None,
+                  name=None):
+    """Wait until a document matching ``doc_filter`` is persisted.
+
+    ``doc_filter`` is a query on the document's fields, e.g.
+    ``{'id': circuit_id, 'active': True}`` (no top-level ``$or``/``$and``).
+    Returns a DocumentChange; raises WaitTimeout. ``fallback`` is a
+    Condition used if no change stream can be opened.
+    """
+    name = name or '%s %s' % (collection.name, doc_filter)
+    pipeline = change_pipeline(doc_filter)
+    deadline = time.monotonic() + timeout
+    try:
+        stream = collection.watch(pipeline, full_document='updateLookup',
+                                  max_await_time_ms=50)
+    except PyMongoError:
+        return _poll(collection, doc_filter, timeout, fallback, name)
+    with stream:
+        document = collection.find_one(doc_filter)
+        if document is not None:
+            return DocumentChange(document, None, datetime.now(timezone.utc),
+                                  'initial')
+        while time.monotonic() < deadline:
+            event = stream.try_next()
+            if event is not None:
+                return DocumentChange(event['fullDocument'],
+                                      event_time(event),
+                                      datetime.now(timezone.utc), 'stream')
+    raise WaitTimeout('Timeout after %ss waiting for %s' % (timeout, name))
+
+
+class DocumentWatcher:
+    """Record when each document first reaches a state, in the background.
+
+    For bulk measurements: ``seen`` maps the ``key`` field of every
+    document persisted matching ``doc_filter`` to its DocumentChange::
+
+        with DocumentWatcher(db['evcs'], {'active': True}) as watcher:
+            ...create EVCs...
+        watcher.seen[circuit_id].persisted_at
+
+    ``available`` is False when no change stream could be opened; the
+    caller then has to poll on its own.
+    """
+
+    def __init__(self, collection, doc_filter, key='id'):
+        self.collection = collection
+        self.key = key
+        self.pipeline = change_pipeline(doc_filter)
+        self.seen = {}
+        self.available = False
+        self._stream = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        with self._stream:
+            while not self._stop.is_set():
+                try:
+                    event = self._stream.try_next()
+                except PyMongoError:
+                    self.available = False
+                    return
+                if event is None:
+                    continue
+                document = event['fullDocument']
+                key = document.get(self.key)
+                if key not in self.seen:
+                    self.seen[key] = DocumentChange(
+                        document, event_time(event),
+                        datetime.now(timezone.utc), 'stream')
+
+    def __enter__(self):
+        try:
+            self._stream = self.collection.watch(
+                self.pipeline, full_document='updateLookup',
+                max_await_time_ms=50)
+        except PyMongoError:
+            return self
+        self.available = True
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+
+def _poll(collection, doc_filter, timeout, fallback, name):
+    if fallback is None:
+        fallback = Condition(lambda: collection.find_one(doc_filter), name)
+    result = wait_until(fallback, timeout=timeout)
+    document = result if isinstance(result, dict) else None
+    return DocumentChange(document, None, datetime.now(timezone.utc),
+                          'fallback')
+
+
+def changes_latency(changes):
+    """latency_summary of the changes whose persistence time is known."""
+    return latency_summary([change.latency for change in changes
+                            if change.persisted_at is not None])
+
+
+def wait_evc_exists(db, circuit_id, timeout=30, api=KYTOS_API):
+    return wait_document(db['evcs'], {'id': circuit_id}, timeout,
+                         evc_exists(circuit_id, api))
+
+
+def wait_evc_active(db, circuit_id, timeout=30, api=KYTOS_API):
+    return wait_document(db['evcs'], {'id': circuit_id, 'active': True},
+                         timeout, evc_active(circuit_id, api))
+
+
+def wait_flow(db, dpid, match=None, timeout=30, **flow_fields):
+    """Wait until flow_manager persists a flow on ``dpid``.
+
+    ``match`` and ``flow_fields`` (cookie, priority, ...) are compared
+    with the stored flow, e.g. ``wait_flow(db, dpid, {'dl_vlan': 100})``.
+    """
+    doc_filter = {'switch': dpid}
+    for key, value in (match or {}).items():
+        doc_filter['flow.match.' + key] = value
+    for key, value in flow_fields.items():
+        doc_filter['flow.' + key] = value
+    return wait_document(db['flows'], doc_filter, timeout)
+
+
+def wait_switch(db, dpid, timeout=30, **fields):
+    """Wait until topology persists switch ``dpid`` with ``fields``."""
+    return wait_document(db['switches'], {'_id': dpid, **fields}, timeout)
+
+
+def wait_link(db, link_id, timeout=30, **fields):
+    """Wait until topology persists link ``link_id`` with ``fields``."""
+    return wait_document(db['links'], {'_id': link_id, **fields}, timeout)
@@ -0,0 +1,125 @@
+"""Cost of a MongoDB primary failover for the controller's napps.
+
+mef_eline EVC creation, EVC listing and flow_manager flow installs run
+in a loop against kytosd while the primary of a local 3-member replica
+set is stepped down (replSetStepDown) or killed. For every operation
+type the results report the API stall window, errors and recovery time,
+plus how many acknowledged writes actually reached the database.
+"""
+import os
+import time
+
+import pytest
+
+from tests.benchmark import OpLog, bench, run_workers, write_result
+from tests.helpers import KytosClient, NetworkTest
+from tests.local_mongo import LocalReplicaSet, mongod_available
+
+CONTROLLER = '127.0.0.1'
+
+DURATION = float(os.environ.get('BENCH_FAILOVER_DURATION', 40))
+FAULT_AT = float(os.environ.get('BENCH_FAILOVER_AT', 10))
+
+UNI_A = '00:00:00:00:00:00:00:01:1'
+UNI_Z = '00:00:00:00:00:00:00:02:1'
+FLOW_DPID = '00:00:00:00:00:00:00:01'
+
+pytestmark = [
+    bench,
+    pytest.mark.skipif(not mongod_available(), reason='mongod not installed'),
+]
+
+
+class TestBenchMongoFailover:
+    net = None
+    rs = None
+
+    @classmethod
+    def setup_class(cls):
+        cls.rs = LocalReplicaSet().start()
+        cls.net = NetworkTest(CONTROLLER, 'ring', db_client_options={
+            'host_seeds': cls.rs.host_seeds})
+        cls.net.start()
+        cls.net.wait_switches_connect()
+
+    @classmethod
+    def teardown_class(cls):
+        cls.net.stop()
+        cls.rs.stop()
+
+    def setup_method(self, method):
+        self.net.reset_controller(enable_all=True)
+        self.net.wait_topology_ready()
+
+    @staticmethod
+    def workers(log):
+        evc_client = KytosClient(timeout=10)
+        list_client = KytosClient(timeout=10)
+        flow_client = KytosClient(timeout=10)
+        created = []
+
+        def create_evc(index):
+            response = log.run('mef_eline create', lambda: evc_client.create_evc(
+                KytosClient.evc_payload(UNI_A, UNI_Z, 100 + index % 3900)))
+            if response is not None and response.status_code == 201:
+                created.append(response.json()['circuit_id'])
+
+        def list_evcs(index):
+            log.run('mef_eline list', list_client.list_evcs)
+            time.sleep(0.05)
+
+        def install_flow(index):
+            flow = {
+                'priority': 1000 + index // 4000,
+                'match': {'in_port': 1, 'dl_vlan': 1 + index % 4000},
+                'actions': [{'action_type': 'output', 'port': 2}],
+            }
+            log.run('flow_manager install',
+                    lambda: flow_client.install_flows([flow], FLOW_DPID))
+
+        return [create_evc, list_evcs, install_flow], created
+
+    @pytest.mark.parametrize('fault', ['step_down', 'kill_primary'])
+    def test_failover_impact(self, fault):
+        log = OpLog()
+        workers, created = self.workers(log)
+        event = {}
+
+        def inject():
+            event['fault_at'] = time.monotonic()
+            event['old_primary'] = getattr(self.rs, fault)()
+            event['new_primary'] = self.rs.wait_primary(
+                exclude=event['old_primary'])
+            event['election'] = time.monotonic() - event['fault_at']
+
+        run_workers(DURATION, workers, schedule=[(FAULT_AT, inject)])
+        if fault == 'kill_primary':
+            self.rs.restart(event['old_primary'])
+
+        napps = {label: log.summary(label, event['fault_at'])
+                 for label in log.labels()}
+        persisted = self.net.db['evcs'].count_documents(
+            {'id': {'$in': created}})
+        result = {
+            'fault': fault,
+            'duration': DURATION,
+            'fault_offset': FAULT_AT,
+            'old_primary': event['old_primary'],
+            'new_primary': event['new_primary'],
+            'election': event['election'],
+            'napps': napps,
+            'evcs_acknowledged': len(created),
+            'evcs_persisted': persisted,
+            'evcs_lost': len(created) - persisted,
+        }
+        write_result('mongo_failover_%s' % fault, result)
+        for label, summary in napps.items():
+            print('%-22s ops=%-5d errors=%-4d stall=%ss recovery=%s' % (
+                label, summary['ops'], summary['errors_after_fault'],
+                summary['stall_window'], summary['recovery']))
+        print('EVCs acknowledged=%d lost=%d' % (len(created),
+                                                result['evcs_lost']))
+
+        for label, summary in napps.items():
+            assert summary['recovery'] is not None, \
+                '%s never recovered after the %s' % (label, fault)
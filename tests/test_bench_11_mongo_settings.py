@@ -0,0 +1,147 @@
+"""Controller throughput across MongoDB client settings.
+
+kytosd is restarted for every cell of a matrix of connection pool
+sizes and write concerns. In each cell a burst of EVC
+creations and a burst of flow installs are sent concurrently, and their
+throughput and p99 latency are measured. A comparison table and the raw
+numbers are written under BENCH_OUTPUT_DIR.
+
+The matrix comes from BENCH_POOL_SIZES and BENCH_WRITE_CONCERNS (comma
+separated). kytosd reads the pool sizes from
+MONGO_MAX_POOLSIZE/MONGO_MIN_POOLSIZE and the write concern is passed
+as an option of a MONGO_HOST_SEEDS URI. The read preference is not
+swept: kytos core pins ``readpreference`` in its mongo_client() and
+keyword arguments win over URI options in pymongo.
+"""
+import itertools
+import os
+import time
+
+import pytest
+
+from tests import async_client
+from tests.benchmark import bench, write_result, write_table
+from tests.helpers import KytosClient, latency_summary, shared_network
+
+CONTROLLER = '127.0.0.1'
+
+
+def env_list(name, default):
+    return [value.strip()
+            for value in os.environ.get(name, default).split(',') if value]
+
+
+POOL_SIZES = [int(size) for size in env_list('BENCH_POOL_SIZES', '10,50,100')]
+WRITE_CONCERNS = env_list('BENCH_WRITE_CONCERNS', '1,majority')
+EVCS = int(os.environ.get('BENCH_SWEEP_EVCS', 200))
+FLOWS_PER_SWITCH = int(os.environ.get('BENCH_SWEEP_FLOWS', 500))
+CONCURRENCY = int(os.environ.get('BENCH_SWEEP_CONCURRENCY', 50))
+
+UNI_A = '00:00:00:00:00:00:00:01:1'
+UNI_Z = '00:00:00:00:00:00:00:02:1'
+DPIDS = ['00:00:00:00:00:00:00:0%d' % i for i in (1, 2, 3)]
+
+pytestmark = bench
+
+
+def seed_uri(host_seeds, **options):
+    """A mongodb:// URI for the first seed carrying ``options``.
+
+    The driver discovers the other replica set members from it, and a
+    comma-free seed list survives mongo_client()'s split(',').
+    """
+    query = '&'.join('%s=%s' % item for item in options.items())
+    return 'mongodb://%s/?%s' % (host_seeds.split(',')[0], query)
+
+
+def burst_summary(results, duration, expected_status):
+    ok = [r for r in results if r.status == expected_status]
+    return {
+        'requests': len(results),
+        'errors': len(results) - len(ok),
+        'duration': duration,
+        'throughput': len(ok) / duration if duration else None,
+        'latency': latency_summary([r.latency for r in ok]),
+    }
+
+
+def timed(coro_func):
+    start = time.monotonic()
+    results = async_client.run(coro_func, concurrency=CONCURRENCY)
+    return results, time.monotonic() - start
+
+
+class TestBenchMongoSettings:
+    net = None
+    cells = []
+
+    @classmethod
+    def setup_class(cls):
+        cls.net = shared_network(CONTROLLER)
+        cls.net.start()
+        cls.net.wait_switches_connect()
+        cls.env = dict(cls.net.controller.env)
+
+    @classmethod
+    def teardown_class(cls):
+        cls.net.controller.env = cls.env
+        cls.net.start_controller(clean_config=True)
+        cls.write_comparison()
+        cls.net.stop()
+
+    @classmethod
+    def write_comparison(cls):
+        if not cls.cells:
+            return
+        rows = [
+            [cell['pool_size'], cell['write_concern'],
+             '%.1f' % (cell['evc']['throughput'] or 0),
+             '%.4f' % cell['evc']['latency'].get('p99', 0),
+             '%.1f' % (cell['flow']['throughput'] or 0),
+             '%.4f' % cell['flow']['latency'].get('p99', 0),
+             cell['evc']['errors'] + cell['flow']['errors']]
+            for cell in cls.cells
+        ]
+        write_table('mongo_settings', [
+            'pool', 'w', 'evc/s', 'evc p99 s', 'flows/s',
+            'flow p99 s', 'errors'], rows)
+        write_result('mongo_settings', {'cells': cls.cells})
+
+    @pytest.mark.parametrize(
+        'pool_size,write_concern',
+        list(itertools.product(POOL_SIZES, WRITE_CONCERNS)))
+    def test_throughput(self, pool_size, write_concern):
+        self.net.controller.env = dict(
+            self.env,
+            MONGO_MAX_POOLSIZE=str(pool_size),
+            MONGO_MIN_POOLSIZE=str(max(1, pool_size // 3)),
+            MONGO_HOST_SEEDS=seed_uri(
+                self.env['MONGO_HOST_SEEDS'], w=write_concern),
+        )
+        self.net.start_controller(clean_config=True, enable_all=True)
+        self.net.wait_topology_ready()
+
+        payloads = [KytosClient.evc_payload(UNI_A, UNI_Z, 100 + i)
+                    for i in range(EVCS)]
+        evc_results, evc_time = timed(
+            lambda client: client.create_evcs(payloads))
+
+        flows = [
+            (dpid, [{
+                'priority': 1000,
+                'match': {'in_port': 1, 'dl_vlan': 1 + i},
+                'actions': [{'action_type': 'output', 'port': 2}],
+            }])
+            for dpid in DPIDS for i in range(FLOWS_PER_SWITCH)
+        ]
+        flow_results, flow_time = timed(
+            lambda client: client.install_flows(flows))
+
+        cell = {
+            'pool_size': pool_size,
+            'write_concern': write_concern,
+            'evc': burst_summary(evc_results, evc_time, 201),
+            'flow': burst_summary(flow_results, flow_time, 202),
+        }
+        self.cells.append(cell)
+        assert cell['evc']['errors'] == 0 and cell['flow']['errors'] == 0, cell
@@ -0,0 +1,180 @@
+"""Persistence cost of the storehouse filesystem and MongoDB backends.
+
+The same workload runs once with kytosd started without ``--database``
+(napps persist through storehouse files) and once with
+``--database mongodb``:
+
+* N EVC creations and M flow installs, sent concurrently;
+* sequential switch and interface metadata writes;
+* a restart without cleanup, timed until kytosd is ready and until the
+  EVCs and flows are loaded back.
+
+Write latencies, restart load times and the disk used by each backend
+are compared in a table and saved as JSON under BENCH_OUTPUT_DIR.
+"""
+import os
+import time
+
+import pytest
+
+from tests import async_client
+from tests.benchmark import bench, write_result, write_table
+from tests.helpers import (STOREHOUSE, KytosClient, latency_summary,
+                           shared_network, wait_until)
+
+CONTROLLER = '127.0.0.1'
+
+EVCS = int(os.environ.get('BENCH_STORAGE_EVCS', 500))
+FLOWS_PER_SWITCH = int(os.environ.get('BENCH_STORAGE_FLOWS', 1000))
+METADATA_WRITES = int(os.environ.get('BENCH_STORAGE_METADATA', 200))
+CONCURRENCY = int(os.environ.get('BENCH_STORAGE_CONCURRENCY', 50))
+
+UNI_A = '00:00:00:00:00:00:00:01:1'
+UNI_Z = '00:00:00:00:00:00:00:02:1'
+DPIDS = ['00:00:00:00:00:00:00:0%d' % i for i in (1, 2, 3)]
+
+BACKENDS = {'storehouse': None, 'mongodb': 'mongodb'}
+
+pytestmark = [bench, pytest.mark.serial]
+
+
+def directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def total_flows(client):
+    return sum(len(entry.get('flows', []))
+               for entry in client.list_flows().json().values())
+
+
+def stable_flows(client, timeout=60):
+    """Flow count once two reads in a row return the same non-zero value."""
+    previous = None
+
+    def check():
+        nonlocal previous
+        count = total_flows(client)
+        stable = count and count == previous
+        previous = count
+        return count if stable else None
+    return wait_until(check, timeout=timeout, interval=2, max_interval=5)
+
+
+class TestBenchStorageBackends:
+    net = None
+    runs = []
+
+    @classmethod
+    def setup_class(cls):
+        cls.net = shared_network(CONTROLLER)
+        cls.net.start()
+        cls.net.wait_switches_connect()
+
+    @classmethod
+    def teardown_class(cls):
+        cls.net.start_controller(clean_config=True)
+        if cls.runs:
+            write_table('storage_backends', [
+                'backend', 'evc p99 s', 'flow p99 s', 'metadata p99 s',
+                'ready s', 'evcs loaded s', 'flows loaded s', 'storehouse KiB',
+                'mongo KiB'], [
+                [run['backend'],
+                 '%.4f' % run['evc']['latency'].get('p99', 0),
+                 '%.4f' % run['flow']['latency'].get('p99', 0),
+                 '%.4f' % run['metadata'].get('p99', 0),
+                 '%.2f' % run['restart']['ready'],
+                 '%.2f' % run['restart']['evcs_loaded'],
+                 '%.2f' % run['restart']['flows_loaded'],
+                 run['disk']['storehouse'] // 1024,
+                 'n/a' if run['disk']['mongo_data'] is None
+                 else run['disk']['mongo_data'] // 1024]
+                for run in cls.runs])
+            write_result('storage_backends', {'runs': cls.runs})
+        cls.net.stop()
+
+    @pytest.mark.parametrize('backend', sorted(BACKENDS))
+    def test_backend(self, backend):
+        database = BACKENDS[backend]
+        # the mongodb numbers must only count what this run wrote
+        self.net.drop_database()
+        self.net.start_controller(clean_config=True, enable_all=True,
+                                  database=database)
+        self.net.wait_topology_ready()
+        client = KytosClient(self.net.instance.api)
+
+        payloads = [KytosClient.evc_payload(UNI_A, UNI_Z, 100 + i)
+                    for i in range(EVCS)]
+        evc_results = async_client.run(
+            lambda c: c.create_evcs(payloads), self.net.instance.api,
+            CONCURRENCY)
+        flows = [
+            (dpid, [{
+                'priority': 1000,
+                'match': {'in_port': 1, 'dl_vlan': 1 + i},
+                'actions': [{'action_type': 'output', 'port': 2}],
+            }])
+            for dpid in DPIDS for i in range(FLOWS_PER_SWITCH)
+        ]
+        flow_results = async_client.run(
+            lambda c: c.install_flows(flows), self.net.instance.api,
+            CONCURRENCY)
+        for i in range(METADATA_WRITES):
+            client.add_switch_metadata(DPIDS[i % len(DPIDS)], {'key%d' % i: i})
+            client.add_interface_metadata(UNI_A, {'key%d' % i: i})
+        metadata = latency_summary(
+            client.latencies['POST /topology/v3/switches/<dpid>/metadata']
+            + client.latencies['POST /topology/v3/interfaces/<id>/metadata'])
+
+        created = sum(1 for r in evc_results if r.status == 201)
+        flows_before = stable_flows(client)
+
+        start = time.monotonic()
+        self.net.start_controller(enable_all=True, database=database)
+        ready = time.monotonic() - start
+        wait_until(lambda: len(client.list_evcs().json()) >= created,
+                   timeout=300)
+        evcs_loaded = time.monotonic() - start
+        wait_until(lambda: total_flows(client) >= flows_before, timeout=300)
+        flows_loaded = time.monotonic() - start
+
+        disk = {'storehouse': directory_size(STOREHOUSE)}
+        # without --database kytosd writes nothing to MongoDB
+        stats = self.net.db.command('dbstats') if database else None
+        for key, stat in (('mongo_data', 'dataSize'),
+                          ('mongo_storage', 'storageSize'),
+                          ('mongo_indexes', 'indexSize')):
+            disk[key] = int(stats.get(stat, 0)) if stats else None
+        run = {
+            'backend': backend,
+            'evcs': EVCS,
+            'flows': len(flows),
+            'metadata_writes': METADATA_WRITES * 2,
+            'evc': {
+                'errors': EVCS - created,
+                'latency': latency_summary(
+                    [r.latency for r in evc_results if r.status == 201]),
+            },
+            'flow': {
+                'errors': sum(1 for r in flow_results if r.status != 202),
+                'latency': latency_summary(
+                    [r.latency for r in flow_results if r.status == 202]),
+            },
+            'metadata': metadata,
+            'restart': {
+                'ready': ready,
+                'evcs_loaded': evcs_loaded,
+                'flows_loaded': flows_loaded,
+                'kytosd_timings': dict(self.net.controller.timings),
+            },
+            'disk': disk,
+        }
+        self.runs.append(run)
+        client.close()
+        assert run['evc']['errors'] == 0 and run['flow']['errors'] == 0, run
@@ -0,0 +1,187 @@
+"""EVC scale on the Amlight topology.
+
+For each scale in BENCH_EVC_SCALES (100, 1k and 4k EVCs by default) the
+EVCs are spread over every pair of the 11 UNIs with distinct VLANs and
+created concurrently through /mef_eline/v2/evc/. Measured:
+
+* acceptance latency of the POSTs;
+* time until each EVC is ``active`` (from the persisted change in the
+  evcs collection when a change stream is available, else from polling
+  the API);
+* time until each EVC's flows (cookie 0xaa<circuit id>) are in the
+  tables of its UNI switches and of every switch on its current path,
+  from the last ADDED event ``ovs-ofctl monitor`` reported for it on
+  each of them;
+* kytosd RSS before, at the peak and after;
+* delete throughput, and time until the tables are free of EVC flows
+  (last DELETED event).
+
+Every scale writes evc_scale_<n>-<timestamp>.json under BENCH_OUTPUT_DIR.
+"""
+import os
+import time
+
+import pytest
+
+from tests import async_client
+from tests.benchmark import RssSampler, bench, rss_kb, write_result
+from tests.flows import FlowMonitor
+from tests.helpers import (KytosClient, evc_cookie, evc_switches,
+                           format_dpid, latency_summary, shared_network,
+                           topos, wait_until)
+from tests.mongo_seed import TopoGraph
+from tests.mongo_watch import DocumentWatcher
+
+CONTROLLER = '127.0.0.1'
+
+SCALES = [int(n) for n in
+          os.environ.get('BENCH_EVC_SCALES', '100,1000,4000').split(',')]
+CONCURRENCY = int(os.environ.get('BENCH_EVC_CONCURRENCY', 50))
+TIMEOUT = float(os.environ.get('BENCH_EVC_TIMEOUT', 900))
+
+pytestmark = bench
+
+
+class TestBenchEvcScale:
+    net = None
+
+    @classmethod
+    def setup_class(cls):
+        cls.net = shared_network(CONTROLLER, 'amlight')
+        cls.net.start()
+        cls.net.wait_switches_connect()
+
+    @classmethod
+    def teardown_class(cls):
+        cls.net.stop()
+
+    def setup_method(self, method):
+        self.net.reset_controller(enable_all=True)
+        self.net.wait_topology_ready(timeout=60)
+
+    def switch_names(self):
+        """Switch name for each dpid, as used by flow monitors."""
+        return {format_dpid(sw.dpid): sw.alias
+                for sw in self.net.net.switches}
+
+    def expected_flows(self, client, circuit_ids):
+        """{cookie: switch names} from each EVC's UNIs and current path."""
+        names = self.switch_names()
+        evcs = client.list_evcs().json()
+        return {evc_cookie(cid): {names[dpid]
+                                  for dpid in evc_switches(evcs[cid])}
+                for cid in circuit_ids}
+
+    def wait_flows(self, monitor, expected, since, event='ADDED'):
+        """Wait until every (switch, cookie) of ``expected`` got ``event``.
+
+        ``since`` is a wall clock time. Returns {cookie: seconds since
+        ``since`` of its last ``event`` on the last of its switches}.
+        """
+        def check():
+            last = {}
+            for e in monitor.select(event=event, since=since):
+                last[e.switch, e.flow.cookie] = e.timestamp
+            try:
+                return {cookie: max(last[name, cookie] for name in names)
+                        - since for cookie, names in expected.items()}
+            except KeyError:
+                return None
+        return wait_until(check, timeout=TIMEOUT, interval=0.5,
+                          max_interval=2)
+
+    def wait_active(self, client, circuit_ids, start):
+        """Poll the API until every EVC is active; seconds since start."""
+        pending = set(circuit_ids)
+        active = {}
+
+        def check():
+            evcs = client.list_evcs().json()
+            now = time.monotonic() - start
+            for circuit_id in list(pending):
+                if evcs.get(circuit_id, {}).get('active'):
+                    pending.discard(circuit_id)
+                    active[circuit_id] = now
+            return not pending
+        wait_until(check, timeout=TIMEOUT, interval=0.5, max_interval=2)
+        return active
+
+    @pytest.mark.parametrize('scale', SCALES)
+    def test_evc_scale(self, scale):
+        graph = TopoGraph(topos['amlight'](instance=self.net.instance))
+        endpoints = graph.evc_endpoints(scale)
+        payloads = [KytosClient.evc_payload(uni_a, uni_z, vlan)
+                    for uni_a, uni_z, vlan in endpoints]
+        client = KytosClient(self.net.instance.api)
+        pid = self.net.controller.pid
+        rss_before = rss_kb(pid)
+
+        with RssSampler(pid) as rss, \
+                FlowMonitor(self.net.net.switches) as monitor, \
+                DocumentWatcher(self.net.db['evcs'], {'active': True}) as watcher:
+            start = time.monotonic()
+            wall_start = time.time()
+            results = async_client.run(lambda c: c.create_evcs(payloads),
+                                       self.net.instance.api, CONCURRENCY)
+            accepted = time.monotonic() - start
+            created = {r.data['circuit_id']: payload
+                       for r, payload in zip(results, payloads)
+                       if r.status == 201}
+            if watcher.available:
+                wait_until(lambda: not watcher.available
+                           or set(created) <= set(watcher.seen),
+                           timeout=TIMEOUT, interval=0.2, max_interval=1)
+            if watcher.available:
+                active = {cid: watcher.seen[cid].persisted_at.timestamp()
+                          - wall_start for cid in created}
+            else:
+                active = self.wait_active(client, created, start)
+            # active EVCs have their current_path set
+            expected = self.expected_flows(client, created)
+            installed = self.wait_flows(monitor, expected, wall_start)
+            rss_loaded = rss_kb(pid)
+
+            delete_start = time.monotonic()
+            wall_delete_start = time.time()
+            deletes = async_client.run(lambda c: c.delete_evcs(list(created)),
+                                       self.net.instance.api, CONCURRENCY)
+            delete_time = time.monotonic() - delete_start
+            removed = self.wait_flows(monitor, expected, wall_delete_start,
+                                      event='DELETED')
+
+        deleted = [r for r in deletes if r.status == 200]
+        result = {
+            'scale': scale,
+            'concurrency': CONCURRENCY,
+            'unis': len(graph.edge_ports),
+            'created': len(created),
+            'create_errors': scale - len(created),
+            'accept_duration': accepted,
+            'accept_latency': latency_summary(
+                [r.latency for r in results if r.status == 201]),
+            'active_source': 'change stream' if watcher.available else 'api',
+            'time_to_active': latency_summary(list(active.values())),
+            'time_to_flows': latency_summary(list(installed.values())),
+            'rss_kb': {
+                'before': rss_before,
+                'loaded': rss_loaded,
+                'peak': rss.peak,
+                'after_delete': rss_kb(pid),
+            },
+            'delete': {
+                'deleted': len(deleted),
+                'duration': delete_time,
+                'throughput': len(deleted) / delete_time if delete_time else None,
+                'latency': latency_summary([r.latency for r in deleted]),
+                'flows_removed': latency_summary(list(removed.values())),
+            },
+        }
+        write_result('evc_scale_%d' % scale, result)
+        print('%d EVCs: accepted in %.2fs, all active after %.2fs, flows '
+              'after %.2fs, %.1f deletes/s, peak RSS %s kB' % (
+                  scale, accepted, result['time_to_active'].get('max', 0),
+                  result['time_to_flows'].get('max', 0),
+                  result['delete']['throughput'] or 0, rss.peak))
+        client.close()
+        assert len(created) == scale
+        assert len(deleted) == len(created)
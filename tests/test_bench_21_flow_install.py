@@ -0,0 +1,219 @@
+"""Flow install throughput of flow_manager, seen from the switches.
+
+For each endpoint (``/flow_manager/v2/flows/<dpid>`` and the multi-dpid
+``/flow_manager/v2/flows``) and batch size (1, 10, 100 and 1000 flows
+per POST), flows are offered at increasing rates (BENCH_FLOW_RATES,
+flow entries per second) by an open-loop sender for BENCH_FLOW_DURATION
+seconds. Every flow has its own cookie, so ``ovs-ofctl monitor``
+ADDED events give the end-to-end install latency of each entry.
+
+A rate is sustainable when no request fails, every flow shows up and
+the latency of the last tenth of the flows is at most
+BENCH_FLOW_BACKLOG times that of the first tenth (no growing backlog).
+The sweep of an endpoint/batch pair stops at its first unsustainable
+rate; the highest sustainable rates are tabulated and every cell is
+saved as JSON under BENCH_OUTPUT_DIR.
+"""
+import asyncio
+import os
+import time
+
+import pytest
+
+from tests.async_client import AsyncKytosClient
+from tests.benchmark import bench, write_result, write_table
+from tests.flows import FlowMonitor
+from tests.helpers import (KytosClient, WaitTimeout, format_dpid,
+                           latency_summary, shared_network, wait_until)
+
+CONTROLLER = '127.0.0.1'
+
+RATES = [int(rate) for rate in os.environ.get(
+    'BENCH_FLOW_RATES', '100,250,500,1000,2000,4000').split(',')]
+BATCH_SIZES = [1, 10, 100, 1000]
+DURATION = float(os.environ.get('BENCH_FLOW_DURATION', 10))
+DRAIN_TIMEOUT = float(os.environ.get('BENCH_FLOW_DRAIN', 60))
+BACKLOG_LIMIT = float(os.environ.get('BENCH_FLOW_BACKLOG', 2.0))
+CONCURRENCY = int(os.environ.get('BENCH_FLOW_CONCURRENCY', 200))
+
+# cookies of the benchmark flows: 0xbe << 56 | sequence number
+BENCH_COOKIE_PREFIX = 0xbe
+BENCH_COOKIE_MASK = 0xff << 56
+
+pytestmark = bench
+
+
+def bench_flow(seq):
+    return {
+        'priority': 1000 + seq // 4094,
+        'cookie': BENCH_COOKIE_PREFIX << 56 | seq,
+        'match': {'in_port': 1, 'dl_vlan': 1 + seq % 4094},
+        'actions': [{'action_type': 'output', 'port': 2}],
+    }
+
+
+def build_requests(endpoint, batch, total, dpids):
+    """``(path, body, [(dpid, cookie), ...])`` for ``total`` flow entries.
+
+    ``batch`` is the number of flows in each body; on the multi-dpid
+    endpoint every one of them is installed on all ``dpids``.
+    """
+    requests_ = []
+    seq = entries = 0
+    while entries < total:
+        flows = [bench_flow(s) for s in range(seq, seq + batch)]
+        seq += batch
+        if endpoint == 'dpid':
+            dpid = dpids[len(requests_) % len(dpids)]
+            path, body, targets = ('/flow_manager/v2/flows/' + dpid,
+                                   {'flows': flows}, [dpid])
+        else:
+            path, body, targets = ('/flow_manager/v2/flows',
+                                   {'flows': flows, 'switches': dpids}, dpids)
+        expected = [(dpid, f['cookie']) for dpid in targets for f in flows]
+        entries += len(expected)
+        requests_.append((path, body, expected))
+    return requests_
+
+
+async def send_paced(client, requests_, interval, sent_at):
+    """Open-loop sender: request ``i`` leaves at ``i * interval``."""
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    tasks = []
+    for index, (path, body, _) in enumerate(requests_):
+        delay = start + index * interval - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        sent_at.append(time.time())
+        tasks.append(asyncio.ensure_future(client.post(path, body)))
+    return await asyncio.gather(*tasks)
+
+
+class TestBenchFlowInstall:
+    net = None
+    cells = []
+
+    @classmethod
+    def setup_class(cls):
+        cls.net = shared_network(CONTROLLER)
+        cls.net.start()
+        cls.net.wait_switches_connect()
+        cls.net.reset_controller(enable_all=True)
+        cls.net.wait_topology_ready()
+        cls.names = {format_dpid(sw.dpid): sw.alias
+                     for sw in cls.net.net.switches}
+        cls.client = KytosClient(cls.net.instance.api)
+
+    @classmethod
+    def teardown_class(cls):
+        cls.client.close()
+        if cls.cells:
+            best = {}
+            for cell in cls.cells:
+                key = (cell['endpoint'], cell['batch'])
+                best.setdefault(key, None)
+                if cell['sustainable']:
+                    best[key] = max(best[key] or 0, cell['offered_rate'])
+            write_table('flow_install', [
+                'endpoint', 'batch', 'sustainable flows/s'],
+                [[endpoint, batch, rate if rate is not None else '-']
+                 for (endpoint, batch), rate in sorted(best.items())])
+            write_result('flow_install', {'cells': cls.cells})
+        cls.net.stop()
+
+    def remove_bench_flows(self):
+        flows = [{'cookie': BENCH_COOKIE_PREFIX << 56,
+                  'cookie_mask': BENCH_COOKIE_MASK}]
+        for dpid in self.names:
+            self.client.delete_flows(flows, dpid)
+        wait_until(
+            lambda: not sum(self.net.flow_snapshot(
+                'cookie=0x%x/0x%x' % (BENCH_COOKIE_PREFIX << 56,
+                                      BENCH_COOKIE_MASK),
+                aggregate=True).counts().values()),
+            timeout=DRAIN_TIMEOUT)
+
+    def run_cell(self, endpoint, batch, rate):
+        dpids = sorted(self.names)
+        total = int(rate * DURATION)
+        requests_ = build_requests(endpoint, batch, total, dpids)
+        entries = sum(len(expected) for _, _, expected in requests_)
+        interval = DURATION / len(requests_)
+        sent_at = []
+        owner = {}
+        for index, (_, _, expected) in enumerate(requests_):
+            for dpid, cookie in expected:
+                owner[(self.names[dpid], cookie)] = index
+
+        with FlowMonitor(self.net.net.switches) as monitor:
+            async def main():
+                async with AsyncKytosClient(self.net.instance.api,
+                                            CONCURRENCY) as client:
+                    return await send_paced(client, requests_, interval,
+                                            sent_at)
+            results = asyncio.run(main())
+
+            def installed():
+                first = {}
+                for e in monitor.select(event='ADDED'):
+                    key = (e.switch, e.flow.cookie)
+                    if key in owner:
+                        first.setdefault(key, e.timestamp)
+                return first
+            try:
+                wait_until(lambda: len(installed()) >= entries,
+                           timeout=DRAIN_TIMEOUT, interval=0.5, max_interval=1)
+            except WaitTimeout:
+                pass
+            seen = installed()
+
+        latencies = sorted(
+            ((owner[key], timestamp - sent_at[owner[key]])
+             for key, timestamp in seen.items()), key=lambda item: item[0])
+        values = [latency for _, latency in latencies]
+        tenth = max(1, len(values) // 10)
+        head = latency_summary(values[:tenth]).get('p50')
+        tail = latency_summary(values[-tenth:]).get('p50')
+        backlog = tail / head if head else None
+        errors = sum(1 for r in results if r.status != 202)
+        span = (max(seen.values()) - sent_at[0]) if seen else None
+        cell = {
+            'endpoint': endpoint,
+            'batch': batch,
+            'offered_rate': rate,
+            'requests': len(requests_),
+            'entries': entries,
+            'installed': len(seen),
+            'errors': errors,
+            'achieved_rate': len(seen) / span if span else None,
+            'request_latency': latency_summary(
+                [r.latency for r in results if r.latency is not None]),
+            'install_latency': latency_summary(values),
+            'backlog_ratio': backlog,
+        }
+        cell['sustainable'] = (
+            errors == 0 and len(seen) == entries
+            and backlog is not None and backlog <= BACKLOG_LIMIT)
+        return cell
+
+    @pytest.mark.parametrize('batch', BATCH_SIZES)
+    @pytest.mark.parametrize('endpoint', ['dpid', 'multi'])
+    def test_flow_install_rate(self, endpoint, batch):
+        sustained = None
+        for rate in RATES:
+            self.remove_bench_flows()
+            cell = self.run_cell(endpoint, batch, rate)
+            self.cells.append(cell)
+            print('%s batch=%d rate=%d: installed %d/%d, errors %d, '
+                  'p99 %.3fs, backlog x%s' % (
+                      endpoint, batch, rate, cell['installed'],
+                      cell['entries'], cell['errors'],
+                      cell['install_latency'].get('p99', 0),
+                      cell['backlog_ratio']))
+            if not cell['sustainable']:
+                break
+            sustained = rate
+        self.remove_bench_flows()
+        assert sustained is not None, \
+            'no sustainable rate for %s batch=%d' % (endpoint, batch)
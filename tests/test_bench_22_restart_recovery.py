@@ -0,0 +1,169 @@
+"""Recovery time of kytosd after a restart that keeps its state.
+
+For each ``<evcs>x<flows per switch>`` scale in BENCH_RESTART_SCALES
+the EVCs and flows of the ring topology are seeded into the napps
+database (tests/mongo_seed.py) and loaded by a clean kytosd start, then
+kytosd is restarted without cleaning its configuration. Milestones, in seconds since the restart
+was issued:
+
+* process_up: kytosd wrote its pid file;
+* status_running: /core/status reports running and napps are loaded;
+* switches_connected: every switch is connected again;
+* links_discovered: every link is active in topology/v3/links;
+* evcs_active: every preloaded EVC is active;
+* flows_consistent: the flow tables equal the ones before the restart.
+
+``ovs-ofctl snoop`` counts the FlowMods the switches receive from the
+restart until BENCH_RESTART_SETTLE seconds after the tables became
+consistent, and ``ovs-ofctl monitor`` reports which of them actually
+changed a table (spurious churn). Results are saved as JSON under
+BENCH_OUTPUT_DIR.
+"""
+import collections
+import os
+import time
+
+import pytest
+import requests
+
+from tests.benchmark import bench, write_result
+from tests.flows import FlowMonitor, OpenFlowSnoop
+from tests.helpers import (KytosClient, links_discovered, shared_network,
+                           switches_connected, topos, wait_until)
+from tests.mongo_seed import COLLECTIONS, Seeder
+
+CONTROLLER = '127.0.0.1'
+
+SCALES = [tuple(int(n) for n in scale.split('x')) for scale in
+          os.environ.get('BENCH_RESTART_SCALES', '100x1000,1000x5000').split(',')]
+TIMEOUT = float(os.environ.get('BENCH_RESTART_TIMEOUT', 600))
+SETTLE = float(os.environ.get('BENCH_RESTART_SETTLE', 30))
+
+pytestmark = bench
+
+
+class TestBenchRestartRecovery:
+    net = None
+
+    @classmethod
+    def setup_class(cls):
+        cls.net = shared_network(CONTROLLER)
+        cls.net.start()
+        cls.net.wait_switches_connect()
+
+    @classmethod
+    def teardown_class(cls):
+        cls.net.start_controller(clean_config=True)
+        cls.net.stop()
+
+    def preload(self, evcs, flows_per_switch):
+        """Seed the EVCs and flows and let a clean kytosd load them."""
+        topo = topos['ring'](instance=self.net.instance)
+        self.net.start_controller(
+            clean_config=True, enable_all=True,
+            seed=lambda db: Seeder(topo, db).seed(
+                evcs=evcs, flows_per_switch=flows_per_switch))
+        self.net.wait_topology_ready()
+        return self.net.db[COLLECTIONS['evcs']].distinct('_id')
+
+    def stable_tables(self):
+        """Snapshot the tables once two in a row are identical."""
+        previous = {}
+
+        def check():
+            nonlocal previous
+            tables = {name: set(table) for name, table in
+                      self.net.flow_snapshot().tables.items()}
+            stable = tables == previous
+            previous = tables
+            return tables if stable else None
+        return wait_until(check, timeout=TIMEOUT, interval=2, max_interval=5)
+
+    def evcs_active(self, client, circuit_ids):
+        def check():
+            evcs = client.list_evcs().json()
+            return all(evcs.get(cid, {}).get('active') for cid in circuit_ids)
+        return check
+
+    def tables_equal(self, expected):
+        def check():
+            tables = self.net.flow_snapshot().tables
+            return all(set(tables[name]) == flows
+                       for name, flows in expected.items())
+        return check
+
+    @pytest.mark.parametrize('evcs,flows_per_switch', SCALES)
+    def test_restart_recovery(self, evcs, flows_per_switch):
+        client = KytosClient(self.net.instance.api)
+        created = self.preload(evcs, flows_per_switch)
+        wait_until(self.evcs_active(client, created), timeout=TIMEOUT,
+                   interval=0.5, max_interval=5)
+        baseline = self.stable_tables()
+
+        milestones = {}
+        with OpenFlowSnoop(self.net.net.switches) as snoop, \
+                FlowMonitor(self.net.net.switches) as monitor:
+            restarted_at = time.time()
+            start = time.monotonic()
+            self.net.start_controller(enable_all=True)
+            timestamps = self.net.controller.timestamps
+            milestones['process_up'] = timestamps['spawned'] - start
+            milestones['status_running'] = timestamps['ready'] - start
+
+            pending = {
+                'switches_connected': switches_connected(self.net.net),
+                'links_discovered': links_discovered(
+                    self.net.expected_links(), self.net.instance.api),
+                'evcs_active': self.evcs_active(client, created),
+                'flows_consistent': self.tables_equal(baseline),
+            }
+
+            def poll():
+                now = time.monotonic() - start
+                for name, check in list(pending.items()):
+                    try:
+                        done = check()
+                    except (requests.RequestException, KeyError, ValueError):
+                        done = False
+                    if done:
+                        milestones[name] = now
+                        del pending[name]
+                return not pending
+            wait_until(poll, timeout=TIMEOUT, interval=0.2, max_interval=1)
+            time.sleep(SETTLE)
+            consistent = self.tables_equal(baseline)()
+            ended_at = time.time()
+
+        flow_mods = snoop.flow_mods(since=restarted_at, until=ended_at)
+        changes = [e for e in monitor.select(since=restarted_at)
+                   if e.event != 'INITIAL']
+        per_second = collections.Counter(
+            int(m.timestamp - restarted_at) for m in flow_mods)
+        result = {
+            'evcs': len(created),
+            'flows_per_switch': flows_per_switch,
+            'flows_in_tables': sum(len(flows) for flows in baseline.values()),
+            'milestones': milestones,
+            'kytosd_timings': dict(self.net.controller.timings),
+            'settle': SETTLE,
+            'flow_mods': {
+                'total': len(flow_mods),
+                'by_command': dict(collections.Counter(
+                    m.command for m in flow_mods)),
+                'by_switch': dict(collections.Counter(
+                    m.switch for m in flow_mods)),
+                'peak_per_second': max(per_second.values(), default=0),
+            },
+            'table_changes': dict(collections.Counter(
+                e.event for e in changes)),
+            'consistent_after_settle': consistent,
+        }
+        write_result('restart_recovery_%dx%d' % (evcs, flows_per_switch),
+                     result)
+        print('%d EVCs, %d flows/switch: %s; %d FlowMods, table changes %s'
+              % (evcs, flows_per_switch, ', '.join(
+                  '%s %.2fs' % item for item in milestones.items()),
+                 len(flow_mods), result['table_changes']))
+        client.close()
+        assert len(created) == evcs
+        assert consistent
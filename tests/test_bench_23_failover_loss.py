@@ -0,0 +1,173 @@
+"""Data-plane outage of an EVC when its path fails.
+
+An EVC between h1 (s1:1) and h3 (s2:1) on the ring4 topology carries a
+stream of sequence-numbered UDP packets (BENCH_LOSS_RATE packets per
+second, see tests/dataplane_probe.py) over VLAN 101. BENCH_LOSS_FAIL_AT
+seconds into the stream the s1-s2 link, which the EVC uses, goes down.
+Each run reports the outage (time during which the traffic sent was
+lost), how long after the fault the loss started and ended, lost,
+duplicated and reordered packets.
+
+Two EVC flavors are compared: a static backup_path (s1-s4-s3-s2) and
+dynamic_backup_path with no predefined path. Every mode runs
+BENCH_LOSS_RUNS times; runs and summaries are saved under
+BENCH_OUTPUT_DIR.
+"""
+import os
+import time
+
+import pytest
+
+from tests.benchmark import bench, write_result, write_table
+from tests.dataplane_probe import LossProbe
+from tests.helpers import (KytosClient, evc_active, latency_summary,
+                           shared_network, wait_until)
+
+CONTROLLER = '127.0.0.1'
+
+RATE = int(os.environ.get('BENCH_LOSS_RATE', 10000))
+DURATION = float(os.environ.get('BENCH_LOSS_DURATION', 20))
+FAIL_AT = float(os.environ.get('BENCH_LOSS_FAIL_AT', 5))
+RUNS = int(os.environ.get('BENCH_LOSS_RUNS', 5))
+
+VLAN = 101
+UNI_A = '00:00:00:00:00:00:00:01:1'
+UNI_Z = '00:00:00:00:00:00:00:02:1'
+PRIMARY_PATH = [
+    {"endpoint_a": {"id": "00:00:00:00:00:00:00:01:3"},
+     "endpoint_b": {"id": "00:00:00:00:00:00:00:02:3"}},
+]
+BACKUP_PATH = [
+    {"endpoint_a": {"id": "00:00:00:00:00:00:00:01:4"},
+     "endpoint_b": {"id": "00:00:00:00:00:00:00:04:4"}},
+    {"endpoint_a": {"id": "00:00:00:00:00:00:00:04:3"},
+     "endpoint_b": {"id": "00:00:00:00:00:00:00:03:4"}},
+    {"endpoint_a": {"id": "00:00:00:00:00:00:00:03:1"},
+     "endpoint_b": {"id": "00:00:00:00:00:00:00:02:4"}},
+]
+MODES = {
+    'static_backup': {'dynamic_backup_path': False,
+                      'primary_path': PRIMARY_PATH,
+                      'backup_path': BACKUP_PATH},
+    'dynamic_backup': {'dynamic_backup_path': True},
+}
+
+pytestmark = bench
+
+
+def add_vlan(host, address, peer, peer_address):
+    """Create vlan101 on ``host`` with a static neighbor entry for ``peer``.
+
+    The static entry keeps ARP out of the measured outage.
+    """
+    name = 'vlan%d' % VLAN
+    host.cmd('ip link add link %s name %s type vlan id %d'
+             % (host.intfNames()[0], name, VLAN))
+    host.cmd('ip link set up %s' % name)
+    host.cmd('ip addr add %s/24 dev %s' % (address, name))
+    host.cmd('ip neigh replace %s lladdr %s dev %s nud permanent'
+             % (peer_address, peer.MAC(), name))
+
+
+class TestBenchFailoverLoss:
+    net = None
+    summaries = []
+
+    @classmethod
+    def setup_class(cls):
+        cls.net = shared_network(CONTROLLER, 'ring4')
+        cls.net.start()
+        cls.net.wait_switches_connect()
+
+    @classmethod
+    def teardown_class(cls):
+        if cls.summaries:
+            write_table('failover_loss', [
+                'mode', 'runs', 'outage p50 s', 'outage max s',
+                'detect p50 s', 'lost p50', 'reordered', 'duplicates'], [
+                [s['mode'], s['runs'],
+                 '%.4f' % s['outage'].get('p50', 0),
+                 '%.4f' % s['outage'].get('max', 0),
+                 '%.4f' % s['loss_start'].get('p50', 0),
+                 s['lost'].get('p50', 0), s['reordered'], s['duplicates']]
+                for s in cls.summaries])
+        cls.net.stop()
+
+    def setup_method(self, method):
+        self.net.config_all_links_up()
+        self.net.reset_controller(enable_all=True)
+        self.net.wait_topology_ready()
+        self.h1, self.h3 = self.net.net.get('h1', 'h3')
+
+    def teardown_method(self, method):
+        self.net.config_all_links_up()
+        for host in (self.h1, self.h3):
+            host.cmd('ip link del vlan%d' % VLAN)
+
+    def run_once(self, mode):
+        """One EVC, one probe, one link failure."""
+        client = KytosClient(self.net.instance.api)
+        payload = KytosClient.evc_payload(UNI_A, UNI_Z, VLAN, **MODES[mode])
+        response = client.create_evc(payload)
+        assert response.status_code == 201, response.text
+        circuit_id = response.json()['circuit_id']
+        wait_until(evc_active(circuit_id, self.net.instance.api), timeout=60)
+        wait_until(lambda: ', 0% packet loss' in self.h1.cmd(
+            'ping -c1 -W1 101.0.0.3'), timeout=30)
+
+        with LossProbe(self.h1, self.h3, '101.0.0.3', rate=RATE,
+                       duration=DURATION) as probe:
+            time.sleep(FAIL_AT)
+            fault_at = time.time()
+            self.net.net.configLinkStatus('s1', 's2', 'down')
+        report = probe.report()
+
+        self.net.config_all_links_up()
+        client.delete_evc(circuit_id)
+        client.close()
+
+        gaps = report['gaps']
+        main = max(gaps, key=lambda gap: gap['duration'], default=None)
+        recovered = not gaps or \
+            gaps[-1]['first_seq'] + gaps[-1]['lost'] < report['sent']
+        report.update({
+            'mode': mode,
+            'fault_offset': fault_at - report['started_at'],
+            'loss_start': (main['begin'] - fault_at
+                           if main and main['begin'] is not None else None),
+            'loss_end': (main['begin'] + main['duration'] - fault_at
+                         if main and main['begin'] is not None else None),
+            'recovered': recovered,
+        })
+        return report
+
+    @pytest.mark.parametrize('mode', sorted(MODES))
+    def test_failover_loss(self, mode):
+        add_vlan(self.h1, '101.0.0.1', self.h3, '101.0.0.3')
+        add_vlan(self.h3, '101.0.0.3', self.h1, '101.0.0.1')
+        runs = []
+        for _ in range(RUNS):
+            runs.append(self.run_once(mode))
+            self.net.wait_topology_ready()
+
+        def values(key):
+            return [run[key] for run in runs if run[key] is not None]
+        summary = {
+            'mode': mode,
+            'rate': RATE,
+            'runs': len(runs),
+            'outage': latency_summary(values('outage')),
+            'loss_start': latency_summary(values('loss_start')),
+            'loss_end': latency_summary(values('loss_end')),
+            'lost': latency_summary(values('lost')),
+            'reordered': sum(values('reordered')),
+            'duplicates': sum(values('duplicates')),
+        }
+        self.summaries.append(summary)
+        write_result('failover_loss_%s' % mode,
+                     {'summary': summary, 'runs': runs})
+        print('%s: outage p50 %.4fs max %.4fs over %d runs' % (
+            mode, summary['outage'].get('p50', 0),
+            summary['outage'].get('max', 0), len(runs)))
+        assert all(run['recovered'] for run in runs), \
+            'the EVC did not recover before the probe ended'
@@ -0,0 +1,261 @@
+"""Many EVCs migrating at once when the link they share fails.
+
+On ring4 and on the Amlight topology, BENCH_MASS_EVCS EVCs (100 and
+500 by default) are created between the host ports of two adjacent
+switches, so they all ride the single link between them. The link is
+then brought down and, for every EVC, the benchmark records:
+
+* when mef_eline reports it active on a path without the failed link;
+* when the last of its flows (cookie 0xaa<circuit id>) was written to
+  a switch, i.e. when it regained connectivity.
+
+The FlowMod burst the switches receive is counted with ``ovs-ofctl
+snoop`` (total, duration and peak per 100 ms). EVCs either carry a
+pre-computed backup_path (the shortest path avoiding the link) or rely
+on dynamic_backup_path. Results are saved as JSON under
+BENCH_OUTPUT_DIR, with a summary table per topology.
+"""
+import collections
+import os
+import time
+
+import pytest
+
+from tests import async_client
+from tests.benchmark import bench, write_result, write_table
+from tests.flows import FlowMonitor, OpenFlowSnoop
+from tests.helpers import (KytosClient, evc_cookie, evc_switches,
+                           format_dpid, latency_summary, shared_network,
+                           topos, wait_until)
+from tests.mongo_seed import TopoGraph
+
+CONTROLLER = '127.0.0.1'
+
+SCALES = [int(n) for n in
+          os.environ.get('BENCH_MASS_EVCS', '100,500').split(',')]
+CONCURRENCY = int(os.environ.get('BENCH_MASS_CONCURRENCY', 50))
+TIMEOUT = float(os.environ.get('BENCH_MASS_TIMEOUT', 300))
+# FlowMod-free time after which the migration is considered over
+QUIET = float(os.environ.get('BENCH_MASS_QUIET', 3))
+
+MODES = ['static_backup', 'dynamic_backup']
+
+pytestmark = bench
+
+
+def shared_link(graph):
+    """A link between two switches with host ports and a detour.
+
+    Returns ``(link_id, interface_a, interface_b)``. Links doubled by a
+    parallel one are skipped, so the failure forces a different route.
+    """
+    uni_switches = {port.rsplit(':', 1)[0] for port in graph.edge_ports}
+    for lid, (iface_a, iface_b) in graph.links.items():
+        dpid_a, dpid_b = (i.rsplit(':', 1)[0] for i in (iface_a, iface_b))
+        parallel = sum(1 for neighbor, _, _ in graph.adjacency[dpid_a]
+                       if neighbor == dpid_b)
+        if dpid_a in uni_switches and dpid_b in uni_switches \
+                and parallel == 1 \
+                and graph.path(dpid_a, dpid_b, exclude={lid}):
+            return lid, iface_a, iface_b
+    raise ValueError('no link with host ports on both sides and a detour')
+
+
+def path_payload(hops):
+    return [{'endpoint_a': {'id': iface}, 'endpoint_b': {'id': peer}}
+            for _, iface, peer in hops]
+
+
+def evc_payloads(graph, link, count, mode):
+    """``count`` EVC payloads between the host ports around ``link``."""
+    lid, iface_a, iface_b = link
+    dpid_a, dpid_b = (i.rsplit(':', 1)[0] for i in (iface_a, iface_b))
+    pairs = [(a, z) for a in graph.edge_ports for z in graph.edge_ports
+             if a.startswith(dpid_a + ':') and z.startswith(dpid_b + ':')]
+    extra = {'dynamic_backup_path': mode == 'dynamic_backup'}
+    if mode == 'static_backup':
+        extra['primary_path'] = path_payload([link])
+        extra['backup_path'] = path_payload(
+            graph.path(dpid_a, dpid_b, exclude={lid}))
+    uni_vlans = dict.fromkeys(graph.edge_ports, 100)
+    payloads = []
+    for index in range(count):
+        uni_a, uni_z = pairs[index % len(pairs)]
+        vlan = max(uni_vlans[uni_a], uni_vlans[uni_z])
+        if vlan > 4094:
+            raise ValueError('only %d EVCs fit around this link' % index)
+        uni_vlans[uni_a] = uni_vlans[uni_z] = vlan + 1
+        payloads.append(KytosClient.evc_payload(uni_a, uni_z, vlan, **extra))
+    return payloads
+
+
+def uses_link(evc, lid):
+    return any(link.get('id') == lid for link in evc.get('current_path', []))
+
+
+class MassFailover:
+    """Scenario shared by the per-topology classes below."""
+
+    TOPO = None
+    net = None
+    results = []
+
+    @classmethod
+    def setup_class(cls):
+        cls.net = shared_network(CONTROLLER, cls.TOPO)
+        cls.net.start()
+        cls.net.wait_switches_connect()
+        cls.graph = TopoGraph(topos[cls.TOPO](instance=cls.net.instance))
+        cls.link = shared_link(cls.graph)
+        cls.names = {format_dpid(sw.dpid): sw.alias
+                     for sw in cls.net.net.switches}
+        cls.results = []
+
+    @classmethod
+    def teardown_class(cls):
+        cls.net.config_all_links_up()
+        if cls.results:
+            write_table('mass_failover_%s' % cls.TOPO, [
+                'mode', 'evcs', 'migrated p50 s', 'migrated max s',
+                'last flows s', 'flowmods', 'burst s', 'peak/100ms'], [
+                [r['mode'], r['evcs'],
+                 '%.3f' % r['api_migrated'].get('p50', 0),
+                 '%.3f' % r['api_migrated'].get('max', 0),
+                 '%.3f' % (r['last_evc_restored'] or 0),
+                 r['flow_mods']['total'],
+                 '%.3f' % r['flow_mods']['duration'],
+                 r['flow_mods']['peak_per_100ms']]
+                for r in cls.results])
+        cls.net.stop()
+
+    def setup_method(self, method):
+        self.net.config_all_links_up()
+        self.net.reset_controller(enable_all=True)
+        self.net.wait_topology_ready(timeout=60)
+
+    def wait_installed(self, client, created):
+        """Wait until every EVC has flows on its UNI and path switches."""
+        evcs = client.list_evcs().json()
+        expected = {
+            evc_cookie(cid): {self.names[dpid]
+                              for dpid in evc_switches(evcs[cid])}
+            for cid in created
+        }
+
+        def check():
+            snapshot = self.net.flow_snapshot()
+            return all(snapshot[name].cookies(cookie)
+                       for cookie, names in expected.items()
+                       for name in names)
+        wait_until(check, timeout=TIMEOUT, interval=0.5, max_interval=2)
+
+    def wait_migrated(self, client, circuit_ids, fault_at):
+        """Seconds after the fault when each EVC was active off the link."""
+        lid = self.link[0]
+        pending = set(circuit_ids)
+        migrated = {}
+
+        def check():
+            evcs = client.list_evcs().json()
+            now = time.time() - fault_at
+            for circuit_id in list(pending):
+                evc = evcs.get(circuit_id, {})
+                if evc.get('active') and evc.get('current_path') \
+                        and not uses_link(evc, lid):
+                    pending.discard(circuit_id)
+                    migrated[circuit_id] = now
+            return not pending
+        wait_until(check, timeout=TIMEOUT, interval=0.2, max_interval=1)
+        return migrated
+
+    @pytest.mark.parametrize('scale', SCALES)
+    @pytest.mark.parametrize('mode', MODES)
+    def test_mass_failover(self, mode, scale):
+        lid, iface_a, iface_b = self.link
+        payloads = evc_payloads(self.graph, self.link, scale, mode)
+        client = KytosClient(self.net.instance.api)
+        results = async_client.run(lambda c: c.create_evcs(payloads),
+                                   self.net.instance.api, CONCURRENCY)
+        created = {r.data['circuit_id']: payload
+                   for r, payload in zip(results, payloads)
+                   if r.status == 201}
+        assert len(created) == scale
+
+        def all_on_link():
+            evcs = client.list_evcs().json()
+            return all(evcs.get(cid, {}).get('active')
+                       and uses_link(evcs[cid], lid) for cid in created)
+        wait_until(all_on_link, timeout=TIMEOUT, interval=0.5, max_interval=2)
+        self.wait_installed(client, created)
+
+        switch_a = self.names[iface_a.rsplit(':', 1)[0]]
+        switch_b = self.names[iface_b.rsplit(':', 1)[0]]
+        cookies = {evc_cookie(cid): cid for cid in created}
+        with OpenFlowSnoop(self.net.net.switches) as snoop, \
+                FlowMonitor(self.net.net.switches) as monitor:
+            fault_at = time.time()
+            self.net.net.configLinkStatus(switch_a, switch_b, 'down')
+            migrated = self.wait_migrated(client, created, fault_at)
+
+            def quiet():
+                flow_mods = snoop.flow_mods(since=fault_at)
+                return not flow_mods or \
+                    time.time() - flow_mods[-1].timestamp >= QUIET
+            wait_until(quiet, timeout=TIMEOUT, interval=0.5, max_interval=1)
+            flow_mods = snoop.flow_mods(since=fault_at)
+            events = [e for e in monitor.select(since=fault_at)
+                      if e.event != 'INITIAL' and e.flow.cookie in cookies]
+
+        restored = {}
+        for event in events:
+            if event.event in ('ADDED', 'MODIFIED'):
+                circuit_id = cookies[event.flow.cookie]
+                restored[circuit_id] = max(restored.get(circuit_id, 0),
+                                           event.timestamp - fault_at)
+        windows = collections.Counter(
+            int((m.timestamp - fault_at) * 10) for m in flow_mods)
+        result = {
+            'topology': self.TOPO,
+            'mode': mode,
+            'evcs': len(created),
+            'link': {'id': lid, 'endpoints': [iface_a, iface_b]},
+            'api_migrated': latency_summary(list(migrated.values())),
+            'flows_restored': latency_summary(list(restored.values())),
+            'evcs_without_flow_changes': len(created) - len(restored),
+            'last_evc_restored': max(
+                [max(migrated[cid], restored.get(cid, 0)) for cid in created],
+                default=None),
+            'flow_mods': {
+                'total': len(flow_mods),
+                'by_command': dict(collections.Counter(
+                    m.command for m in flow_mods)),
+                'by_switch': dict(collections.Counter(
+                    m.switch for m in flow_mods)),
+                'first': (flow_mods[0].timestamp - fault_at
+                          if flow_mods else None),
+                'duration': (flow_mods[-1].timestamp - flow_mods[0].timestamp
+                             if flow_mods else 0.0),
+                'peak_per_100ms': max(windows.values(), default=0),
+            },
+            'table_changes': dict(collections.Counter(e.event for e in events)),
+        }
+        self.results.append(result)
+        write_result('mass_failover_%s_%s_%d' % (self.TOPO, mode, scale),
+                     result)
+        print('%s %s %d EVCs: migrated p50 %.3fs max %.3fs, last restored '
+              '%.3fs, %d FlowMods in %.3fs' % (
+                  self.TOPO, mode, scale,
+                  result['api_migrated'].get('p50', 0),
+                  result['api_migrated'].get('max', 0),
+                  result['last_evc_restored'] or 0,
+                  len(flow_mods), result['flow_mods']['duration']))
+        client.close()
+        assert len(migrated) == len(created)
+
+
+class TestBenchMassFailoverRing4(MassFailover):
+    TOPO = 'ring4'
+
+
+class TestBenchMassFailoverAmlight(MassFailover):
+    TOPO = 'amlight'
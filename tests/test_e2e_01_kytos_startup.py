@@ -1,11 +1,14 @@
 import time
 import shutil
+import pytest
 import requests
-from tests.helpers import NetworkTest
+from tests.helpers import KYTOS_API, shared_network
 import re
 
 CONTROLLER = '127.0.0.1'
-KYTOS_API = 'http://%s:8181/api/kytos' % CONTROLLER
+
+# disables napps in the shared napps directory and reads /var/log/syslog
+pytestmark = pytest.mark.serial
 
 # TODO: check all the logs on the end
 # TODO: persist the logs of syslog
@@ -24,11 +27,10 @@ class TestE2EKytosServer:
         # which all elements are disabled in a clean setting
         self.net.start_controller(clean_config=True, enable_all=False)
         self.net.wait_switches_connect()
-        time.sleep(5)
 
     @classmethod
     def setup_class(cls):
-        cls.net = NetworkTest(CONTROLLER)
+        cls.net = shared_network(CONTROLLER)
         cls.net.start()
         cls.net.wait_switches_connect()
         # rotate logfile (copy/truncate strategy)
@@ -0,0 +1,64 @@
+import bson
+from bson.decimal128 import Decimal128
+
+from tests.helpers import INSTANCE, shared_mongo_client, stop_kytosd, topos
+from tests.mongo_seed import COLLECTIONS, SEED_COOKIE_PREFIX, Seeder
+
+
+class TestE2EMongoSeed:
+    db = None
+
+    @classmethod
+    def setup_class(cls):
+        # the seeder writes to and empties the napps database, which the
+        # kytosd left running by a previous module is using
+        stop_kytosd(INSTANCE)
+        cls.db = shared_mongo_client(database=INSTANCE.db_name)[INSTANCE.db_name]
+
+    def setup_method(self, method):
+        self.seeder = Seeder(topos['ring'](instance=INSTANCE), self.db,
+                             batch_size=50)
+
+    def teardown_method(self, method):
+        for name in COLLECTIONS.values():
+            self.db[name].delete_many({})
+
+    def test_005_documents_encode_to_bson(self):
+        switches, links = self.seeder.topology_documents()
+        documents = switches + links + self.seeder.evc_documents(20) \
+            + self.seeder.flow_documents(10) \
+            + self.seeder.maintenance_documents(2)
+        for document in documents:
+            bson.encode(document)
+
+    def test_010_flow_cookies_are_decimal128(self):
+        flows = self.seeder.flow_documents(3)
+        cookies = [doc['flow']['cookie'] for doc in flows]
+        assert all(isinstance(cookie, Decimal128) for cookie in cookies)
+        assert {int(cookie.to_decimal()) for cookie in cookies} == {
+            SEED_COOKIE_PREFIX << 56 | index for index in range(3)}
+
+    def test_015_seed_inserts_every_collection(self):
+        inserted = self.seeder.seed(evcs=100, flows_per_switch=120,
+                                    maintenances=3, topology=True)
+        switches = len(self.seeder.graph.dpids)
+        assert inserted == {
+            'switches': switches,
+            'links': len(self.seeder.graph.links),
+            'evcs': 100,
+            'flows': 120 * switches,
+            'maintenances': 3,
+        }
+        for key, count in inserted.items():
+            assert self.db[COLLECTIONS[key]].count_documents({}) == count
+
+        flow = self.db[COLLECTIONS['flows']].find_one(
+            {'flow.cookie': Decimal128(str(SEED_COOKIE_PREFIX << 56 | 119))})
+        assert flow is not None
+        assert flow['flow']['match']['dl_vlan'] == 120
+
+    def test_020_seed_again_skips_existing_documents(self):
+        self.seeder.seed(flows_per_switch=10)
+        assert self.seeder.seed(flows_per_switch=10) == {'flows': 0}
+        switches = len(self.seeder.graph.dpids)
+        assert self.db[COLLECTIONS['flows']].count_documents({}) == 10 * switches
@@ -1,11 +1,9 @@
 import json
 import requests
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from tests.helpers import NetworkTest
-import time
+from tests import async_client
+from tests.helpers import KYTOS_API, shared_network, wait_until
 
 CONTROLLER = '127.0.0.1'
-KYTOS_API = 'http://%s:8181/api/kytos' % CONTROLLER
 
 
 class TestE2ETopology:
@@ -19,14 +17,12 @@ class TestE2ETopology:
         # which all elements are disabled in a clean setting
         self.net.start_controller(clean_config=True, enable_all=False)
         self.net.wait_switches_connect()
-        time.sleep(10)
 
     @classmethod
     def setup_class(cls):
-        cls.net = NetworkTest(CONTROLLER)
+        cls.net = shared_network(CONTROLLER)
         cls.net.start()
         cls.net.wait_switches_connect()
-        time.sleep(10)
 
     @classmethod
     def teardown_class(cls):
@@ -39,8 +35,8 @@ class TestE2ETopology:
         self.net.start_controller(clean_config=_clean_config, enable_all=_enable_all)
         self.net.wait_switches_connect()
 
-        # Wait a few seconds to kytos execute LLDP
-        time.sleep(10)
+        # Wait for kytos to connect the switches and run LLDP
+        self.net.wait_ready(_enable_all)
 
     def test_005_list_topology(self):
         """
@@ -205,23 +201,13 @@ class TestE2ETopology:
 
         n_keys = 100
 
-        def insert_metadata(metadata):
-            payload = metadata
-            api_url = f"{KYTOS_API}/topology/v3/switches/{switch_id}/metadata"
-            return requests.post(
-                api_url,
-                data=json.dumps(payload),
-                headers={"Content-type": "application/json"},
-            )
-
+        path = f"/topology/v3/switches/{switch_id}/metadata"
         metadatas = [{str(k): k for k in range(n_keys)}]
-        with ThreadPoolExecutor(max_workers=n_keys) as executor:
-            futures = [
-                executor.submit(insert_metadata, metadata) for metadata in metadatas
-            ]
-            for future in as_completed(futures):
-                response = future.result()
-                assert response.status_code == 201, response.text
+        results = async_client.run(
+            lambda c: c.gather(c.post(path, metadata) for metadata in metadatas),
+            concurrency=n_keys)
+        for result in results:
+            assert result.status == 201, result
 
         # Verify that the metadata is inserted
         api_url = KYTOS_API + '/topology/v3/switches/%s/metadata' % switch_id
@@ -532,8 +518,9 @@ class TestE2ETopology:
         self.net.start_controller(clean_config=False)
         self.net.wait_switches_connect()
 
-        # Wait a few seconds to kytos execute LLDP
-        time.sleep(10)
+        # Wait for kytos to load the persisted links
+        wait_until(lambda: link_id1 in requests.get(
+            KYTOS_API + '/topology/v3/links').json()['links'])
 
         # check if the links are still enabled and now with the links
         api_url = KYTOS_API + '/topology/v3/links'
@@ -550,8 +537,9 @@ class TestE2ETopology:
         self.net.start_controller(clean_config=False)
         self.net.wait_switches_connect()
 
-        # Wait a few seconds to kytos execute LLDP
-        time.sleep(10)
+        # Wait for kytos to load the persisted links
+        wait_until(lambda: link_id1 in requests.get(
+            KYTOS_API + '/topology/v3/links').json()['links'])
 
         # check if the links are still enabled and now with the links
         api_url = KYTOS_API + '/topology/v3/links'
@@ -664,7 +652,7 @@ class TestE2ETopology:
         # which all elements are disabled in a clean setting
         self.net.start_controller(clean_config=True, enable_all=True)
         self.net.wait_switches_connect()
-        time.sleep(5)
+        self.net.wait_ready()
 
         # Make sure the switch is disabled
         api_url = KYTOS_API + '/topology/v3/switches'
@@ -681,7 +669,7 @@ class TestE2ETopology:
         # which all elements are disabled in a clean setting
         self.net.start_controller(clean_config=True, enable_all=True)
         self.net.wait_switches_connect()
-        time.sleep(5)
+        self.net.wait_ready()
 
         # Make sure the interfaces are disabled
         api_url = KYTOS_API + '/topology/v3/interfaces'
@@ -1,15 +1,16 @@
 import json
 import re
-import time
 from datetime import datetime, timedelta
 
 import pytest
 import requests
 
-from tests.helpers import NetworkTest
+from tests.helpers import (KYTOS_API, KytosClient, evc_active,
+                           evc_current_path, evc_installed, evc_matches,
+                           flows_present, kytos_client, path_endpoints,
+                           shared_network, wait_until)
 
 CONTROLLER = '127.0.0.1'
-KYTOS_API = 'http://%s:8181/api/kytos' % CONTROLLER
 
 TIME_FMT = "%Y-%m-%dT%H:%M:%S+0000"
 
@@ -29,15 +30,15 @@ class TestE2EMefEline:
         # which all elements are disabled in a clean setting
         self.net.start_controller(clean_config=True, enable_all=True)
         self.net.wait_switches_connect()
-        time.sleep(10)
+        self.net.wait_ready()
 
     @classmethod
     def setup_class(cls):
-        cls.net = NetworkTest(CONTROLLER)
+        cls.net = shared_network(CONTROLLER)
         cls.net.start()
         cls.net.restart_kytos_clean()
         cls.net.wait_switches_connect()
-        time.sleep(5)
+        cls.net.wait_ready()
 
     @classmethod
     def teardown_class(cls):
@@ -49,25 +50,13 @@ class TestE2EMefEline:
         self.net.start_controller(clean_config=_clean_config, enable_all=_enable_all)
         self.net.wait_switches_connect()
 
-        # Wait a few seconds to kytos execute LLDP
-        time.sleep(10)
+        # Wait for kytos to connect the switches and run LLDP
+        self.net.wait_ready(_enable_all)
 
     def create_evc(self, vlan_id, store=False):
-        payload = {
-            "name": "Vlan_%s" % vlan_id,
-            "enabled": True,
-            "dynamic_backup_path": True,
-            "uni_a": {
-                "interface_id": "00:00:00:00:00:00:00:01:1",
-                "tag": {"tag_type": 1, "value": vlan_id}
-            },
-            "uni_z": {
-                "interface_id": "00:00:00:00:00:00:00:02:1",
-                "tag": {"tag_type": 1, "value": vlan_id}
-            }
-        }
-        api_url = KYTOS_API + '/mef_eline/v2/evc/'
-        response = requests.post(api_url, data=json.dumps(payload), headers={'Content-type': 'application/json'})
+        payload = KytosClient.evc_payload("00:00:00:00:00:00:00:01:1",
+                                          "00:00:00:00:00:00:00:02:1", vlan_id)
+        response = kytos_client().create_evc(payload)
         assert response.status_code == 201, response.text
         data = response.json()
         if store:
@@ -107,7 +96,7 @@ class TestE2EMefEline:
         assert response.status_code == 201, response.text
         data = response.json()
         assert 'circuit_id' in data
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=3)
 
         h11, h12 = self.net.net.get('h11', 'h12')
         h11.cmd('ip link add link %s name vlan101 type vlan id 101' % (h11.intfNames()[0]))
@@ -159,7 +148,7 @@ class TestE2EMefEline:
         assert response.status_code == 201, response.text
         data = response.json()
         assert 'circuit_id' in data
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=3, s2=3)
 
         # Each switch must have 3 flows: 01 for LLDP + 02 for the EVC (ingress + egress)
         s1, s2 = self.net.net.get('s1', 's2')
@@ -210,7 +199,7 @@ class TestE2EMefEline:
         assert response.status_code == 201, response.text
         data = response.json()
         assert 'circuit_id' in data
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=3, s2=3)
 
         # Each switch must have 3 flows: 01 for LLDP + 02 for the EVC (ingress + egress)
         s1, s2 = self.net.net.get('s1', 's2')
@@ -259,7 +248,7 @@ class TestE2EMefEline:
         assert response.status_code == 201, response.text
         data = response.json()
         assert 'circuit_id' in data
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=3, s2=3)
 
         # Each switch must have 3 flows: 01 for LLDP + 02 for the EVC (ingress + egress)
         s1, s2 = self.net.net.get('s1', 's2')
@@ -311,7 +300,7 @@ class TestE2EMefEline:
         data = response.json()
         assert 'circuit_id' in data
         evc1 = data['circuit_id']
-        time.sleep(10)
+        wait_until(evc_installed(evc1, self.net.net))
 
         # Create circuit 2: same vlan id but in different UNIs
         payload = {
@@ -334,7 +323,7 @@ class TestE2EMefEline:
         assert 'circuit_id' in data
         evc2 = data['circuit_id']
         assert evc1 != evc2
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=5, s2=3, s3=3)
 
         # The switch 1 should have 5 flows: 01 for LLDP + 02 for evc1 + 02 for evc2
         # The switches 2 and 3 should have 3 flows: 01 for LLDP + 02 for each evc
@@ -405,7 +394,7 @@ class TestE2EMefEline:
         data = response.json()
         assert 'circuit_id' in data
         evc1 = data['circuit_id']
-        time.sleep(10)
+        wait_until(evc_installed(evc1, self.net.net))
 
         # It verifies EVC's status
         response = requests.get(api_url + evc1)
@@ -416,7 +405,8 @@ class TestE2EMefEline:
         payload = {"enable": False}
         response = requests.patch(api_url + evc1, data=json.dumps(payload), headers={'Content-type': 'application/json'})
         assert response.status_code == 200, response.text
-        time.sleep(10)
+        wait_until(evc_matches(evc1, enabled=False))
+        self.net.wait_flow_counts(s1=1, s2=1)
 
         # It verifies EVC's status
         response = requests.get(api_url + evc1)
@@ -465,13 +455,13 @@ class TestE2EMefEline:
         data = response.json()
         assert 'circuit_id' in data
         evc1 = data['circuit_id']
-        time.sleep(10)
+        wait_until(evc_installed(evc1, self.net.net))
 
         # Delete the circuit
         api_url += evc1
         response = requests.delete(api_url)
         assert response.status_code == 200, response.text
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=1, s2=1)
 
         # try to reuse the vlan id
         payload = {
@@ -494,7 +484,7 @@ class TestE2EMefEline:
         assert 'circuit_id' in data
         evc2 = data['circuit_id']
         assert evc1 != evc2
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=3, s2=3)
 
         # The switches should have 3 flows: 01 for LLDP + 02 for each evc
         s1, s2 = self.net.net.get('s1', 's2')
@@ -553,7 +543,8 @@ class TestE2EMefEline:
         response = requests.post(api_url, data=json.dumps(payload), headers={'Content-type': 'application/json'})
         assert response.status_code == 201, response.text
 
-        time.sleep(10)
+        evc1 = response.json()['circuit_id']
+        self.net.wait_flow_counts(s1=3, s2=3, s3=3)
 
         # Check on the virtual switches directly for flows
         s1, s2, s3 = self.net.net.get('s1', 's2', 's3')
@@ -568,8 +559,9 @@ class TestE2EMefEline:
         # Command to up/down links to test if back-up path is taken
         self.net.net.configLinkStatus('s1', 's2', 'down')
 
-        # Wait just a few seconds to give time to the controller receive and process the linkDown event
-        time.sleep(10)
+        # Wait for the controller to receive and process the linkDown event
+        wait_until(evc_current_path(evc1, payload['backup_path']))
+        self.net.wait_flow_counts(s1=3, s2=1, s3=3)
 
         # # Check on the virtual switches directly for flows
         flows_s1 = s1.dpctl('dump-flows')
@@ -607,12 +599,11 @@ class TestE2EMefEline:
 
         # restart the controller and change the port on purpose to avoid switches to connect
         self.net.start_controller(clean_config=False, enable_all=True, port=9999)
-        time.sleep(10)
 
         # Delete the circuit
         response = requests.delete(api_url + evc1)
         assert response.status_code == 200, response.text
-        time.sleep(10)
+        wait_until(lambda: evc1 not in requests.get(api_url).json())
 
         response = requests.get(api_url)
         assert response.status_code == 200, response.text
@@ -669,7 +660,7 @@ class TestE2EMefEline:
                 assert 'circuit_id' in data
                 evcs[i] = data['circuit_id']
 
-            time.sleep(10)
+            self.net.wait_flow_counts(s1=21, s2=21)
 
             # make sure the evcs are active and the flows were created
             s1, s2 = self.net.net.get('s1', 's2')
@@ -697,7 +688,7 @@ class TestE2EMefEline:
                 response = requests.delete(api_url)
                 assert response.status_code == 200, response.text
 
-            time.sleep(10)
+            self.net.wait_flow_counts(s1=1, s2=1)
 
             # make sure the circuits were deleted
             api_url = KYTOS_API + '/mef_eline/v2/evc/'
@@ -724,8 +715,8 @@ class TestE2EMefEline:
         for thread in threads:
             thread.join()
 
-        # give some time so Kytos can create the flows and everything
-        time.sleep(10)
+        # wait until Kytos has created the flows
+        self.net.wait_flow_counts(s1=21, s2=21)
 
         # make sure the evcs are active and the flows were created
         s1, s2 = self.net.net.get('s1', 's2')
@@ -756,7 +747,7 @@ class TestE2EMefEline:
             response = requests.delete(api_url)
             assert response.status_code == 200, response.text
 
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=1, s2=1)
 
         # make sure the circuits were deleted
         api_url = KYTOS_API + '/mef_eline/v2/evc/'
@@ -786,7 +777,7 @@ class TestE2EMefEline:
                                   headers={'Content-type': 'application/json'})
         assert response.status_code == 200, response.text
 
-        time.sleep(10)
+        wait_until(evc_matches(evc1, name='My EVC_100'))
 
         # It verifies EVC's new name
         response = requests.get(api_url + evc1)
@@ -808,7 +799,8 @@ class TestE2EMefEline:
                                   headers={'Content-type': 'application/json'})
         assert response.status_code == 200, response.text
 
-        time.sleep(10)
+        wait_until(lambda: requests.get(api_url + evc1).json()['uni_a']['interface_id']
+                   == payload['uni_a']['interface_id'])
 
         # It verifies EVC's data
         response = requests.get(api_url + evc1)
@@ -830,7 +822,8 @@ class TestE2EMefEline:
                                   headers={'Content-type': 'application/json'})
         assert response.status_code == 200, response.text
 
-        time.sleep(10)
+        wait_until(lambda: requests.get(api_url + evc1).json()['uni_z']['interface_id']
+                   == payload['uni_z']['interface_id'])
 
         # It verifies EVC's data
         response = requests.get(api_url + evc1)
@@ -855,7 +848,7 @@ class TestE2EMefEline:
         # It sets a new circuit's end_date
         requests.patch(api_url + evc1, data=json.dumps(payload),
                        headers={'Content-type': 'application/json'})
-        time.sleep(10)
+        wait_until(evc_matches(evc1, end_date=end_date.strftime(TIME_FMT)))
 
         # It verifies EVC's data
         response = requests.get(api_url + evc1)
@@ -863,7 +856,7 @@ class TestE2EMefEline:
         assert data['end_date'] == end_date.strftime(TIME_FMT)
 
         # waiting to reach the new end timing
-        time.sleep(end_delay*60+5)
+        wait_until(evc_matches(evc1, active=False), timeout=end_delay * 60 + 30)
 
         # Verify if the circuit is active
         api_url = KYTOS_API + '/mef_eline/v2/evc/' + evc1
@@ -884,7 +877,7 @@ class TestE2EMefEline:
         # It sets a new circuit's bandwidth
         requests.patch(api_url + evc1, data=json.dumps(payload),
                        headers={'Content-type': 'application/json'})
-        time.sleep(10)
+        wait_until(evc_matches(evc1, bandwidth=bandwidth))
 
         # It verifies EVC's data
         response = requests.get(api_url + evc1)
@@ -907,7 +900,10 @@ class TestE2EMefEline:
         requests.patch(api_url + evc1, data=json.dumps(payload),
                        headers={'Content-type': 'application/json'})
 
-        time.sleep(10)
+        s1, s2 = self.net.net.get('s1', 's2')
+        wait_until(evc_matches(evc1, priority=priority)
+                   & flows_present(s1, contains=['priority=100'])
+                   & flows_present(s2, contains=['priority=100']))
 
         # It verifies EVC's data
         response = requests.get(api_url + evc1)
@@ -934,7 +930,10 @@ class TestE2EMefEline:
         requests.patch(api_url + evc1, data=json.dumps(payload),
                        headers={'Content-type': 'application/json'})
 
-        time.sleep(10)
+        s1, s2 = self.net.net.get('s1', 's2')
+        wait_until(evc_matches(evc1, queue_id=queue_id)
+                   & flows_present(s1, contains=['set_queue:3'])
+                   & flows_present(s2, contains=['set_queue:3']))
 
         # It verifies EVC's data
         response = requests.get(api_url + evc1)
@@ -962,7 +961,7 @@ class TestE2EMefEline:
         requests.patch(api_url + evc1, data=json.dumps(payload),
                        headers={'Content-type': 'application/json'})
 
-        time.sleep(10)
+        wait_until(evc_matches(evc1, dynamic_backup_path=dynamic_backup_path))
 
         # It verifies EVC's data
         response = requests.get(api_url + evc1)
@@ -992,7 +991,7 @@ class TestE2EMefEline:
                                  headers={'Content-type': 'application/json'})
         data = response.json()
         evc1 = data['circuit_id']
-        time.sleep(10)
+        wait_until(evc_active(evc1))
         payload2 = {
             "primary_path": [
                 {"endpoint_a": {"id": "00:00:00:00:00:00:00:01:3"},
@@ -1006,7 +1005,8 @@ class TestE2EMefEline:
                                   headers={'Content-type': 'application/json'})
         assert response.status_code == 200, response.text
 
-        time.sleep(10)
+        wait_until(lambda: path_endpoints(requests.get(api_url + evc1).json()['primary_path'])
+                   == path_endpoints(payload2['primary_path']))
 
         # It verifies EVC's data
         response = requests.get(api_url + evc1)
@@ -1056,7 +1056,7 @@ class TestE2EMefEline:
         data = response.json()
         evc1 = data['circuit_id']
 
-        time.sleep(10)
+        wait_until(evc_installed(evc1, self.net.net))
 
         payload2 = {
             "backup_path": [
@@ -1069,7 +1069,8 @@ class TestE2EMefEline:
         requests.patch(api_url + evc1, data=json.dumps(payload2),
                        headers={'Content-type': 'application/json'})
 
-        time.sleep(10)
+        wait_until(lambda: path_endpoints(requests.get(api_url + evc1).json()['backup_path'])
+                   == path_endpoints(payload2['backup_path']))
 
         # It verifies EVC's data
         response = requests.get(api_url + evc1)
@@ -1109,18 +1110,17 @@ class TestE2EMefEline:
         data = response.json()
         evc1 = data['circuit_id']
 
-        time.sleep(10)
+        wait_until(evc_installed(evc1, self.net.net))
 
         # Command to up/down links to test if back-up path is taken
         self.net.net.configLinkStatus('s1', 's2', 'down')
 
-        # Wait just a few seconds to give time to the controller receive and process the linkDown event
-        time.sleep(10)
-
+        # Wait for the controller to receive and process the linkDown event
         current_path = [{"endpoint_a": {"id": "00:00:00:00:00:00:00:01:4"},
                          "endpoint_b": {"id": "00:00:00:00:00:00:00:03:3"}},
                         {"endpoint_a": {"id": "00:00:00:00:00:00:00:03:2"},
                          "endpoint_b": {"id": "00:00:00:00:00:00:00:02:3"}}]
+        wait_until(evc_current_path(evc1, current_path))
 
         # It verifies EVC's data
         response = requests.get(api_url + evc1)
@@ -1156,7 +1156,7 @@ class TestE2EMefEline:
         data = response.json()
         evc1 = data['circuit_id']
 
-        time.sleep(10)
+        wait_until(evc_installed(evc1, self.net.net))
 
         # It verifies EVC's data
         response = requests.get(api_url + evc1)
@@ -1175,13 +1175,13 @@ class TestE2EMefEline:
         # Command to up/down links to test if back-up path is taken
         self.net.net.configLinkStatus('s1', 's2', 'down')
 
-        # Wait just a few seconds to give time to the controller receive and process the linkDown event
-        time.sleep(10)
-
+        # Wait for the controller to receive and process the linkDown event
         current_path = [{"endpoint_a": {"id": "00:00:00:00:00:00:00:01:4"},
                          "endpoint_b": {"id": "00:00:00:00:00:00:00:03:3"}},
                         {"endpoint_a": {"id": "00:00:00:00:00:00:00:03:2"},
                          "endpoint_b": {"id": "00:00:00:00:00:00:00:02:3"}}]
+        wait_until(evc_matches(evc1, active=True)
+                   & evc_current_path(evc1, current_path))
 
         # It verifies EVC's data
         response = requests.get(api_url + evc1)
@@ -1221,13 +1221,13 @@ class TestE2EMefEline:
         data = response.json()
         evc1 = data['circuit_id']
 
-        time.sleep(10)
+        wait_until(evc_installed(evc1, self.net.net))
 
         # Command to up/down links to test if back-up path is taken
         self.net.net.configLinkStatus('s1', 's2', 'down')
 
-        # Wait just a few seconds to give time to the controller receive and process the linkDown event
-        time.sleep(10)
+        # Wait for the controller to receive and process the linkDown event
+        wait_until(evc_matches(evc1, active=False, current_path=[]))
 
         # It verifies EVC's data
         response = requests.get(api_url + evc1)
@@ -1,13 +1,11 @@
 import json
-import time
 
 import pytest
 import requests
 
-from tests.helpers import NetworkTest
+from tests.helpers import KYTOS_API, evc_installed, shared_network, wait_until
 
 CONTROLLER = '127.0.0.1'
-KYTOS_API = 'http://%s:8181/api/kytos' % (CONTROLLER)
 
 
 class TestE2EMefEline:
@@ -24,15 +22,15 @@ class TestE2EMefEline:
         # which all elements are disabled in a clean setting
         self.net.restart_kytos_clean()
         self.net.wait_switches_connect()
-        time.sleep(10)
+        self.net.wait_ready()
 
     @classmethod
     def setup_class(cls):
-        cls.net = NetworkTest(CONTROLLER, topo_name='ring4')
+        cls.net = shared_network(CONTROLLER, topo_name='ring4')
         cls.net.start()
         cls.net.restart_kytos_clean()
         cls.net.wait_switches_connect()
-        time.sleep(10)
+        cls.net.wait_ready()
 
     @classmethod
     def teardown_class(cls):
@@ -78,24 +76,20 @@ class TestE2EMefEline:
         response = requests.post(api_url, data=json.dumps(payload), headers={'Content-type': 'application/json'})
         assert response.status_code == 201, response.text
 
-        time.sleep(10)
+        wait_until(evc_installed(response.json()['circuit_id'], self.net.net))
 
         # Command to up/down links to test if back-up path is taken
         self.net.net.configLinkStatus('s1', 's2', 'down')
 
-        # Wait just a few seconds to give time to the controller receive and process the linkDown event
-        time.sleep(10)
+        # Wait for the controller to receive and process the linkDown event
+        self.net.wait_flow_counts(s1=3, s2=3, s3=3, s4=3)
 
         # Check on the virtual switches directly for flows
-        s1, s2, s3, s4 = self.net.net.get('s1', 's2', 's3', 's4')
-        flows_s1 = s1.dpctl('dump-flows')
-        flows_s2 = s2.dpctl('dump-flows')
-        flows_s3 = s3.dpctl('dump-flows')
-        flows_s4 = s4.dpctl('dump-flows')
-        assert len(flows_s1.split('\r\n ')) == 3
-        assert len(flows_s2.split('\r\n ')) == 3
-        assert len(flows_s3.split('\r\n ')) == 3
-        assert len(flows_s4.split('\r\n ')) == 3
+        flows = self.net.flow_snapshot()
+        assert flows.count('s1') == 3
+        assert flows.count('s2') == 3
+        assert flows.count('s3') == 3
+        assert flows.count('s4') == 3
 
         # Nodes should be able to ping each other
         h1, h3 = self.net.net.get('h1', 'h3')
@@ -143,22 +137,18 @@ class TestE2EMefEline:
         r = requests.post(api_url, data=json.dumps(payload), headers={'Content-type': 'application/json'})
         assert r.status_code == 201, r.text
 
-        time.sleep(10)
+        wait_until(evc_installed(r.json()['circuit_id'], self.net.net))
 
         # Command to disable links to test if back-up path is taken with the following command:
         self.net.net.configLinkStatus('s1', 's2', 'down')
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=3, s2=3, s3=3, s4=3)
 
         # Check on the virtual switches directly for flows
-        s1, s2, s3, s4 = self.net.net.get('s1', 's2', 's3', 's4')
-        flows_s1 = s1.dpctl('dump-flows')
-        flows_s2 = s2.dpctl('dump-flows')
-        flows_s3 = s3.dpctl('dump-flows')
-        flows_s4 = s4.dpctl('dump-flows')
-        assert len(flows_s1.split('\r\n ')) == 3
-        assert len(flows_s2.split('\r\n ')) == 3
-        assert len(flows_s3.split('\r\n ')) == 3
-        assert len(flows_s4.split('\r\n ')) == 3
+        flows = self.net.flow_snapshot()
+        assert flows.count('s1') == 3
+        assert flows.count('s2') == 3
+        assert flows.count('s3') == 3
+        assert flows.count('s4') == 3
 
         # Nodes should be able to ping each other
         h1, h3 = self.net.net.get('h1', 'h3')
@@ -204,23 +194,19 @@ class TestE2EMefEline:
         r = requests.post(api_url, data=json.dumps(payload), headers={'Content-type': 'application/json'})
         assert r.status_code == 201, r.text
 
-        time.sleep(10)
+        wait_until(evc_installed(r.json()['circuit_id'], self.net.net))
 
         # Command to disable links to test if back-up path is taken with the following command:
         self.net.net.configLinkStatus('s1', 's2', 'down')
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=3, s2=3, s3=3, s4=3)
 
         # Check on the virtual switches directly for flows
-        s1, s2, s3, s4 = self.net.net.get('s1', 's2', 's3', 's4')
-        flows_s1 = s1.dpctl('dump-flows')
-        flows_s2 = s2.dpctl('dump-flows')
-        flows_s3 = s3.dpctl('dump-flows')
-        flows_s4 = s4.dpctl('dump-flows')
+        flows = self.net.flow_snapshot()
 
-        assert len(flows_s1.split('\r\n ')) == 3
-        assert len(flows_s2.split('\r\n ')) == 3
-        assert len(flows_s3.split('\r\n ')) == 3
-        assert len(flows_s4.split('\r\n ')) == 3
+        assert flows.count('s1') == 3
+        assert flows.count('s2') == 3
+        assert flows.count('s3') == 3
+        assert flows.count('s4') == 3
 
         # Nodes should be able to ping each other
         h1, h3 = self.net.net.get('h1', 'h3')
@@ -255,18 +241,14 @@ class TestE2EMefEline:
         response = requests.post(api_url, data=json.dumps(payload), headers={'Content-type': 'application/json'})
         assert response.status_code == 201, response.text
 
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=3, s2=1, s3=1, s4=1)
 
         # Check on the virtual switches directly for flows.
-        s1, s2, s3, s4 = self.net.net.get('s1', 's2', 's3', 's4')
-        flows_s1 = s1.dpctl('dump-flows')
-        flows_s2 = s2.dpctl('dump-flows')
-        flows_s3 = s3.dpctl('dump-flows')
-        flows_s4 = s4.dpctl('dump-flows')
-        assert len(flows_s1.split('\r\n ')) == 3
-        assert len(flows_s2.split('\r\n ')) == 1
-        assert len(flows_s3.split('\r\n ')) == 1
-        assert len(flows_s4.split('\r\n ')) == 1
+        flows = self.net.flow_snapshot()
+        assert flows.count('s1') == 3
+        assert flows.count('s2') == 1
+        assert flows.count('s3') == 1
+        assert flows.count('s4') == 1
 
         # Nodes should be able to ping each other
         h1, h2 = self.net.net.get('h1', 'h2')
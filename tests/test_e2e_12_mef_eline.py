@@ -1,13 +1,12 @@
-import time
 from datetime import datetime, timedelta
 
 import pytest
 import requests
 
-from tests.helpers import NetworkTest
+from tests.helpers import KYTOS_API, evc_matches, shared_network, wait_until
+from tests.mongo_watch import wait_evc_exists
 
 CONTROLLER = '127.0.0.1'
-KYTOS_API = 'http://%s:8181/api/kytos' % CONTROLLER
 
 TIME_FMT = "%Y-%m-%dT%H:%M:%S+0000"
 
@@ -16,10 +15,9 @@ class TestE2EMefEline:
 
     @classmethod
     def setup_class(cls):
-        cls.net = NetworkTest(CONTROLLER)
+        cls.net = shared_network(CONTROLLER)
         cls.net.start()
         cls.net.wait_switches_connect()
-        time.sleep(10)
 
     @classmethod
     def teardown_class(cls):
@@ -29,7 +27,7 @@ class TestE2EMefEline:
     def kytos_clean(self):
         self.net.restart_kytos_clean()
         self.net.wait_switches_connect()
-        time.sleep(10)
+        self.net.wait_ready()
 
     @pytest.fixture()
     def circuit_id(self, kytos_clean):
@@ -39,14 +37,9 @@ class TestE2EMefEline:
     @pytest.fixture()
     def disabled_circuit_id(self, circuit_id):
         self._disable_circuit(circuit_id)
-        time.sleep(2)
+        wait_until(evc_matches(circuit_id, enabled=False))
         return circuit_id
 
-    def _circuit_exists(self, circuit_id):
-        api_url = KYTOS_API + '/mef_eline/v2/evc/' + circuit_id
-        response = requests.get(api_url)
-        return response.status_code == 200
-
     def _create_circuit(self):
         payload = {
             "name": "my evc1",
@@ -65,8 +58,7 @@ class TestE2EMefEline:
         data = response.json()
 
         # wait circuit to be created
-        while not self._circuit_exists(data.get('circuit_id')):
-            time.sleep(1)
+        wait_evc_exists(self.net.db, data.get('circuit_id'))
 
         return data.get('circuit_id')
 
@@ -105,9 +97,10 @@ class TestE2EMefEline:
         response = requests.post(api_url, json=payload)
         assert response.status_code == 201, response.text
 
-        # waiting some time to trigger the scheduler
+        # wait for the scheduler to enable the circuit
         sched_wait = 62
-        time.sleep(sched_wait)
+        wait_until(evc_matches(disabled_circuit_id, enabled=True),
+                   timeout=sched_wait)
 
         # Verify if the circuit is enabled 
         api_url = KYTOS_API + '/mef_eline/v2/evc/' + disabled_circuit_id
@@ -148,9 +141,10 @@ class TestE2EMefEline:
         response = requests.post(api_url, json=payload)
         assert response.status_code == 201, response.text
 
-        # waiting some time to trigger the scheduler
+        # wait for the scheduler to enable the circuit
         sched_wait = 62
-        time.sleep(sched_wait)
+        wait_until(evc_matches(disabled_circuit_id, enabled=True),
+                   timeout=sched_wait)
 
         # Verify if the circuit is enabled 
         api_url = KYTOS_API + '/mef_eline/v2/evc/' + disabled_circuit_id
@@ -250,9 +244,10 @@ class TestE2EMefEline:
         response = requests.patch(api_url, json=payload)
         assert response.status_code == 200, response.text
 
-        # waiting to trigger the scheduler
+        # wait for the scheduler to enable the circuit
         sched_wait = 62
-        time.sleep(sched_wait)
+        wait_until(evc_matches(disabled_circuit_id, enabled=True),
+                   timeout=sched_wait)
 
         # Verify if the circuit is enabled
         api_url = KYTOS_API + '/mef_eline/v2/evc/' + disabled_circuit_id
@@ -306,8 +301,6 @@ class TestE2EMefEline:
         response = requests.patch(api_url + circuit_id, json=payload)
         assert response.status_code == 400, response.text
 
-        time.sleep(10)
-
         # It gets EVC's data
         response = requests.get(api_url + circuit_id)
         data = response.json()
@@ -349,7 +342,8 @@ class TestE2EMefEline:
         response = requests.patch(api_url + schedule_id, json=payload2)
         assert response.status_code == 200, response.text
 
-        time.sleep(10)
+        wait_until(evc_matches(disabled_circuit_id,
+                               start_date=start.strftime(TIME_FMT)))
 
         # It verifies EVC's data
         api_url = KYTOS_API + '/mef_eline/v2/evc/'
@@ -365,7 +359,7 @@ class TestE2EMefEline:
         response = requests.delete(api_url)
         assert response.status_code == 200, response.text
 
-        time.sleep(10)
+        wait_until(lambda: requests.get(KYTOS_API + '/mef_eline/v2/evc/').json() == {})
 
         # Verify circuit removal by
         # listing all the circuits stored
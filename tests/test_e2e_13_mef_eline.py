@@ -1,14 +1,13 @@
 import json
-import time
 from datetime import datetime
 
 import pytest
 import requests
 
-from tests.helpers import NetworkTest
+from tests.helpers import (KYTOS_API, KytosClient, evc_installed, kytos_client,
+                           shared_network, wait_until)
 
 CONTROLLER = '127.0.0.1'
-KYTOS_API = 'http://%s:8181/api/kytos' % CONTROLLER
 
 TIME_FMT = "%Y-%m-%dT%H:%M:%S+0000"
 
@@ -28,36 +27,24 @@ class TestE2EMefEline:
         # which all elements are disabled in a clean setting
         self.net.start_controller(clean_config=True, enable_all=True)
         self.net.wait_switches_connect()
-        time.sleep(10)
+        self.net.wait_ready()
 
     @classmethod
     def setup_class(cls):
-        cls.net = NetworkTest(CONTROLLER)
+        cls.net = shared_network(CONTROLLER)
         cls.net.start()
         cls.net.restart_kytos_clean()
         cls.net.wait_switches_connect()
-        time.sleep(5)
+        cls.net.wait_ready()
 
     @classmethod
     def teardown_class(cls):
         cls.net.stop()
 
     def create_evc(self, vlan_id, store=False):
-        payload = {
-            "name": "Vlan_%s" % vlan_id,
-            "enabled": True,
-            "dynamic_backup_path": True,
-            "uni_a": {
-                "interface_id": "00:00:00:00:00:00:00:01:1",
-                "tag": {"tag_type": 1, "value": vlan_id}
-            },
-            "uni_z": {
-                "interface_id": "00:00:00:00:00:00:00:02:1",
-                "tag": {"tag_type": 1, "value": vlan_id}
-            }
-        }
-        api_url = KYTOS_API + '/mef_eline/v2/evc/'
-        response = requests.post(api_url, data=json.dumps(payload), headers={'Content-type': 'application/json'})
+        payload = KytosClient.evc_payload("00:00:00:00:00:00:00:01:1",
+                                          "00:00:00:00:00:00:00:02:1", vlan_id)
+        response = kytos_client().create_evc(payload)
         data = response.json()
         if store:
             self.evcs[vlan_id] = data['circuit_id']
@@ -67,7 +54,7 @@ class TestE2EMefEline:
         api_url = KYTOS_API + '/mef_eline/v2/evc/'
         evc1 = self.create_evc(100)
 
-        time.sleep(10)
+        wait_until(evc_installed(evc1, self.net.net))
 
         # It verifies EVC's data
         response = requests.get(api_url + evc1)
@@ -484,7 +471,6 @@ class TestE2EMefEline:
         response = requests.patch(api_url + evc1, data=json.dumps(payload2),
                                   headers={'Content-type': 'application/json'})
         assert response.status_code == 400, response.text
-        time.sleep(10)
 
         # It verifies EVC's data
         response = requests.get(api_url + evc1)
@@ -532,7 +518,6 @@ class TestE2EMefEline:
         response = requests.patch(api_url + evc1, data=json.dumps(payload2),
                                   headers={'Content-type': 'application/json'})
         assert response.status_code == 400, response.text
-        time.sleep(10)
 
         # It verifies EVC's data
         response = requests.get(api_url + evc1)
@@ -578,8 +563,6 @@ class TestE2EMefEline:
                                   headers={'Content-type': 'application/json'})
         assert response.status_code == 400, response.text
 
-        time.sleep(10)
-
         # It verifies EVC's data
         response = requests.get(api_url + evc1)
         data = response.json()
@@ -626,7 +609,6 @@ class TestE2EMefEline:
         response = requests.patch(api_url + evc1, data=json.dumps(payload2),
                                   headers={'Content-type': 'application/json'})
         assert response.status_code == 400, response.text
-        time.sleep(10)
 
         # It verifies EVC's data
         response = requests.get(api_url + evc1)
@@ -678,7 +660,6 @@ class TestE2EMefEline:
         response = requests.patch(api_url + evc1, data=json.dumps(payload2),
                                   headers={'Content-type': 'application/json'})
         assert response.status_code == 400, response.text
-        time.sleep(10)
 
         # It verifies EVC's data
         response = requests.get(api_url + evc1)
@@ -726,7 +707,6 @@ class TestE2EMefEline:
         response = requests.patch(api_url + evc1, data=json.dumps(payload2),
                                   headers={'Content-type': 'application/json'})
         assert response.status_code == 400, response.text
-        time.sleep(10)
 
         # It verifies EVC's data
         response = requests.get(api_url + evc1)
@@ -774,7 +754,6 @@ class TestE2EMefEline:
         response = requests.patch(api_url + evc1, data=json.dumps(payload2),
                                   headers={'Content-type': 'application/json'})
         assert response.status_code == 400, response.text
-        time.sleep(10)
 
         # It verifies EVC's data
         response = requests.get(api_url + evc1)
@@ -828,7 +807,6 @@ class TestE2EMefEline:
         response = requests.patch(api_url + evc1, data=json.dumps(payload2),
                                   headers={'Content-type': 'application/json'})
         assert response.status_code == 400, response.text
-        time.sleep(10)
 
         # It verifies EVC's data
         response = requests.get(api_url + evc1)
@@ -883,8 +861,6 @@ class TestE2EMefEline:
                                   headers={'Content-type': 'application/json'})
         assert response.status_code == 400, response.text
 
-        time.sleep(10)
-
         # It verifies EVC's data
         response = requests.get(api_url + evc1)
         data = response.json()
@@ -916,8 +892,6 @@ class TestE2EMefEline:
                                   headers={'Content-type': 'application/json'})
         assert response.status_code == 400, response.text
 
-        time.sleep(10)
-
         response = requests.get(api_url + evc1)
         data = response.json()
         assert data['creation_time'] == creation_time
@@ -980,7 +954,7 @@ class TestE2EMefEline:
         data = response.json()
         evc1 = data['circuit_id']
 
-        time.sleep(10)
+        wait_until(evc_installed(evc1, self.net.net))
 
         payload2 = {
             "current_path": [
@@ -1007,8 +981,6 @@ class TestE2EMefEline:
                                   headers={'Content-type': 'application/json'})
         assert response.status_code == 400, response.text
 
-        time.sleep(10)
-
         # It verifies EVC's current_path
         response = requests.get(api_url + evc1)
         data = response.json()
@@ -1,12 +1,10 @@
-import time
-
 import pytest
 import requests
 
-from tests.helpers import NetworkTest
+from tests.helpers import (KYTOS_API, KytosClient, evc_installed, kytos_client,
+                           shared_network, wait_until)
 
 CONTROLLER = '127.0.0.1'
-KYTOS_API = 'http://%s:8181/api/kytos' % CONTROLLER
 
 class TestE2EMefEline:
     net = None
@@ -22,15 +20,15 @@ class TestE2EMefEline:
         # which all elements are disabled in a clean setting
         self.net.start_controller(clean_config=True, enable_all=True)
         self.net.wait_switches_connect()
-        time.sleep(10)
+        self.net.wait_ready()
 
     @classmethod
     def setup_class(cls):
-        cls.net = NetworkTest(CONTROLLER, topo_name='amlight')
+        cls.net = shared_network(CONTROLLER, topo_name='amlight')
         cls.net.start()
         cls.net.restart_kytos_clean()
         cls.net.wait_switches_connect()
-        time.sleep(5)
+        cls.net.wait_ready()
 
     @classmethod
     def teardown_class(cls):
@@ -42,25 +40,12 @@ class TestE2EMefEline:
         self.net.start_controller(clean_config=_clean_config, enable_all=_enable_all)
         self.net.wait_switches_connect()
 
-        # Wait a few seconds to kytos execute LLDP
-        time.sleep(10)
+        # Wait for kytos to connect the switches and run LLDP
+        self.net.wait_ready(_enable_all)
 
     def create_evc(self, uni_a="00:00:00:00:00:00:00:01:1", uni_z="00:00:00:00:00:00:00:02:1", vlan_id=100):
-        payload = {
-            "name": "Vlan_%s" % vlan_id,
-            "enabled": True,
-            "dynamic_backup_path": True,
-            "uni_a": {
-                "interface_id": uni_a,
-                "tag": {"tag_type": 1, "value": vlan_id}
-            },
-            "uni_z": {
-                "interface_id": uni_z,
-                "tag": {"tag_type": 1, "value": vlan_id}
-            }
-        }
-        api_url = KYTOS_API + '/mef_eline/v2/evc/'
-        response = requests.post(api_url, json=payload)
+        payload = KytosClient.evc_payload(uni_a, uni_z, vlan_id)
+        response = kytos_client().create_evc(payload)
         data = response.json()
         return data['circuit_id']
 
@@ -76,7 +61,7 @@ class TestE2EMefEline:
                                uni_z='00:00:00:00:00:00:00:11:1',
                                vlan_id=100)
 
-        time.sleep(10)
+        wait_until(evc_installed(evc1, self.net.net))
 
         # It verifies EVC's data
         response = requests.get(api_url + evc1)
@@ -4,10 +4,10 @@ from datetime import datetime, timedelta
 
 import requests
 
-from tests.helpers import NetworkTest
+from tests.helpers import (KYTOS_API, flows_present, maintenance_status,
+                           shared_network, wait_until)
 
 CONTROLLER = '127.0.0.1'
-KYTOS_API = 'http://%s:8181/api/kytos' % CONTROLLER
 
 TIME_FMT = "%Y-%m-%dT%H:%M:%S+0000"
 
@@ -17,10 +17,10 @@ class TestE2EMaintenance:
 
     @classmethod
     def setup_class(cls):
-        cls.net = NetworkTest(CONTROLLER)
+        cls.net = shared_network(CONTROLLER)
         cls.net.start()
         cls.net.restart_kytos_clean()
-        time.sleep(10)
+        cls.net.wait_ready()
 
     @classmethod
     def teardown_class(cls):
@@ -60,9 +60,9 @@ class TestE2EMaintenance:
 
     def restart_and_create_circuit(self):
         self.net.restart_kytos_clean()
-        time.sleep(10)
+        self.net.wait_ready()
         self.create_circuit(100)
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=3, s2=3, s3=3)
 
     def test_005_list_mw_should_be_empty(self):
         """Tests if the maintenances list is empty at the beginning
@@ -107,9 +107,12 @@ class TestE2EMaintenance:
         assert response.status_code == 201, response.text
         data = response.json()
         assert 'mw_id' in data
+        mw_id = data['mw_id']
 
-        # Waits for the MW to start
-        time.sleep(mw_start_delay + 10)
+        # Waits for the MW to start and the EVC to move away from s2
+        wait_until(maintenance_status(mw_id, 'running'),
+                   timeout=mw_start_delay + 30)
+        self.net.wait_flow_counts(s1=3, s2=1, s3=3)
 
         # Switch 1 and 3 should have 3 flows; Switch 2 should have only 1 flow.
         s1, s2, s3 = self.net.net.get('s1', 's2', 's3')
@@ -139,7 +142,9 @@ class TestE2EMaintenance:
         assert ', 0% packet loss,' in result
 
         # Waits for the MW to finish and check if the path returns to the initial configuration
-        time.sleep(mw_duration)
+        wait_until(maintenance_status(mw_id, 'finished')
+                   & flows_present(s2, count=3),
+                   timeout=mw_duration + 30)
 
         flows_s2 = s2.dpctl('dump-flows')
         assert len(flows_s2.split('\r\n ')) == 3
@@ -157,7 +162,6 @@ class TestE2EMaintenance:
             /api/kytos/maintenance on POST
         """
         self.net.restart_kytos_clean()
-        time.sleep(5)
 
         # Sets up the maintenance window information
         mw_start_delay = 60
@@ -187,7 +191,6 @@ class TestE2EMaintenance:
             /api/kytos/maintenance on POST
         """
         self.net.restart_kytos_clean()
-        time.sleep(5)
 
         # Sets up the maintenance window information
         mw_start_delay = 60
@@ -215,7 +218,6 @@ class TestE2EMaintenance:
             /api/kytos/maintenance on POST
         """
         self.net.restart_kytos_clean()
-        time.sleep(5)
 
         # Sets up the maintenance window information
         mw_start_delay = 60
@@ -242,7 +244,6 @@ class TestE2EMaintenance:
             /api/kytos/maintenance on POST
         """
         self.net.restart_kytos_clean()
-        time.sleep(5)
 
         # Sets up a wrong maintenance window data
         payload = {}
@@ -320,10 +321,12 @@ class TestE2EMaintenance:
         assert json_data['end'] == new_time.strftime(TIME_FMT)
 
         # Waits for the MW to start
-        time.sleep(mw_start_delay + 5)
+        s2 = self.net.net.get('s2')
+        wait_until(maintenance_status(mw_id, 'running')
+                   & flows_present(s2, count=1),
+                   timeout=mw_start_delay + 30)
 
         # Verifies the flow behavior during the maintenance
-        s2 = self.net.net.get('s2')
         flows_s2 = s2.dpctl('dump-flows')
         assert 'dl_vlan=100' not in flows_s2
         assert len(flows_s2.split('\r\n ')) == 1
@@ -340,7 +343,9 @@ class TestE2EMaintenance:
         assert ', 0% packet loss,' in result
 
         # Waits for the MW to finish and check if the path returns to the initial configuration
-        time.sleep(mw_duration + mw_new_end_time + 5)
+        wait_until(maintenance_status(mw_id, 'finished')
+                   & flows_present(s2, count=3),
+                   timeout=mw_duration + mw_new_end_time + 30)
 
         # Verifies the flows behavior after the maintenance
         flows_s2 = s2.dpctl('dump-flows')
@@ -358,7 +363,6 @@ class TestE2EMaintenance:
             /api/kytos/maintenance/{mw_id} on PATCH
         """
         self.net.restart_kytos_clean()
-        time.sleep(5)
 
         mw_id = "c16f5bbc4d004f018a76b22f677f8c2a"
 
@@ -489,7 +493,6 @@ class TestE2EMaintenance:
             /api/kytos/maintenance/{mw_id} on PATCH
         """
         self.net.restart_kytos_clean()
-        time.sleep(5)
 
         # Sets up the maintenance window information
         mw_start_delay = 60
@@ -535,7 +538,6 @@ class TestE2EMaintenance:
             /api/kytos/maintenance/{mw_id} on PATCH
         """
         self.net.restart_kytos_clean()
-        time.sleep(5)
 
         # Sets up maintenance window information
         mw_start_delay = 60
@@ -583,7 +585,8 @@ class TestE2EMaintenance:
         }
 
         # Waits for the MW to start
-        time.sleep(mw_start_delay + 5)
+        wait_until(maintenance_status(mw_id, 'running'),
+                   timeout=mw_start_delay + 30)
 
         # Updates a running maintenance
         mw_api_url = KYTOS_API + '/maintenance/' + mw_id
@@ -676,7 +679,9 @@ class TestE2EMaintenance:
         assert ', 0% packet loss,' in result
 
         # Waits for the time in which MW will be running
-        time.sleep(mw_start_delay + 5)
+        wait_until(maintenance_status(mw_id, 'running')
+                   & flows_present(s2, count=1),
+                   timeout=mw_start_delay + 30)
 
         # Verifies the flow during maintenance time
         flows_s2 = s2.dpctl('dump-flows')
@@ -686,7 +691,9 @@ class TestE2EMaintenance:
         assert ', 0% packet loss,' in result
 
         # Waits for the MW to finish and check if the path returns to the initial configuration
-        time.sleep(mw_duration)
+        wait_until(maintenance_status(mw_id, 'finished')
+                   & flows_present(s2, count=3),
+                   timeout=mw_duration + 30)
 
         # Verifies the flow behavior after the maintenance window
         flows_s2 = s2.dpctl('dump-flows')
@@ -732,7 +739,8 @@ class TestE2EMaintenance:
         mw_id = json_data["mw_id"]
 
         # Waits for the MW to start
-        time.sleep(mw_start_delay + 5)
+        wait_until(maintenance_status(mw_id, 'running'),
+                   timeout=mw_start_delay + 30)
 
         # Deletes running maintenance by its id
         api_url = KYTOS_API + '/maintenance/' + mw_id
@@ -808,7 +816,6 @@ class TestE2EMaintenance:
             /api/kytos/maintenance/{mw_id} on DELETE
         """
         self.net.restart_kytos_clean()
-        time.sleep(5)
 
         mw_id = "c16f5bbc4d004f018a76b22f677f8c2a"
 
@@ -852,10 +859,12 @@ class TestE2EMaintenance:
         assert json_data['id'] == mw_id
 
         # Waits for the MW to start
-        time.sleep(mw_start_delay + 5)
+        s2 = self.net.net.get('s2')
+        wait_until(maintenance_status(mw_id, 'running')
+                   & flows_present(s2, count=1),
+                   timeout=mw_start_delay + 30)
 
         # Verifies the flow behavior during the maintenance
-        s2 = self.net.net.get('s2')
         flows_s2 = s2.dpctl('dump-flows')
         assert 'dl_vlan=100' not in flows_s2
         assert len(flows_s2.split('\r\n ')) == 1
@@ -876,8 +885,10 @@ class TestE2EMaintenance:
         end_response = requests.patch(api_url)
         assert end_response.status_code == 200
 
-        # Waits just a couple of seconds to give kytos enough time to restore the flows
-        time.sleep(3)
+        # Waits for kytos to restore the flows
+        wait_until(maintenance_status(mw_id, 'finished')
+                   & flows_present(s2, count=3),
+                   timeout=30)
 
         # Verifies the flow behavior and connectivity after ending the maintenance
         flows_s2 = s2.dpctl('dump-flows')
@@ -895,7 +906,6 @@ class TestE2EMaintenance:
             /api/kytos/maintenance/{mw_id}/end on PATCH
         """
         self.net.restart_kytos_clean()
-        time.sleep(5)
 
         mw_id = "c16f5bbc4d004f018a76b22f677f8c2a"
 
@@ -981,10 +991,12 @@ class TestE2EMaintenance:
         assert json_data['id'] == mw_id
 
         # Waits for the MW to start
-        time.sleep(mw_start_delay + 5)
+        s2 = self.net.net.get('s2')
+        wait_until(maintenance_status(mw_id, 'running')
+                   & flows_present(s2, count=1),
+                   timeout=mw_start_delay + 30)
 
         # Verifies the flow behavior during the maintenance
-        s2 = self.net.net.get('s2')
         flows_s2 = s2.dpctl('dump-flows')
         assert 'dl_vlan=100' not in flows_s2
         assert len(flows_s2.split('\r\n ')) == 1
@@ -1028,7 +1040,9 @@ class TestE2EMaintenance:
         assert ', 0% packet loss,' in result
 
         # Waits for the MW to finish and check if the path returns to the initial configuration
-        time.sleep(mw_extension*60)
+        wait_until(maintenance_status(mw_id, 'finished')
+                   & flows_present(s2, count=3),
+                   timeout=mw_extension * 60 + 30)
 
         # Verifies the flows behavior after the maintenance
         flows_s2 = s2.dpctl('dump-flows')
@@ -1117,7 +1131,8 @@ class TestE2EMaintenance:
         mw_id = data["mw_id"]
 
         # Waits for the MW to start
-        time.sleep(mw_start_delay + 5)
+        wait_until(maintenance_status(mw_id, 'running'),
+                   timeout=mw_start_delay + 30)
 
         payload2 = {'second': mw_extension}
 
@@ -1155,7 +1170,8 @@ class TestE2EMaintenance:
         mw_id = data["mw_id"]
 
         # Waits for the MW to start
-        time.sleep(mw_start_delay + mw_duration + 5)
+        wait_until(maintenance_status(mw_id, 'finished'),
+                   timeout=mw_start_delay + mw_duration + 30)
 
         payload2 = {'minutes': mw_extension}
 
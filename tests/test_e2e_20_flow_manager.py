@@ -1,12 +1,10 @@
 import json
-import time
 
 import requests
 
-from tests.helpers import NetworkTest
+from tests.helpers import KYTOS_API, flows_present, shared_network, wait_until
 
 CONTROLLER = '127.0.0.1'
-KYTOS_API = 'http://%s:8181/api/kytos' % CONTROLLER
 
 
 class TestE2EFlowManager:
@@ -20,14 +18,13 @@ class TestE2EFlowManager:
         # which all elements are disabled in a clean setting
         self.net.start_controller(clean_config=True, enable_all=True)
         self.net.wait_switches_connect()
-        time.sleep(10)
+        self.net.wait_ready()
 
     @classmethod
     def setup_class(cls):
-        cls.net = NetworkTest(CONTROLLER)
+        cls.net = shared_network(CONTROLLER)
         cls.net.start()
         cls.net.wait_switches_connect()
-        time.sleep(10)
 
     @classmethod
     def teardown_class(cls):
@@ -64,13 +61,13 @@ class TestE2EFlowManager:
         assert 'FlowMod Messages Sent' in data['response']
 
         # wait for the flow to be installed
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=2)
 
         # restart controller keeping configuration
         self.net.start_controller(enable_all=True, del_flows=True)
         self.net.wait_switches_connect()
 
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=2)
 
         s1 = self.net.net.get('s1')
         flows_s1 = s1.dpctl('dump-flows')
@@ -108,13 +105,13 @@ class TestE2EFlowManager:
                       headers={'Content-type': 'application/json'})
 
         # wait for the flow to be installed
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=2)
 
         # restart controller keeping configuration
         self.net.start_controller(enable_all=True, del_flows=True)
         self.net.wait_switches_connect()
 
-        time.sleep(10)
+        wait_until(lambda: len(requests.get(api_url).json()[switch_id]['flows']) == 2)
 
         response = requests.get(api_url)
         assert response.status_code == 200, response.text
@@ -158,13 +155,13 @@ class TestE2EFlowManager:
         assert 'FlowMod Messages Sent' in data['response']
 
         # wait for the flow to be installed
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=2, s2=2, s3=2)
 
         # restart controller keeping configuration
         self.net.start_controller(enable_all=True, del_flows=True)
         self.net.wait_switches_connect()
 
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=2, s2=2, s3=2)
 
         for sw_name in ['s1', 's2', 's3']:
             sw = self.net.net.get(sw_name)
@@ -200,7 +197,7 @@ class TestE2EFlowManager:
                       headers={'Content-type': 'application/json'})
 
         # wait for the flow to be installed
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=2)
 
         # delete the flow
         api_url = KYTOS_API + '/flow_manager/v2/flows/00:00:00:00:00:00:00:01'
@@ -211,13 +208,13 @@ class TestE2EFlowManager:
         assert 'FlowMod Messages Sent' in data['response']
 
         # wait for the flow to be deleted
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=1)
 
         # restart controller keeping configuration
         self.net.start_controller(enable_all=True, del_flows=True)
         self.net.wait_switches_connect()
 
-        time.sleep(10)
+        self.net.wait_ready()
 
         s1 = self.net.net.get('s1')
         flows_s1 = s1.dpctl('dump-flows')
@@ -252,7 +249,7 @@ class TestE2EFlowManager:
                       headers={'Content-type': 'application/json'})
 
         # wait for the flow to be installed
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=2, s2=2, s3=2)
 
         # delete the flow
         api_url = KYTOS_API + '/flow_manager/v2/flows'
@@ -263,13 +260,13 @@ class TestE2EFlowManager:
         assert 'FlowMod Messages Sent' in data['response']
 
         # wait for the flow to be deleted
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=1, s2=1, s3=1)
 
         # restart controller keeping configuration
         self.net.start_controller(enable_all=True, del_flows=True)
         self.net.wait_switches_connect()
 
-        time.sleep(10)
+        self.net.wait_ready()
 
         for sw_name in ['s1', 's2', 's3']:
             sw = self.net.net.get(sw_name)
@@ -305,7 +302,7 @@ class TestE2EFlowManager:
                       headers={'Content-type': 'application/json'})
 
         # wait for the flow to be installed
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=2)
 
         s1 = self.net.net.get('s1')
         s1.dpctl('del-flows', 'in_port=1')
@@ -316,7 +313,7 @@ class TestE2EFlowManager:
             self.net.start_controller(enable_all=True)
             self.net.wait_switches_connect()
 
-        time.sleep(10)
+        wait_until(flows_present(s1, count=2, contains=['in_port="s1-eth1']))
 
         s1 = self.net.net.get('s1')
         flows_s1 = s1.dpctl('dump-flows')
@@ -355,7 +352,7 @@ class TestE2EFlowManager:
                       headers={'Content-type': 'application/json'})
 
         # wait for the flow to be installed
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=2)
 
         # Verify the flow
         s1 = self.net.net.get('s1')
@@ -374,7 +371,7 @@ class TestE2EFlowManager:
             self.net.start_controller(enable_all=True)
             self.net.wait_switches_connect()
 
-        time.sleep(10)
+        wait_until(lambda: 'actions=output:"s1-eth3"' not in s1.dpctl('dump-flows'))
 
         # Check that the flow keeps the original setting
         s1 = self.net.net.get('s1')
@@ -412,7 +409,7 @@ class TestE2EFlowManager:
                       headers={'Content-type': 'application/json'})
 
         # wait for the flow to be installed
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=2)
 
         # Verify the flow
         s1 = self.net.net.get('s1')
@@ -427,7 +424,7 @@ class TestE2EFlowManager:
             self.net.start_controller(enable_all=True)
             self.net.wait_switches_connect()
 
-        time.sleep(10)
+        wait_until(lambda: 'actions=strip_vlan,' not in s1.dpctl('dump-flows'))
 
         flows_s1 = s1.dpctl('dump-flows')
         assert len(flows_s1.split('\r\n ')) == 2
@@ -451,7 +448,7 @@ class TestE2EFlowManager:
             self.net.start_controller(enable_all=True)
             self.net.wait_switches_connect()
 
-        time.sleep(10)
+        wait_until(flows_present(s1, count=1))
 
         s1 = self.net.net.get('s1')
         flows_s1 = s1.dpctl('dump-flows')
@@ -475,7 +472,7 @@ class TestE2EFlowManager:
             self.net.start_controller(enable_all=True)
             self.net.wait_switches_connect()
 
-        time.sleep(10)
+        wait_until(flows_present(s1, count=1))
 
         s1 = self.net.net.get('s1')
         flows_s1 = s1.dpctl('dump-flows')
@@ -4,10 +4,13 @@ import time
 
 import requests
 
-from tests.helpers import NetworkTest
+from tests.flows import FlowMonitor
+from tests.helpers import KYTOS_API, flows_present, shared_network, wait_until
 
 CONTROLLER = '127.0.0.1'
-KYTOS_API = 'http://%s:8181/api/kytos' % CONTROLLER
+
+# at least one flow_manager consistency check runs within this window
+CONSISTENCY_WAIT = 20
 
 
 class TestE2EFlowManager:
@@ -21,14 +24,13 @@ class TestE2EFlowManager:
         # which all elements are disabled in a clean setting
         self.net.start_controller(clean_config=True, enable_all=True)
         self.net.wait_switches_connect()
-        time.sleep(10)
+        self.net.wait_ready()
 
     @classmethod
     def setup_class(cls):
-        cls.net = NetworkTest(CONTROLLER)
+        cls.net = shared_network(CONTROLLER)
         cls.net.start()
         cls.net.wait_switches_connect()
-        time.sleep(10)
 
     @classmethod
     def teardown_class(cls):
@@ -64,28 +66,34 @@ class TestE2EFlowManager:
         assert 'FlowMod Messages Sent' in data['response']
 
         # wait for the flow to be installed
-        wait_time = 20
-        time.sleep(wait_time)
-
-        # restart controller keeping configuration
-        t1 = time.time()
-        self.net.start_controller()
-        self.net.wait_switches_connect()
-        delta = time.time() - t1
-
-        # wait for the flow to be installed
-        time.sleep(wait_time)
-        wait_time += wait_time
+        self.net.wait_flow_counts(s1=2)
+        installed_at = time.time()
 
         s1 = self.net.net.get('s1')
+        with FlowMonitor([s1]) as monitor:
+            # restart controller keeping configuration
+            restarted_at = time.time()
+            self.net.start_controller()
+            self.net.wait_switches_connect()
+            self.net.wait_ready()
+            # give the consistency check the chance to (wrongly) reinstall
+            # the flow: nothing changes on the switch, so nothing to wait for
+            time.sleep(CONSISTENCY_WAIT)
+            rewritten = [e for e in monitor.select(
+                             's1', since=restarted_at,
+                             match={"in_port": 1, "dl_vlan": 999})
+                         if e.event in ('ADDED', 'MODIFIED')]
+        assert not rewritten, rewritten
+
         flows_s1 = s1.dpctl('dump-flows')
+        elapsed = time.time() - installed_at
         assert len(flows_s1.split('\r\n ')) == 2
         for flow in flows_s1.split('\r\n '):
             # Check all flows but the of_lldp, which is reinstalled
             if 'dl_vlan=3799,dl_type=0x88cc' in flow: continue
             match = re.search("duration=([0-9.]+)", flow)
             duration = float(match.group(1))
-            assert duration + 1 >= wait_time + delta
+            assert duration + 1 >= elapsed
 
     def test_031_on_switch_restart_kytos_should_recreate_flows(self):
         """Test if, after kytos restart, the flows are preserved on the switch 
@@ -109,24 +117,26 @@ class TestE2EFlowManager:
             ]
         }
 
-        api_url = KYTOS_API + '/flow_manager/v2/flows/00:00:00:00:00:00:00:01'
-        response = requests.post(api_url, data=json.dumps(payload),
-                                 headers={'Content-type': 'application/json'})
-        assert response.status_code == 202, response.text
-        data = response.json()
-        assert 'FlowMod Messages Sent' in data['response']
-
-        # wait for the flow to be installed
-        time.sleep(10)
-
-        # OVS does not have a way to actually restart the switch
-        # so to simulate that, we just delete all flows
         s1 = self.net.net.get('s1')
-        s1.dpctl('del-flows')
-
-        # wait for the flow to be installed
-        time.sleep(10)
-
-        flows_s1 = s1.dpctl('dump-flows')
-        assert len(flows_s1.split('\r\n ')) == 2
-        assert 'dl_vlan=999' in flows_s1
+        match = payload["flows"][0]["match"]
+        with FlowMonitor([s1]) as monitor:
+            api_url = KYTOS_API + '/flow_manager/v2/flows/00:00:00:00:00:00:00:01'
+            response = requests.post(api_url, data=json.dumps(payload),
+                                     headers={'Content-type': 'application/json'})
+            assert response.status_code == 202, response.text
+            data = response.json()
+            assert 'FlowMod Messages Sent' in data['response']
+
+            # wait for the flow to be installed
+            monitor.wait_added('s1', [match])
+
+            # OVS does not have a way to actually restart the switch
+            # so to simulate that, we just delete all flows
+            deleted_at = time.time()
+            s1.dpctl('del-flows')
+
+            # wait for the flow to be installed
+            monitor.wait_added('s1', [match], since=deleted_at)
+
+        wait_until(flows_present(s1, count=2, contains=['dl_vlan=999']),
+                   timeout=10)
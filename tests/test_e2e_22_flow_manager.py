@@ -1,11 +1,9 @@
 import json
 import pytest
 import requests
-from tests.helpers import NetworkTest
-import time
+from tests.helpers import KYTOS_API, shared_network
 
 CONTROLLER = '127.0.0.1'
-KYTOS_API = 'http://%s:8181/api/kytos' % CONTROLLER
 
 
 class TestE2EFlowManager:
@@ -19,14 +17,13 @@ class TestE2EFlowManager:
         # which all elements are disabled in a clean setting
         self.net.start_controller(clean_config=True, enable_all=True)
         self.net.wait_switches_connect()
-        time.sleep(10)
+        self.net.wait_ready()
 
     @classmethod
     def setup_class(cls):
-        cls.net = NetworkTest(CONTROLLER)
+        cls.net = shared_network(CONTROLLER)
         cls.net.start()
         cls.net.wait_switches_connect()
-        time.sleep(10)
 
     @classmethod
     def teardown_class(cls):
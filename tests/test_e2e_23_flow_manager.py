@@ -4,11 +4,11 @@ import time
 import pytest
 import requests
 
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from tests.helpers import NetworkTest
+from tests import async_client
+from tests.flows import FlowMonitor, parse_flows
+from tests.helpers import KYTOS_API, flows_present, shared_network, wait_until
 
 CONTROLLER = '127.0.0.1'
-KYTOS_API = 'http://%s:8181/api/kytos' % CONTROLLER
 
 
 class TestE2EFlowManager:
@@ -20,16 +20,14 @@ class TestE2EFlowManager:
         """
         # Start the controller setting an environment in
         # which all elements are disabled in a clean setting
-        self.net.start_controller(clean_config=True, enable_all=True)
-        self.net.wait_switches_connect()
-        time.sleep(10)
+        self.net.reset_controller(enable_all=True)
+        self.net.wait_topology_ready()
 
     @classmethod
     def setup_class(cls):
-        cls.net = NetworkTest(CONTROLLER)
+        cls.net = shared_network(CONTROLLER)
         cls.net.start()
         cls.net.wait_switches_connect()
-        time.sleep(10)
 
     @classmethod
     def teardown_class(cls):
@@ -100,13 +98,13 @@ class TestE2EFlowManager:
         assert 'FlowMod Messages Sent' in data['response']
 
         # wait for the flow to be installed
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=4)
 
         s1 = self.net.net.get('s1')
-        flows_s1 = s1.dpctl('dump-flows')
+        flows_s1 = parse_flows(s1.dpctl('dump-flows'))
 
-        assert len(flows_s1.split('\r\n ')) == 4
-        assert 'actions=output:"s1-eth2"' in flows_s1
+        assert len(flows_s1) == 4
+        assert flows_s1.find({"in_port": 1, "dl_vlan": 100}, actions=['output:2'])
 
         payload2 = {
             "flows": [
@@ -124,16 +122,17 @@ class TestE2EFlowManager:
         requests.post(api_url, data=json.dumps(payload2), headers={'Content-type': 'application/json'})
 
         # wait for the flow to be installed
-        time.sleep(10)
+        wait_until(flows_present(s1, count=4, matches=[{"in_port": 2, "dl_vlan": 200},
+                                                       {"in_port": 3, "dl_vlan": 300}]))
 
-        flows_s1 = s1.dpctl('dump-flows')
-        assert len(flows_s1.split('\r\n ')) == 4
+        flows_s1 = parse_flows(s1.dpctl('dump-flows'))
+        assert len(flows_s1) == 4
 
-        assert 'actions=output:"s1-eth3"' in flows_s1
-        assert 'actions=output:"s1-eth4"' in flows_s1
-        assert 'actions=output:"s1-eth2"' not in flows_s1
+        assert flows_s1.find({"in_port": 2, "dl_vlan": 200}, actions=['output:3'])
+        assert flows_s1.find({"in_port": 3, "dl_vlan": 300}, actions=['output:4'])
+        assert not flows_s1.find(actions=['output:2'])
 
-        assert 'actions=drop' in flows_s1
+        assert flows_s1.find({"in_port": 1, "dl_vlan": 100}, actions=['drop'])
 
     def test_010_install_flow(self):
         """Tests the inclusion of multiple flows with
@@ -192,7 +191,7 @@ class TestE2EFlowManager:
         assert 'FlowMod Messages Sent' in data['response']
 
         # wait for the flow to be installed
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=4)
 
         s1 = self.net.net.get('s1')
         flows_s1 = s1.dpctl('dump-flows')
@@ -215,7 +214,7 @@ class TestE2EFlowManager:
         requests.post(api_url, data=json.dumps(payload2), headers={'Content-type': 'application/json'})
 
         # wait for the flow to be installed
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=5)
 
         flows_s1 = s1.dpctl('dump-flows')
         assert len(flows_s1.split('\r\n ')) == 5
@@ -284,7 +283,7 @@ class TestE2EFlowManager:
         assert 'FlowMod Messages Sent' in data['response']
 
         # wait for the flow to be installed
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=4)
 
         s1 = self.net.net.get('s1')
         flows_s1 = s1.dpctl('dump-flows')
@@ -310,7 +309,7 @@ class TestE2EFlowManager:
         requests.post(api_url, data=json.dumps(payload2), headers={'Content-type': 'application/json'})
 
         # wait for the flow to be installed
-        time.sleep(10)
+        self.net.wait_flow_counts(s1=5)
 
         flows_s1 = s1.dpctl('dump-flows')
         assert len(flows_s1.split('\r\n ')) == 5
@@ -363,7 +362,7 @@ class TestE2EFlowManager:
                       headers={'Content-type': 'application/json'})
 
         # wait for the flow to be installed
-        time.sleep(15)
+        self.net.wait_flow_counts(s1=3)
 
         s1 = self.net.net.get('s1')
         flows_s1 = s1.dpctl('dump-flows')
@@ -412,7 +411,7 @@ class TestE2EFlowManager:
         requests.post(api_url, data=json.dumps(payload2), headers={'Content-type': 'application/json'})
 
         # wait for the flow to be installed
-        time.sleep(15)
+        self.net.wait_flow_counts(s1=5)
 
         flows_s1 = s1.dpctl('dump-flows')
 
@@ -467,7 +466,7 @@ class TestE2EFlowManager:
                       headers={'Content-type': 'application/json'})
 
         # wait for the flow to be installed
-        time.sleep(15)
+        self.net.wait_flow_counts(s1=3)
 
         s1 = self.net.net.get('s1')
         flows_s1 = s1.dpctl('dump-flows')
@@ -504,7 +503,7 @@ class TestE2EFlowManager:
                       headers={'Content-type': 'application/json'})
 
         # wait for the flow to be installed
-        time.sleep(15)
+        self.net.wait_flow_counts(s1=4)
 
         flows_s1 = s1.dpctl('dump-flows')
 
@@ -537,7 +536,7 @@ class TestE2EFlowManager:
         requests.post(api_url, data=json.dumps(payload3), headers={'Content-type': 'application/json'})
 
         # wait for the flow to be installed
-        time.sleep(15)
+        self.net.wait_flow_counts(s1=5)
 
         flows_s1 = s1.dpctl('dump-flows')
 
@@ -614,7 +613,7 @@ class TestE2EFlowManager:
                       headers={'Content-type': 'application/json'})
 
         # wait for the flow to be installed
-        time.sleep(15)
+        self.net.wait_flow_counts(s1=2)
 
         s1 = self.net.net.get('s1')
         flows_s1 = s1.dpctl('dump-flows')
@@ -651,7 +650,7 @@ class TestE2EFlowManager:
                       headers={'Content-type': 'application/json'})
 
         # wait for the flow to be installed
-        time.sleep(15)
+        self.net.wait_flow_counts(s1=2)
 
         s1 = self.net.net.get('s1')
         flows_s1 = s1.dpctl('dump-flows')
@@ -663,8 +662,8 @@ class TestE2EFlowManager:
         requests.post(api_url, data=json.dumps(payload),
                       headers={'Content-type': 'application/json'})
 
-        # wait for the flow to be installed
-        time.sleep(15)
+        # the duplicate must not add a flow, so there is no change to wait for
+        time.sleep(5)
 
         flows_s1 = s1.dpctl('dump-flows')
 
@@ -675,8 +674,8 @@ class TestE2EFlowManager:
         requests.post(api_url, data=json.dumps(payload),
                       headers={'Content-type': 'application/json'})
 
-        # wait for the flow to be installed
-        time.sleep(15)
+        # the duplicate must not add a flow, so there is no change to wait for
+        time.sleep(5)
 
         flows_s1 = s1.dpctl('dump-flows')
 
@@ -755,7 +754,7 @@ class TestE2EFlowManager:
                       headers={'Content-type': 'application/json'})
 
         # wait for the flow to be installed
-        time.sleep(15)
+        self.net.wait_flow_counts(s1=2)
 
         s1 = self.net.net.get('s1')
         flows_s1 = s1.dpctl('dump-flows')
@@ -793,7 +792,7 @@ class TestE2EFlowManager:
                       headers={'Content-type': 'application/json'})
 
         # wait for the flow to be installed
-        time.sleep(15)
+        self.net.wait_flow_counts(s1=2)
 
         s1 = self.net.net.get('s1')
         flows_s1 = s1.dpctl('dump-flows')
@@ -805,8 +804,8 @@ class TestE2EFlowManager:
         requests.post(api_url, data=json.dumps(payload),
                       headers={'Content-type': 'application/json'})
 
-        # wait for the flow to be installed
-        time.sleep(15)
+        # the duplicate must not add a flow, so there is no change to wait for
+        time.sleep(5)
 
         flows_s1 = s1.dpctl('dump-flows')
 
@@ -817,8 +816,8 @@ class TestE2EFlowManager:
         requests.post(api_url, data=json.dumps(payload),
                       headers={'Content-type': 'application/json'})
 
-        # wait for the flow to be installed
-        time.sleep(15)
+        # the duplicate must not add a flow, so there is no change to wait for
+        time.sleep(5)
 
         flows_s1 = s1.dpctl('dump-flows')
 
@@ -869,7 +868,7 @@ class TestE2EFlowManager:
                       headers={'Content-type': 'application/json'})
 
         # wait for the flow to be installed
-        time.sleep(15)
+        self.net.wait_flow_counts(s1=3)
 
         s1 = self.net.net.get('s1')
         flows_s1 = s1.dpctl('dump-flows')
@@ -907,7 +906,7 @@ class TestE2EFlowManager:
                       headers={'Content-type': 'application/json'})
 
         # wait for the flow to be installed
-        time.sleep(15)
+        self.net.wait_flow_counts(s1=2)
 
         s1 = self.net.net.get('s1')
         flows_s1 = s1.dpctl('dump-flows')
@@ -939,7 +938,7 @@ class TestE2EFlowManager:
                       headers={'Content-type': 'application/json'})
 
         # wait for the flow to be installed
-        time.sleep(15)
+        self.net.wait_flow_counts(s1=3)
 
         flows_s1 = s1.dpctl('dump-flows')
 
@@ -991,7 +990,7 @@ class TestE2EFlowManager:
                       headers={'Content-type': 'application/json'})
 
         # wait for the flow to be installed
-        time.sleep(15)
+        self.net.wait_flow_counts(s1=3)
 
         s1 = self.net.net.get('s1')
         flows_s1 = s1.dpctl('dump-flows')
@@ -1013,7 +1012,7 @@ class TestE2EFlowManager:
                       headers={'Content-type': 'application/json'})
 
         # wait for the flow to be installed
-        time.sleep(15)
+        self.net.wait_flow_counts(s1=4)
 
         flows_s1 = s1.dpctl('dump-flows')
 
@@ -1025,45 +1024,41 @@ class TestE2EFlowManager:
         Tests the performance and race condition
         with the creation of multiple flows
         """
-        api_url = KYTOS_API + '/flow_manager/v2/flows/00:00:00:00:00:00:00:01'
-
-        def flow_request(dl_vlan):
-            payload = {
-              "flows": [{
+        flows = [
+            ('00:00:00:00:00:00:00:01', [{
                 "priority": 100,
                 "cookie": 84114904,
                 "match": {
                   "in_port": 1,
-                  "dl_vlan": int(dl_vlan),
+                  "dl_vlan": dl_vlan,
                 },
                 "actions": [{
                   "action_type": "output",
                   "port": 2
                 }]
-              }]
-            }
-            return requests.post(api_url, data=json.dumps(payload),
-                                 headers={'Content-type': 'application/json'})
-
-        with ThreadPoolExecutor(max_workers=100) as executor:
-            futures = [
-                executor.submit(flow_request, dl_vlan) for dl_vlan in range(100, 200)
-            ]
-            for future in as_completed(futures):
-                response = future.result()
-                assert response.status_code == 202, response.text
-
-        # wait for the flow to be installed
-        time.sleep(10)
+            }])
+            for dl_vlan in range(100, 200)
+        ]
 
         s1 = self.net.net.get('s1')
-        flows_s1 = s1.dpctl('dump-flows')
+        with FlowMonitor([s1]) as monitor:
+            results = async_client.run(lambda c: c.install_flows(flows),
+                                       concurrency=100)
+            for result in results:
+                assert result.status == 202, result
 
-        assert len(flows_s1.split('\r\n ')) == 101
+            # wait for the flow to be installed
+            monitor.wait_added('s1', [{"in_port": 1, "dl_vlan": dl_vlan}
+                                      for dl_vlan in range(100, 200)])
+        wait_until(flows_present(s1, count=101), timeout=10)
 
-    def create_flow(self, vlan_id):
-        payload = {
-            "flows": [{
+    def test_070_install_flow(self):
+        """
+        Tests the performance and race condition with
+        the creation of multiple concurrent single-flow requests
+        """
+        flows = [
+            ('00:00:00:00:00:00:00:01', [{
                 "priority": 10,
                 "match": {
                     "in_port": 1,
@@ -1073,34 +1068,15 @@ class TestE2EFlowManager:
                     "action_type": "output",
                     "port": 2
                 }]
-            }]
-        }
-        api_url = KYTOS_API + '/flow_manager/v2/flows/00:00:00:00:00:00:00:01'
-        response = requests.post(api_url, data=json.dumps(payload),
-                                 headers = {'Content-type': 'application/json'})
-
-        assert response.status_code == 202, response.text
-        data = response.json()
-        assert 'FlowMod Messages Sent' in data['response']
-
-    def test_070_install_flow(self):
-        """
-        Tests the performance and race condition with
-        the creation of multiple flows using threading
-        """
-        import threading
-        threads = list()
-        for vlan_id in range(100, 200):
-            t = threading.Thread(target=self.create_flow, args=(vlan_id,))
-            threads.append(t)
-        for thread in threads:
-            thread.start()
-        for thread in threads:
-            thread.join()
+            }])
+            for vlan_id in range(100, 200)
+        ]
+        results = async_client.run(lambda c: c.install_flows(flows),
+                                   concurrency=100)
+        for result in results:
+            assert result.status == 202, result
+            assert 'FlowMod Messages Sent' in result.data['response']
 
         # wait for the flow to be installed
-        time.sleep(10)
-
         s1 = self.net.net.get('s1')
-        flows_s1 = s1.dpctl('dump-flows')
-        assert len(flows_s1.split('\r\n ')) == 101
+        wait_until(flows_present(s1, count=101), timeout=30)
@@ -1,9 +1,9 @@
 import requests
-from tests.helpers import NetworkTest
+from tests import async_client
+from tests.helpers import KYTOS_API, shared_network, wait_until
 import time
 
 CONTROLLER = '127.0.0.1'
-KYTOS_API = 'http://%s:8181/api/kytos' % CONTROLLER
 
 
 class TestE2EOfLLDP:
@@ -11,11 +11,11 @@ class TestE2EOfLLDP:
 
     @classmethod
     def setup_class(cls):
-        cls.net = NetworkTest(CONTROLLER)
+        cls.net = shared_network(CONTROLLER)
         cls.net.start()
         cls.net.restart_kytos_clean()
         cls.net.wait_switches_connect()
-        time.sleep(10)
+        cls.net.wait_ready()
 
     @classmethod
     def teardown_class(cls):
@@ -26,12 +26,7 @@ class TestE2EOfLLDP:
         return int(rx_pkts.strip())
 
     def enable_all_interfaces(self):
-        api_url = KYTOS_API + '/topology/v3/switches/'
-        response = requests.get(api_url)
-        data = response.json()
-        switches = data.get("switches", {})
-        for sw in switches.keys():
-            response = requests.post(KYTOS_API + '/topology/v3/interfaces/switch/%s/enable' % sw)
+        async_client.run(lambda client: client.enable_all_interfaces())
 
     @staticmethod
     def disable_all_of_lldp():
@@ -71,7 +66,10 @@ class TestE2EOfLLDP:
         rx_stats_h12 = self.get_iface_stats_rx_pkt(h12)
         rx_stats_h2 = self.get_iface_stats_rx_pkt(h2)
         rx_stats_h3 = self.get_iface_stats_rx_pkt(h3)
-        time.sleep(10)
+        wait_until(lambda: self.get_iface_stats_rx_pkt(h11) > rx_stats_h11
+                   and self.get_iface_stats_rx_pkt(h12) > rx_stats_h12
+                   and self.get_iface_stats_rx_pkt(h2) > rx_stats_h2
+                   and self.get_iface_stats_rx_pkt(h3) > rx_stats_h3)
         rx_stats_h11_2 = self.get_iface_stats_rx_pkt(h11)
         rx_stats_h12_2 = self.get_iface_stats_rx_pkt(h12)
         rx_stats_h2_2 = self.get_iface_stats_rx_pkt(h2)
@@ -86,7 +84,6 @@ class TestE2EOfLLDP:
         """ Test if the disabling OF LLDP in an interface worked properly. """
         self.net.start_controller(clean_config=True, enable_all=False)
         self.net.wait_switches_connect()
-        time.sleep(5)
         self.enable_all_interfaces()
 
         # disabling all the UNI interfaces
@@ -117,6 +114,7 @@ class TestE2EOfLLDP:
         rx_stats_h12 = self.get_iface_stats_rx_pkt(h12)
         rx_stats_h2 = self.get_iface_stats_rx_pkt(h2)
         rx_stats_h3 = self.get_iface_stats_rx_pkt(h3)
+        # nothing must arrive over a few LLDP polling intervals
         time.sleep(10)
         rx_stats_h11_2 = self.get_iface_stats_rx_pkt(h11)
         rx_stats_h12_2 = self.get_iface_stats_rx_pkt(h12)
@@ -131,7 +129,8 @@ class TestE2EOfLLDP:
         # restart kytos and check if lldp remains disabled
         self.net.start_controller(clean_config=False, enable_all=False)
         self.net.wait_switches_connect()
-        time.sleep(10)
+        wait_until(lambda: set(requests.get(KYTOS_API + '/of_lldp/v1/interfaces/').json()['interfaces'])
+                   == set(expected_interfaces))
 
         api_url = KYTOS_API + '/of_lldp/v1/interfaces/'
         response = requests.get(api_url)
@@ -142,7 +141,6 @@ class TestE2EOfLLDP:
         """ Test if enabling OF LLDP in an interface works properly. """
         self.net.start_controller(clean_config=True, enable_all=False)
         self.net.wait_switches_connect()
-        time.sleep(5)
         self.enable_all_interfaces()
         TestE2EOfLLDP.disable_all_of_lldp()
 
@@ -166,7 +164,7 @@ class TestE2EOfLLDP:
 
         h11 = self.net.net.get('h11')
         rx_stats_h11 = self.get_iface_stats_rx_pkt(h11)
-        time.sleep(10)
+        wait_until(lambda: self.get_iface_stats_rx_pkt(h11) > rx_stats_h11)
         rx_stats_h11_2 = self.get_iface_stats_rx_pkt(h11)
 
         assert rx_stats_h11_2 > rx_stats_h11
@@ -174,7 +172,8 @@ class TestE2EOfLLDP:
         # restart kytos and check if lldp remains disabled
         self.net.start_controller(clean_config=False, enable_all=False)
         self.net.wait_switches_connect()
-        time.sleep(10)
+        wait_until(lambda: set(requests.get(KYTOS_API + '/of_lldp/v1/interfaces/').json()['interfaces'])
+                   == set(expected_interfaces))
 
         api_url = KYTOS_API + '/of_lldp/v1/interfaces/'
         response = requests.get(api_url)
@@ -184,7 +183,7 @@ class TestE2EOfLLDP:
     def test_030_change_polling_interval(self):
         """ Test if changing the polling interval works works properly. """
         self.net.restart_kytos_clean()
-        time.sleep(5)
+        self.net.wait_ready()
 
         default_polling_time = 3
         api_url = KYTOS_API + '/of_lldp/v1/polling_time'
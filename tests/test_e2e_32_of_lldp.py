@@ -1,9 +1,8 @@
 import requests
-from tests.helpers import NetworkTest
+from tests.helpers import KYTOS_API, shared_network, wait_until
 import time
 
 CONTROLLER = '127.0.0.1'
-KYTOS_API = 'http://%s:8181/api/kytos' % CONTROLLER
 
 
 class TestE2EOfLLDPLoopDetection:
@@ -11,11 +10,10 @@ class TestE2EOfLLDPLoopDetection:
 
     @classmethod
     def setup_class(cls):
-        cls.net = NetworkTest(CONTROLLER, topo_name='looped')
+        cls.net = shared_network(CONTROLLER, topo_name='looped')
         cls.net.start()
         cls.net.start_controller(enable_all=True)
         cls.net.wait_switches_connect()
-        time.sleep(10)
 
     @classmethod
     def teardown_class(cls):
@@ -28,9 +26,6 @@ class TestE2EOfLLDPLoopDetection:
         self.net.start_controller(clean_config=_clean_config, enable_all=_enable_all)
         self.net.wait_switches_connect()
 
-        # Wait a few seconds 
-        time.sleep(10)
-
     def test_001_loop_detection_disable_action(self):
         """ This will test that given a looped topology, assuming that there is a loop
         it's going to shutdown the interface. """
@@ -39,7 +34,10 @@ class TestE2EOfLLDPLoopDetection:
 
         interface_id = "00:00:00:00:00:00:00:01:1"
     
-        time.sleep(polling_time)
+        def looped():
+            interface = requests.get(KYTOS_API + '/topology/v3/interfaces').json()['interfaces'][interface_id]
+            return 'looped' in interface['metadata'] and not interface['enabled']
+        wait_until(looped, timeout=polling_time * 6)
 
         # GET topology with the interface ensuring that it's disabled
         api_url = KYTOS_API + '/topology/v3/interfaces' 